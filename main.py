@@ -4,7 +4,8 @@ import warnings
 from src.log import get_logger, setup_logging
 
 setup_logging()
-from src.api.service import ApiService
+from src.api.service import ApiService, run_workers
+from src.rag_service.config import Config
 from src.rag_service.service import RAGService
 
 logger = get_logger("main")
@@ -153,6 +154,13 @@ async def main():
 
 
 if __name__ == "__main__":
+    workers = Config().api_workers
+    if workers > 1:
+        # uvicorn supervises the worker processes, each one builds its own services
+        logger.info(f"Starting {workers} API workers")
+        run_workers(workers)
+        raise SystemExit(0)
+
     try:
         import nest_asyncio
 
@@ -0,0 +1,36 @@
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+# Streamed answers must reach the client chunk by chunk, never buffered for compression
+_UNCOMPRESSED_PREFIXES = ("/api/query",)
+
+
+class CompressionMiddleware:
+    """
+    Compresses large responses, such as the document listing and the graph page.
+
+    Brotli is used when the optional ``brotli-asgi`` package is installed (it falls
+    back to gzip for clients that do not accept it), gzip otherwise.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        if BrotliMiddleware is not None:
+            self.compressed_app = BrotliMiddleware(
+                app, minimum_size=minimum_size, gzip_fallback=True
+            )
+        else:
+            self.compressed_app = GZipMiddleware(app, minimum_size=minimum_size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and not scope["path"].startswith(
+            _UNCOMPRESSED_PREFIXES
+        ):
+            await self.compressed_app(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
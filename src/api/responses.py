@@ -7,6 +7,8 @@ from src.api.types import KnowledgeBaseModel
 class KnowledgeBaseResponse(BaseModel):
     status: str
     knowledge_base: KnowledgeBaseModel
+    # Number of docs matching the listing filters, the page may hold fewer
+    total: Optional[int] = None
 
 
 class OperationResponse(BaseModel):
@@ -14,6 +16,49 @@ class OperationResponse(BaseModel):
     message: str
 
 
+class UploadedDocumentModel(BaseModel):
+    file_name: str
+    doc_id: Optional[str] = None
+    # "added", "duplicate", "conflict" or "failed"
+    status: str
+    error: Optional[str] = None
+
+
+class UploadResponse(BaseModel):
+    status: str
+    documents: List[UploadedDocumentModel]
+
+
+class GraphNodeModel(BaseModel):
+    id: str
+    label: str
+    type: str
+    degree: int
+    x: float
+    y: float
+
+
+class GraphEdgeModel(BaseModel):
+    source: str
+    target: str
+    weight: float
+
+
+class GraphViewModel(BaseModel):
+    nodes: List[GraphNodeModel]
+    edges: List[GraphEdgeModel]
+    # Size of the whole graph, the view holds only its best connected nodes
+    total_nodes: int
+    total_edges: int
+    truncated: bool
+
+
+class GraphViewResponse(BaseModel):
+    status: str
+    # None while no graph has been built
+    graph: Optional[GraphViewModel] = None
+
+
 class TranscriptionResponse(BaseModel):
     text: str
 
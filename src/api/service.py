@@ -1,23 +1,44 @@
 import asyncio
+import hashlib
+import json
 import os
+import time
 import uvicorn
-from typing import Union, List, Dict
+from typing import AsyncIterator, Union, List, Dict, Optional
 import tempfile
-from fastapi import FastAPI, APIRouter, Request, status
+from fastapi import (
+    FastAPI,
+    APIRouter,
+    File,
+    Query,
+    Request,
+    Response,
+    UploadFile,
+    status,
+)
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError, HTTPException
 from fastapi.responses import StreamingResponse, FileResponse, HTMLResponse
 
+from src.api.compression import CompressionMiddleware
 from src.api.types import KnowledgeBaseModel
 from src.api.responses import (
     KnowledgeBaseResponse,
     OperationResponse,
     TranscriptionResponse,
     QuickQuestionsResponse,
+    UploadResponse,
+    GraphViewResponse,
 )
 from src.rag_service.service import RAGService
 from src.rag_service.types import QueryParameters
+from src.rag_service.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    AdmissionTicket,
+)
+from src.rag_service.lightrag.utils import count_tokens
 import openai
 from src.log import get_logger
 
@@ -32,14 +53,27 @@ class ApiService:
         self.state = {"running": False}
         self.server = None
         self.rag_service: Union[RAGService, None] = None
+        self.admission: Union[AdmissionController, None] = None
         self.logger = get_logger("api")
 
     def init(self, rag_service: RAGService):
         try:
             self.rag_service = rag_service
+            config = rag_service.config
+            if config.admission_max_concurrent > 0:
+                self.admission = AdmissionController(
+                    max_concurrent=config.admission_max_concurrent,
+                    max_queue=config.admission_max_queue,
+                    per_client_limit=config.admission_per_client_limit,
+                    max_queue_wait=config.admission_max_queue_wait,
+                )
             self.app = FastAPI()
             self.router = APIRouter()
             self._setup_cors()
+            self.app.add_middleware(
+                CompressionMiddleware,
+                minimum_size=config.compression_minimum_size,
+            )
             self._setup_routes()
             self.app.include_router(self.router)
 
@@ -121,7 +155,101 @@ class ApiService:
         pass
 
     async def metrics(self) -> dict:
-        pass
+        return {
+            "admission": self.admission.metrics() if self.admission else None,
+            "queries_in_flight": self.rag_service.query_flights.in_flight(),
+        }
+
+    async def _admit(self, request: Request) -> Union[AdmissionTicket, None]:
+        """Take a query slot for the client, or fail with 429 and Retry-After when saturated"""
+        if self.admission is None:
+            return None
+        try:
+            return await self.admission.acquire(self._client_id(request))
+        except AdmissionRejected as e:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after)},
+            )
+
+    def _client_id(self, request: Request) -> str:
+        """
+        Key of the client for the per-client admission limit.
+
+        Behind a reverse proxy every request comes from the proxy's address, so all
+        clients would share one limit: list the proxy in ADMISSION_TRUSTED_PROXIES to
+        key on the X-Forwarded-For address it appends instead. A client id header is
+        only honoured when ADMISSION_CLIENT_ID_HEADER names it, since clients can send
+        any value and would otherwise pick their own limit.
+        """
+        config = self.rag_service.config
+        if config.admission_client_id_header:
+            client_id = request.headers.get(config.admission_client_id_header)
+            if client_id:
+                return client_id
+        host = request.client.host if request.client else "unknown"
+        trusted_proxies = config.admission_trusted_proxies
+        if host in trusted_proxies:
+            # Each proxy appends the address it got the request from, the nearest
+            # address not belonging to a trusted proxy is the client
+            forwarded = request.headers.get("x-forwarded-for", "").split(",")
+            for address in reversed([a.strip() for a in forwarded if a.strip()]):
+                host = address
+                if address not in trusted_proxies:
+                    break
+        return host
+
+    async def _until_disconnect(self, request: Request, awaitable):
+        """Await `awaitable`, cancelling it as soon as the client disconnects"""
+        task = asyncio.ensure_future(awaitable)
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=0.5)
+                if done:
+                    return task.result()
+                if await request.is_disconnected():
+                    self.logger.info("Client disconnected, cancelling query")
+                    raise HTTPException(status_code=499, detail="Client disconnected")
+        finally:
+            if not task.done():
+                task.cancel()
+
+    @staticmethod
+    async def _release_when_done(
+        ticket: Union[AdmissionTicket, None], chunks: AsyncIterator[str]
+    ) -> AsyncIterator[str]:
+        """Hold the admission ticket until a streamed body is finished or abandoned"""
+        try:
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            if ticket is not None:
+                ticket.release()
+            await chunks.aclose()
+
+    @staticmethod
+    def _etag(*parts: str) -> str:
+        # Weak, as the compression middleware changes the bytes on the wire
+        return f'W/"{hashlib.md5(":".join(parts).encode()).hexdigest()}"'
+
+    @staticmethod
+    def _cache_headers(etag: str) -> Dict[str, str]:
+        # Clients may keep the response, but must revalidate it on every use
+        return {"ETag": etag, "Cache-Control": "no-cache"}
+
+    @staticmethod
+    def _is_not_modified(request: Request, etag: str) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if not if_none_match:
+            return False
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or etag.removeprefix("W/") in tags
+
+    def _not_modified_response(self, etag: str) -> Response:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=self._cache_headers(etag)
+        )
 
     def _setup_cors(self):
         # For origins with "lovable" in the name and any localhost port
@@ -273,40 +401,228 @@ class ApiService:
             if is_stream:
                 query_params.stream = is_stream
 
-            response = await self.rag_service.query(user_input, query_params)
+            ticket = await self._admit(request)
+            # Streamed answers release the slot when the body is done
+            streaming = False
+            try:
+                # Retrieval and generation are cancelled if the client goes away meanwhile
+                response = await self._until_disconnect(
+                    request, self.rag_service.query(user_input, query_params)
+                )
 
-            # Check if response is a string (error message) or an async iterator
-            if isinstance(response, str):
-                # If it's a string and streaming is enabled, return it as a streaming response
-                if is_stream:
+                # Check if response is a string (error message) or an async iterator
+                if isinstance(response, str):
+                    # If it's a string and streaming is enabled, return it as a streaming response
+                    if is_stream:
 
-                    async def string_generator():
-                        yield response
+                        async def string_generator():
+                            yield response
 
-                    return StreamingResponse(
-                        string_generator(), media_type="text/plain"
-                    )
+                        streaming = True
+                        return StreamingResponse(
+                            self._release_when_done(ticket, string_generator()),
+                            media_type="text/plain",
+                        )
+                    else:
+                        # If streaming is not enabled, return it as a JSON response
+                        return {"response": response}
                 else:
-                    # If streaming is not enabled, return it as a JSON response
-                    return {"response": response}
-            else:
-                # It's an async iterator, handle as before
-                if is_stream:
-                    # Return as a streaming response
-                    async def response_generator():
-                        async for chunk in response:
-                            yield chunk
-
-                    return StreamingResponse(
-                        response_generator(), media_type="text/plain"
+                    # It's an async iterator, handle as before
+                    if is_stream:
+                        # Return as a streaming response
+                        async def response_generator():
+                            try:
+                                async for chunk in response:
+                                    if await request.is_disconnected():
+                                        self.logger.info(
+                                            "Client disconnected, abandoning answer"
+                                        )
+                                        return
+                                    yield chunk
+                            finally:
+                                # Also reached when the server cancels the generator on disconnect
+                                if hasattr(response, "aclose"):
+                                    await response.aclose()
+
+                        streaming = True
+                        return StreamingResponse(
+                            self._release_when_done(ticket, response_generator()),
+                            media_type="text/plain",
+                        )
+                    else:
+                        # Collect all chunks into a single response
+                        async def collect_response():
+                            full_response = ""
+                            try:
+                                async for chunk in response:
+                                    full_response += chunk
+                            finally:
+                                if hasattr(response, "aclose"):
+                                    await response.aclose()
+                            return full_response
+
+                        full_response = await self._until_disconnect(
+                            request, collect_response()
+                        )
+                        return {"response": full_response}
+            finally:
+                if ticket is not None and not streaming:
+                    ticket.release()
+
+        @self.router.post("/api/query/stream")
+        async def query_rag_stream(
+            request: Request,
+        ):
+            """
+            Query the RAG service and stream structured events, as Server-Sent Events
+            or as newline-delimited JSON when the body has "format": "ndjson".
+            Events: retrieval (context stats), token (answer text), done (usage and
+            timings) and error. The upstream answer is abandoned as soon as the client
+            disconnects.
+            """
+            body = await request.json()
+            user_input = body.get("query")
+            messagesHistory = body.get("messagesHistory")
+            is_ndjson = body.get("format") == "ndjson"
+            query_params = QueryParameters(stream=True)
+            if messagesHistory:
+                query_params.conversation_history = messagesHistory
+
+            def encode_event(event: str, data: dict) -> str:
+                if is_ndjson:
+                    return json.dumps({"event": event, **data}) + "\n"
+                return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+            async def event_generator():
+                started = time.perf_counter()
+                stats = {}
+                response = None
+                answer = []
+                first_token_at = None
+                try:
+                    response = await self._until_disconnect(
+                        request,
+                        self.rag_service.query(
+                            user_input, query_params, stats=stats, raise_errors=True
+                        ),
                     )
-                else:
-                    # Collect all chunks into a single response
-                    full_response = ""
-                    async for chunk in response:
-                        full_response += chunk
+                    retrieval_done_at = stats.get(
+                        "retrieval_done_at", time.perf_counter()
+                    )
+                    yield encode_event(
+                        "retrieval",
+                        {
+                            "contexts": stats.get("contexts", []),
+                            "prompt_tokens": stats.get("prompt_tokens"),
+                            "retrieval_ms": round((retrieval_done_at - started) * 1000),
+                        },
+                    )
+
+                    if isinstance(response, str):
+
+                        async def single_chunk():
+                            yield response
+
+                        chunks = single_chunk()
+                    else:
+                        chunks = response
+                    async for chunk in chunks:
+                        if await request.is_disconnected():
+                            self.logger.info("Client disconnected, abandoning answer")
+                            return
+                        if first_token_at is None:
+                            first_token_at = time.perf_counter()
+                        answer.append(chunk)
+                        yield encode_event("token", {"text": chunk})
+
+                    finished = time.perf_counter()
+                    yield encode_event(
+                        "done",
+                        {
+                            "usage": {
+                                "prompt_tokens": stats.get("prompt_tokens"),
+                                "completion_tokens": count_tokens("".join(answer)),
+                            },
+                            "timings": {
+                                "retrieval_ms": round(
+                                    (retrieval_done_at - started) * 1000
+                                ),
+                                "time_to_first_token_ms": round(
+                                    (first_token_at - started) * 1000
+                                )
+                                if first_token_at is not None
+                                else None,
+                                "total_ms": round((finished - started) * 1000),
+                            },
+                        },
+                    )
+                except Exception as e:
+                    self.logger.error(f"Error streaming query: {str(e)}")
+                    yield encode_event("error", {"message": str(e)})
+                finally:
+                    # Also reached when the server cancels the generator on disconnect
+                    if hasattr(response, "aclose"):
+                        await response.aclose()
+
+            ticket = await self._admit(request)
+            if is_ndjson:
+                return StreamingResponse(
+                    self._release_when_done(ticket, event_generator()),
+                    media_type="application/x-ndjson",
+                )
+            return StreamingResponse(
+                self._release_when_done(ticket, event_generator()),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
+        @self.router.post("/api/query/batch")
+        async def query_rag_batch(
+            request: Request,
+        ):
+            """
+            Answer a list of questions, for offline evaluation and bulk answering.
+            Body: {"queries": [...], "params": {QueryParameters fields}}. Results are
+            streamed back as NDJSON, one line per question in completion order.
+            """
+            body = await request.json()
+            user_queries = body.get("queries")
+            if not isinstance(user_queries, list) or not user_queries:
+                raise HTTPException(
+                    status_code=400, detail="queries must be a non-empty list"
+                )
+            try:
+                query_params = QueryParameters(**(body.get("params") or {}))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+            # One admission slot for the whole batch, it bounds its own concurrency
+            ticket = await self._admit(request)
+
+            async def result_generator():
+                try:
+                    async for result in self.rag_service.query_batch(
+                        user_queries, query_params
+                    ):
+                        yield json.dumps(result) + "\n"
+                except Exception as e:
+                    self.logger.error(f"Error answering query batch: {str(e)}")
+                    yield json.dumps({"error": str(e)}) + "\n"
+
+            return StreamingResponse(
+                self._release_when_done(ticket, result_generator()),
+                media_type="application/x-ndjson",
+            )
 
-                    return {"response": full_response}
+        @self.router.get(
+            "/api/metrics",
+            status_code=status.HTTP_200_OK,
+            tags=["Metrics"],
+            summary="Get Serving Metrics",
+            response_description="Returns admission control state, queue-depth and wait-time histograms",
+        )
+        async def get_metrics():
+            return await self.metrics()
 
         @self.router.post(
             "/api/index",
@@ -362,6 +678,35 @@ class ApiService:
                 self.logger.error(f"Error adding document: {str(e)}")
                 raise HTTPException(status_code=500, detail=str(e))
 
+        @self.router.post(
+            "/api/upload_documents",
+            response_model=UploadResponse,
+            status_code=status.HTTP_200_OK,
+            tags=["Add Document"],
+            summary="Upload Documents to Knowledge Base",
+            response_description="Returns the outcome for every uploaded document",
+        )
+        async def upload_documents(
+            files: List[UploadFile] = File(...),
+            index: bool = True,
+        ):
+            """
+            Multipart upload of any number of documents, zip and tar archives are
+            unpacked. Files are spooled to disk while the request is parsed, and the
+            new documents are indexed in the background unless `index` is false.
+            """
+            try:
+                documents = await self.rag_service.upload_docs(
+                    [(file.filename or "", file.file) for file in files], index=index
+                )
+                return {"status": "success", "documents": documents}
+            except Exception as e:
+                self.logger.error(f"Error uploading documents: {str(e)}")
+                raise HTTPException(status_code=500, detail=str(e))
+            finally:
+                for file in files:
+                    await file.close()
+
         @self.router.get(
             "/api/knowledge_base",
             response_model=KnowledgeBaseResponse,
@@ -370,14 +715,31 @@ class ApiService:
             summary="Get Knowledge Base Information",
             response_description="Returns the knowledge base information and status",
         )
-        async def get_knowledge_base():
+        async def get_knowledge_base(
+            request: Request,
+            response: Response,
+            offset: int = Query(0, ge=0),
+            limit: Optional[int] = Query(None, ge=1),
+            doc_status: Optional[str] = Query(None, alias="status"),
+            name: Optional[str] = None,
+        ):
             try:
+                # The filters are part of the representation, so of its validator
+                etag = self._etag(
+                    self.rag_service.knowledge_base_etag(), str(request.query_params)
+                )
+                if self._is_not_modified(request, etag):
+                    return self._not_modified_response(etag)
                 rag_docs = await self.rag_service.get_docs()
                 rag_status = await self.rag_service.get_status()
                 kb: KnowledgeBaseModel = KnowledgeBaseModel.create_from(
                     name="knowledge_base", rag_service_status=rag_status, docs=rag_docs
                 )
-                return {"status": "success", "knowledge_base": kb}
+                kb, total = kb.filtered(
+                    status=doc_status, name=name, offset=offset, limit=limit
+                )
+                response.headers.update(self._cache_headers(etag))
+                return {"status": "success", "knowledge_base": kb, "total": total}
             except Exception as e:
                 self.logger.error(f"Error getting knowledge base: {str(e)}")
                 raise HTTPException(status_code=500, detail=str(e))
@@ -409,14 +771,52 @@ class ApiService:
             summary="Get Knowledge Base Graph",
             response_description="Returns the knowledge base graph",
         )
-        async def get_knowledge_base_graphe():
+        async def get_knowledge_base_graphe(
+            request: Request,
+            response: Response,
+            max_nodes: Optional[int] = Query(None, ge=1, le=10000),
+            min_degree: int = Query(0, ge=0),
+        ):
             try:
-                graph = await self.rag_service.visualize()
+                etag = self._etag(
+                    self.rag_service.graph_etag(), str(request.query_params)
+                )
+                if self._is_not_modified(request, etag):
+                    return self._not_modified_response(etag)
+                graph = await self.rag_service.visualize(max_nodes, min_degree)
+                response.headers.update(self._cache_headers(etag))
                 return {"status": "success", "message": graph}
             except Exception as e:
                 self.logger.error(f"Error getting knowledge base: {str(e)}")
                 raise HTTPException(status_code=500, detail=str(e))
 
+        @self.router.get(
+            "/api/knowledge_base_graph/view",
+            response_model=GraphViewResponse,
+            status_code=status.HTTP_200_OK,
+            tags=["Knowledge Base"],
+            summary="Get Knowledge Base Graph View",
+            response_description="Returns the best connected part of the knowledge base graph, laid out",
+        )
+        async def get_knowledge_base_graph_view(
+            request: Request,
+            response: Response,
+            max_nodes: Optional[int] = Query(None, ge=1, le=10000),
+            min_degree: int = Query(0, ge=0),
+        ):
+            try:
+                etag = self._etag(
+                    self.rag_service.graph_etag(), str(request.query_params)
+                )
+                if self._is_not_modified(request, etag):
+                    return self._not_modified_response(etag)
+                view = await self.rag_service.graph_view(max_nodes, min_degree)
+                response.headers.update(self._cache_headers(etag))
+                return {"status": "success", "graph": view}
+            except Exception as e:
+                self.logger.error(f"Error getting knowledge base graph: {str(e)}")
+                raise HTTPException(status_code=500, detail=str(e))
+
         @self.router.get(
             "/api/get_doc_content/{doc_id}",
             response_model=OperationResponse,
@@ -504,6 +904,39 @@ class ApiService:
             return {"detail": exc.errors(), "body": exc.body}
 
 
+def create_app() -> FastAPI:
+    """
+    App factory for multi-worker serving: every uvicorn worker process builds its
+    own services, which read the published knowledge base snapshots.
+    """
+    rag_service = RAGService()
+    api_service = ApiService()
+    api_service.init(rag_service)
+
+    @api_service.app.on_event("startup")
+    async def start_rag_service():
+        await rag_service.init()
+        await rag_service.set_rag_llm("openai", "gpt-4o")
+
+    @api_service.app.on_event("shutdown")
+    async def stop_rag_service():
+        await rag_service.stop()
+
+    return api_service.app
+
+
+def run_workers(workers: int):
+    """Serve the API from `workers` processes, blocks until the server exits"""
+    uvicorn.run(
+        "src.api.service:create_app",
+        factory=True,
+        host="0.0.0.0",
+        port=9000,
+        workers=workers,
+        log_level="info",
+    )
+
+
 async def main():
     rag_service = RAGService()
     await rag_service.init()
@@ -86,6 +86,31 @@ class KnowledgeBaseModel:
             },
         )
 
+    def filtered(
+        self,
+        status: Optional[str] = None,
+        name: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> tuple["KnowledgeBaseModel", int]:
+        """
+        Page of the docs matching a doc status (e.g. "Indexed", case insensitive) and
+        a file name substring, ordered by file name. Returns the page and the number
+        of matching docs.
+        """
+        matching = [
+            (doc_id, doc)
+            for doc_id, doc in self.docs.items()
+            if (status is None or doc.status.value.casefold() == status.casefold())
+            and (name is None or name.casefold() in doc.file_name.casefold())
+        ]
+        matching.sort(key=lambda item: (item[1].file_name, item[0]))
+        end = None if limit is None else offset + limit
+        page = KnowledgeBaseModel(
+            name=self.name, status=self.status, docs=dict(matching[offset:end])
+        )
+        return page, len(matching)
+
 
 class QuickQuestion(BaseModel):
     """Quick question model for suggestions in the chat UI"""
@@ -0,0 +1,181 @@
+import asyncio
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List
+
+from src.log import get_logger
+
+_WAIT_SECONDS_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+_QUEUE_DEPTH_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100]
+
+
+class AdmissionRejected(Exception):
+    """Raised when a query is shed, `retry_after` is the suggested back-off in seconds"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Histogram:
+    """Cumulative bucket histogram, in the Prometheus style"""
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+    def snapshot(self) -> dict:
+        cumulative, buckets = 0, {}
+        for bound, count in zip([*map(str, self.buckets), "+Inf"], self.counts):
+            cumulative += count
+            buckets[bound] = cumulative
+        return {"buckets": buckets, "count": self.count, "sum": self.sum}
+
+
+class AdmissionTicket:
+    """A granted query slot. Releasing is idempotent, and happens on collection at the latest."""
+
+    def __init__(self, controller: "AdmissionController", client_id: str):
+        self._controller = controller
+        self._client_id = client_id
+        self._admitted_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release(
+                self._client_id, time.monotonic() - self._admitted_at
+            )
+
+    def __del__(self):
+        self.release()
+
+
+class AdmissionController:
+    """
+    Bounds the queries running at once, with a bounded FIFO queue in front.
+
+    A query is rejected right away when its client already has `per_client_limit`
+    queries running or queued, or when the queue is full, and after waiting
+    `max_queue_wait` seconds in the queue (the queue-time SLO). Rejections carry a
+    Retry-After estimate from the recent service time.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queue: int,
+        per_client_limit: int,
+        max_queue_wait: float,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.per_client_limit = per_client_limit
+        self.max_queue_wait = max_queue_wait
+        self.logger = get_logger("admission")
+
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._per_client: Counter = Counter()
+        # Exponentially weighted mean of the time a slot is held
+        self._service_seconds = 1.0
+
+        self.queue_depth = Histogram(_QUEUE_DEPTH_BUCKETS)
+        self.wait_seconds = Histogram(_WAIT_SECONDS_BUCKETS)
+        self.rejected: Dict[str, int] = {
+            "client_limit": 0,
+            "queue_full": 0,
+            "queue_timeout": 0,
+        }
+
+    async def acquire(self, client_id: str) -> AdmissionTicket:
+        if self._per_client[client_id] >= self.per_client_limit:
+            self._reject("client_limit")
+        queued = len(self._waiters)
+        self.queue_depth.observe(queued)
+        started = time.monotonic()
+
+        if self._active >= self.max_concurrent or queued:
+            if queued >= self.max_queue:
+                self._reject("queue_full")
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self._per_client[client_id] += 1
+            try:
+                await asyncio.wait_for(waiter, timeout=self.max_queue_wait)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                self._forget_client(client_id)
+                self._remove_waiter(waiter)
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was handed over just as we gave up, pass it on
+                    self._active -= 1
+                    self._wake_next()
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                self.wait_seconds.observe(time.monotonic() - started)
+                self._reject("queue_timeout")
+        else:
+            self._active += 1
+            self._per_client[client_id] += 1
+
+        self.wait_seconds.observe(time.monotonic() - started)
+        return AdmissionTicket(self, client_id)
+
+    def metrics(self) -> dict:
+        return {
+            "active": self._active,
+            "queued": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "rejected": dict(self.rejected),
+            "queue_depth": self.queue_depth.snapshot(),
+            "wait_seconds": self.wait_seconds.snapshot(),
+        }
+
+    def _reject(self, reason: str) -> None:
+        self.rejected[reason] += 1
+        retry_after = max(
+            1,
+            round(
+                self._service_seconds * (len(self._waiters) + 1) / self.max_concurrent
+            ),
+        )
+        self.logger.warning(f"Query rejected ({reason}), retry after {retry_after}s")
+        raise AdmissionRejected(f"Server is busy ({reason})", retry_after)
+
+    def _release(self, client_id: str, held_seconds: float) -> None:
+        self._forget_client(client_id)
+        self._service_seconds = 0.9 * self._service_seconds + 0.1 * held_seconds
+        self._active -= 1
+        self._wake_next()
+
+    def _forget_client(self, client_id: str) -> None:
+        self._per_client[client_id] -= 1
+        if self._per_client[client_id] <= 0:
+            del self._per_client[client_id]
+
+    def _wake_next(self) -> None:
+        # The slot passes straight to the oldest waiter
+        while self._waiters and self._active < self.max_concurrent:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._active += 1
+                waiter.set_result(None)
+
+    def _remove_waiter(self, waiter: asyncio.Future) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
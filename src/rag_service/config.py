@@ -75,6 +75,14 @@ class Config(BaseSettings):
         default_factory=lambda: os.getenv("VECTOR_STORAGE", "ChromaVectorDBStorage"),
         description="Vector storage type",
     )
+    vector_dtype: str = Field(
+        default_factory=lambda: os.getenv("VECTOR_DTYPE", "float16"),
+        description="On-disk vector dtype for MmapVectorDBStorage (float16 or int8)",
+    )
+    graphml_export: bool = Field(
+        default_factory=lambda: os.getenv("GRAPHML_EXPORT", "false").lower() == "true",
+        description="Also export the knowledge graph as GraphML on every index flush",
+    )
 
     # LLM model configurations
     llm_model_max_token_size: int = Field(
@@ -96,6 +104,108 @@ class Config(BaseSettings):
         description="Maximum parallel insertions",
     )
 
+    query_timeout: Optional[float] = Field(
+        default_factory=lambda: (
+            float(os.getenv("QUERY_TIMEOUT")) if os.getenv("QUERY_TIMEOUT") else None
+        ),
+        description="Default end-to-end query deadline in seconds, unset for no deadline",
+    )
+
+    coalesce_queries: bool = Field(
+        default_factory=lambda: os.getenv("COALESCE_QUERIES", "true").lower() == "true",
+        description="Share one computation between concurrent identical queries",
+    )
+
+    warm_quick_questions: bool = Field(
+        default_factory=lambda: (
+            os.getenv("WARM_QUICK_QUESTIONS", "true").lower() == "true"
+        ),
+        description="Pre-answer the quick questions after init and after each index",
+    )
+    simulate_quick_answer_stream: bool = Field(
+        default_factory=lambda: (
+            os.getenv("SIMULATE_QUICK_ANSWER_STREAM", "true").lower() == "true"
+        ),
+        description="Serve warm quick answers in chunks when a stream is requested",
+    )
+    quick_answer_stream_chunk_size: int = Field(
+        default_factory=lambda: int(os.getenv("QUICK_ANSWER_STREAM_CHUNK_SIZE", 64)),
+        description="Characters per chunk of a simulated quick answer stream",
+    )
+
+    # Admission control for queries
+    admission_max_concurrent: int = Field(
+        default_factory=lambda: int(os.getenv("ADMISSION_MAX_CONCURRENT", 16)),
+        description="Queries answered at once, 0 disables admission control",
+    )
+    admission_max_queue: int = Field(
+        default_factory=lambda: int(os.getenv("ADMISSION_MAX_QUEUE", 64)),
+        description="Queries allowed to wait for a slot before new ones are rejected",
+    )
+    admission_per_client_limit: int = Field(
+        default_factory=lambda: int(os.getenv("ADMISSION_PER_CLIENT_LIMIT", 4)),
+        description="Queries a single client may have running or queued",
+    )
+    admission_max_queue_wait: float = Field(
+        default_factory=lambda: float(os.getenv("ADMISSION_MAX_QUEUE_WAIT", 10)),
+        description="Seconds a query may wait for a slot before it is rejected",
+    )
+    admission_client_id_header: str = Field(
+        default_factory=lambda: os.getenv("ADMISSION_CLIENT_ID_HEADER", ""),
+        description="Header naming the client for the per-client limit, only set it when a gateway in front of the API overwrites it",
+    )
+    admission_trusted_proxies_str: str = Field(
+        default_factory=lambda: os.getenv("ADMISSION_TRUSTED_PROXIES", ""),
+        description="Comma-separated addresses of reverse proxies whose X-Forwarded-For names the client",
+    )
+
+    @property
+    def admission_trusted_proxies(self) -> List[str]:
+        """Parse trusted proxy addresses from comma-separated string"""
+        return [
+            address.strip()
+            for address in self.admission_trusted_proxies_str.split(",")
+            if address.strip()
+        ]
+
+    batch_max_concurrency: int = Field(
+        default_factory=lambda: int(os.getenv("BATCH_MAX_CONCURRENCY", 4)),
+        description="Queries of a batch answered at once",
+    )
+
+    upload_max_bytes: int = Field(
+        default_factory=lambda: int(os.getenv("UPLOAD_MAX_BYTES", 100 * 1024 * 1024)),
+        description="Largest document accepted by the upload endpoint, archive members included",
+    )
+    upload_max_parallel: int = Field(
+        default_factory=lambda: int(os.getenv("UPLOAD_MAX_PARALLEL", 4)),
+        description="Uploaded files streamed to disk at once",
+    )
+
+    graph_view_max_nodes: int = Field(
+        default_factory=lambda: int(os.getenv("GRAPH_VIEW_MAX_NODES", 500)),
+        description="Best connected nodes shown in the knowledge graph view by default",
+    )
+
+    compression_minimum_size: int = Field(
+        default_factory=lambda: int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1024)),
+        description="Responses smaller than this many bytes are sent uncompressed",
+    )
+
+    # Multi-worker serving
+    api_workers: int = Field(
+        default_factory=lambda: int(os.getenv("API_WORKERS", 1)),
+        description="Number of API worker processes, more than one serves read-only knowledge base snapshots",
+    )
+    snapshot_poll_interval: float = Field(
+        default_factory=lambda: float(os.getenv("SNAPSHOT_POLL_INTERVAL", 5)),
+        description="Seconds between checks for a newly published knowledge base snapshot",
+    )
+    snapshot_keep: int = Field(
+        default_factory=lambda: int(os.getenv("SNAPSHOT_KEEP", 3)),
+        description="Number of knowledge base snapshots kept on disk",
+    )
+
     index_llm_provider: str = Field(
         default_factory=lambda: os.getenv("INDEX_LLM_PROVIDER", "openai"),
         description="Index LLM provider",
@@ -0,0 +1,75 @@
+import asyncio
+import os
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+from watchdog.events import FileSystemEvent, FileSystemEventHandler
+from watchdog.observers import Observer
+
+from src.log import get_logger
+
+
+class DocsWatcher(FileSystemEventHandler):
+    """
+    Reports the files changed under the watched directories to an async callback.
+
+    watchdog delivers events on its own thread; they are handed over to the event
+    loop and debounced, so a burst of events (an editor save, a status file rewrite)
+    becomes a single callback with the set of changed paths.
+    """
+
+    def __init__(
+        self,
+        on_change: Callable[[Set[str]], Awaitable[None]],
+        debounce: float = 0.2,
+    ):
+        super().__init__()
+        self.on_change = on_change
+        self.debounce = debounce
+        self.logger = get_logger("docs_watcher")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._observer: Optional[Observer] = None
+        self._pending: Set[str] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def start(self, directories: List[Tuple[str, bool]]) -> None:
+        """Watch (directory, recursive) pairs, must be called on the event loop"""
+        self._loop = asyncio.get_running_loop()
+        self._observer = Observer()
+        self._observer.daemon = True
+        for directory, recursive in directories:
+            os.makedirs(directory, exist_ok=True)
+            self._observer.schedule(self, directory, recursive=recursive)
+        self._observer.start()
+        self.logger.info(f"Watching {', '.join(d for d, _ in directories)}")
+
+    def stop(self) -> None:
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+
+    def on_any_event(self, event: FileSystemEvent) -> None:
+        if event.event_type not in ("created", "modified", "deleted", "moved"):
+            return
+        # A directory's own modifications only mirror events of its entries
+        if event.is_directory and event.event_type == "modified":
+            return
+        paths = [os.fsdecode(event.src_path)]
+        if getattr(event, "dest_path", ""):
+            paths.append(os.fsdecode(event.dest_path))
+        self._loop.call_soon_threadsafe(self._add_pending, paths)
+
+    def _add_pending(self, paths: List[str]) -> None:
+        self._pending.update(paths)
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush())
+
+    async def _flush(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.debounce)
+            paths, self._pending = self._pending, set()
+            try:
+                await self.on_change(paths)
+            except Exception as e:
+                self.logger.error(f"Failed to apply document changes: {str(e)}")
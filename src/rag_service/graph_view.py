@@ -0,0 +1,77 @@
+from typing import Any, Dict
+
+import networkx as nx
+from pyvis.network import Network
+
+# Layout coordinates span [-_LAYOUT_SCALE, _LAYOUT_SCALE], in pixels for the web UI
+_LAYOUT_SCALE = 1000
+_LAYOUT_SEED = 42
+
+
+def build_graph_view(
+    graph: nx.Graph, max_nodes: int, min_degree: int = 0
+) -> Dict[str, Any]:
+    """
+    Compact, laid out view of the knowledge graph for the web UI.
+
+    Nodes with fewer than `min_degree` edges are dropped, and of the rest the
+    `max_nodes` best connected are kept, with the edges between them. Coordinates
+    come from a seeded spring layout, so an unchanged graph keeps its picture.
+    """
+    degrees = dict(graph.degree())
+    candidates = [node for node, degree in degrees.items() if degree >= min_degree]
+    candidates.sort(key=lambda node: (-degrees[node], str(node)))
+    subgraph = graph.subgraph(candidates[:max_nodes])
+    positions = (
+        nx.spring_layout(subgraph, seed=_LAYOUT_SEED, scale=_LAYOUT_SCALE)
+        if subgraph.number_of_nodes()
+        else {}
+    )
+
+    nodes = []
+    for node, data in subgraph.nodes(data=True):
+        x, y = positions[node]
+        nodes.append(
+            {
+                "id": str(node),
+                "label": str(node).strip('"'),
+                "type": str(data.get("entity_type", "")).strip('"'),
+                "degree": degrees[node],
+                "x": round(float(x), 1),
+                "y": round(float(y), 1),
+            }
+        )
+    edges = [
+        {
+            "source": str(source),
+            "target": str(target),
+            "weight": float(data.get("weight", 1.0)),
+        }
+        for source, target, data in subgraph.edges(data=True)
+    ]
+    return {
+        "nodes": nodes,
+        "edges": edges,
+        "total_nodes": graph.number_of_nodes(),
+        "total_edges": graph.number_of_edges(),
+        "truncated": subgraph.number_of_nodes() < graph.number_of_nodes(),
+    }
+
+
+def render_graph_html(view: Dict[str, Any]) -> str:
+    """Standalone HTML page of a graph view, at its precomputed positions"""
+    net = Network(height="100vh", width="100%", cdn_resources="remote")
+    for node in view["nodes"]:
+        net.add_node(
+            node["id"],
+            label=node["label"],
+            title=node["type"],
+            value=node["degree"],
+            x=node["x"],
+            y=node["y"],
+        )
+    for edge in view["edges"]:
+        net.add_edge(edge["source"], edge["target"], value=edge["weight"])
+    # The layout is already done, the browser only draws it
+    net.toggle_physics(False)
+    return net.generate_html()
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from abc import ABC, abstractmethod
 from enum import Enum
 import os
@@ -81,6 +82,30 @@ class QueryParam:
     history_turns: int = 3
     """Number of complete conversation turns (user-assistant pairs) to consider in the response context."""
 
+    keyword_extractor: Literal["llm", "local"] = "llm"
+    """Keyword extraction strategy:
+    - "llm": Asks the LLM for high/low-level keywords.
+    - "local": Matches the query against the graph's entity names on the CPU, without a network call.
+    """
+
+    timeout: float | None = None
+    """End-to-end deadline in seconds for retrieval and the start of generation. Stages degrade (smaller top_k, local keywords, no KG context, naive retrieval) as it runs out. None disables it."""
+
+    kg_context_timeout: float | None = None
+    """In "mix" mode, seconds (from the start of retrieval) to wait for the knowledge graph context once the vector context is ready. None waits for both."""
+
+    included_contexts: list[str] = field(default_factory=list)
+    """Filled by the query with the contexts the prompt was built from, e.g. ["kg", "vector"]."""
+
+    speculative_retrieval: bool = False
+    """If True, searches entities/relationships with the raw query while keywords are being extracted. Strong enough hits are used without waiting for the keywords, weaker ones are merged by score with the keyword hits."""
+
+    adaptive_retrieval: bool = False
+    """If True, cuts vector hits at the similarity-score knee or score-mass threshold instead of always keeping `top_k`, and scales the context token budgets to the number of hits kept."""
+
+    stats: dict[str, Any] | None = None
+    """If a dict, filled once the prompt is built: `retrieval_done_at` (time.perf_counter()), `contexts` and the estimated `prompt_tokens`."""
+
 
 @dataclass
 class StorageNameSpace(ABC):
@@ -110,6 +135,36 @@ class BaseVectorStorage(StorageNameSpace, ABC):
     async def query(self, query: str, top_k: int) -> list[dict[str, Any]]:
         """Query the vector storage and retrieve top_k results."""
 
+    async def query_by_vector(
+        self, embedding: np.ndarray, top_k: int
+    ) -> list[dict[str, Any]]:
+        """Retrieve top_k results for a precomputed query embedding."""
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support query_by_vector"
+        )
+
+    async def query_batch(
+        self, queries: list[str], top_k: int
+    ) -> list[list[dict[str, Any]]]:
+        """Embed all queries in a single call and retrieve top_k results for each.
+
+        Backends with a native multi-vector search should override this.
+        """
+        if not queries:
+            return []
+        embeddings = await self.embedding_func(queries)
+        return list(
+            await asyncio.gather(
+                *[self.query_by_vector(embedding, top_k) for embedding in embeddings]
+            )
+        )
+
+    async def get_vectors_by_ids(self, ids: list[str]) -> dict[str, np.ndarray]:
+        """Get the stored vectors for the given ids, missing ids are omitted."""
+        raise NotImplementedError(
+            f"{type(self).__name__} does not support get_vectors_by_ids"
+        )
+
     @abstractmethod
     async def upsert(self, data: dict[str, dict[str, Any]]) -> None:
         """Insert or update vectors in the storage."""
@@ -178,6 +233,60 @@ class BaseGraphStorage(StorageNameSpace, ABC):
     async def get_node_edges(self, source_node_id: str) -> list[tuple[str, str]] | None:
         """Upsert a node into the graph."""
 
+    async def get_nodes_batch(self, node_ids: list[str]) -> dict[str, dict]:
+        """Get several nodes at once, keyed by node id; missing nodes are omitted.
+
+        The default issues one get_node per id, backends should override it with a
+        single round trip.
+        """
+        nodes = await asyncio.gather(*[self.get_node(n) for n in node_ids])
+        return {n: node for n, node in zip(node_ids, nodes) if node is not None}
+
+    async def node_degrees_batch(self, node_ids: list[str]) -> dict[str, int]:
+        """Get the degree of several nodes at once, missing nodes have degree 0."""
+        degrees = await asyncio.gather(*[self.node_degree(n) for n in node_ids])
+        return {n: d or 0 for n, d in zip(node_ids, degrees)}
+
+    async def get_edges_batch(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], dict]:
+        """Get several edges at once, keyed by (source, target); missing edges are omitted."""
+        edges = await asyncio.gather(*[self.get_edge(s, t) for s, t in pairs])
+        return {pair: edge for pair, edge in zip(pairs, edges) if edge is not None}
+
+    async def get_nodes_edges_batch(
+        self, node_ids: list[str]
+    ) -> dict[str, list[tuple[str, str]]]:
+        """Get the edges of several nodes at once, missing nodes map to an empty list."""
+        edges = await asyncio.gather(*[self.get_node_edges(n) for n in node_ids])
+        return {n: e or [] for n, e in zip(node_ids, edges)}
+
+    async def get_nodes_with_degrees_batch(
+        self, node_ids: list[str]
+    ) -> dict[str, dict]:
+        """Get several nodes with their degree inline under "degree"; missing nodes are omitted.
+
+        Query-time ranking relies on this, backends should return the degree from the
+        same round trip as the node data.
+        """
+        nodes, degrees = await asyncio.gather(
+            self.get_nodes_batch(node_ids), self.node_degrees_batch(node_ids)
+        )
+        return {n: {**node, "degree": degrees.get(n, 0)} for n, node in nodes.items()}
+
+    async def get_edges_with_degrees_batch(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], dict]:
+        """Get several edges with their degree (sum of endpoint degrees) inline under "degree"."""
+        endpoints = list({n for pair in pairs for n in pair})
+        edges, degrees = await asyncio.gather(
+            self.get_edges_batch(pairs), self.node_degrees_batch(endpoints)
+        )
+        return {
+            pair: {**edge, "degree": degrees.get(pair[0], 0) + degrees.get(pair[1], 0)}
+            for pair, edge in edges.items()
+        }
+
     @abstractmethod
     async def upsert_node(self, node_id: str, node_data: dict[str, str]) -> None:
         """Upsert an edge into the graph."""
@@ -188,6 +297,22 @@ class BaseGraphStorage(StorageNameSpace, ABC):
     ) -> None:
         """Delete a node from the graph."""
 
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        """Upsert several nodes at once, keyed by node id.
+
+        The default issues one upsert_node per node, backends should override it
+        with bulk writes.
+        """
+        for node_id, node_data in nodes.items():
+            await self.upsert_node(node_id, node_data)
+
+    async def upsert_edges_batch(
+        self, edges: dict[tuple[str, str], dict[str, str]]
+    ) -> None:
+        """Upsert several edges at once, keyed by (source, target); both nodes must exist."""
+        for (source_node_id, target_node_id), edge_data in edges.items():
+            await self.upsert_edge(source_node_id, target_node_id, edge_data)
+
     @abstractmethod
     async def delete_node(self, node_id: str) -> None:
         """Embed nodes using an algorithm."""
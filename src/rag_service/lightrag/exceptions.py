@@ -58,3 +58,11 @@ class RateLimitError(APIStatusError):
 class APITimeoutError(APIConnectionError):
     def __init__(self, request: httpx.Request) -> None:
         super().__init__(message="Request timed out.", request=request)
+
+
+class QueryDeadlineExceeded(TimeoutError):
+    """Raised when a query stage cannot finish before the request deadline."""
+
+    def __init__(self, stage: str) -> None:
+        super().__init__(f"Query deadline exceeded during {stage}")
+        self.stage = stage
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import re
+from collections import defaultdict
+
+from .base import BaseGraphStorage
+from .utils import logger
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_STOPWORDS = frozenset(
+    """
+    a about above after again against all also am an and any are as at be because
+    been before being below between both but by can could did do does doing down
+    during each few for from further had has have having he her here hers herself
+    him himself his how i if in into is it its itself just me more most my myself
+    no nor not now of off on once only or other our ours ourselves out over own
+    same she should so some such than that the their theirs them themselves then
+    there these they this those through to too under until up very was we were
+    what when where which while who whom why will with would you your yours
+    yourself yourselves please tell explain describe show give list know find
+    many much does make made get got use used using like way ways thing things
+    """.split()
+)
+
+
+def _tokenize(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+class LocalKeywordExtractor:
+    """CPU-only keyword extractor matching queries against the graph's entity names.
+
+    Low-level keywords are the entity names whose IDF-weighted tokens are mostly
+    covered by the query. High-level keywords are the query's remaining content
+    phrases (runs of non-stopword tokens) ranked by their summed IDF.
+
+    The vocabulary is built lazily from `get_all_labels()` and reused until
+    `invalidate()` is called after the graph changes.
+    """
+
+    def __init__(
+        self,
+        graph: BaseGraphStorage,
+        min_coverage: float = 0.6,
+        max_ll_keywords: int = 10,
+        max_hl_keywords: int = 5,
+    ):
+        self._graph = graph
+        self._min_coverage = min_coverage
+        self._max_ll_keywords = max_ll_keywords
+        self._max_hl_keywords = max_hl_keywords
+        self._lock = asyncio.Lock()
+        self._names: list[str] | None = None
+        self._name_tokens: list[set[str]] = []
+        self._name_weights: list[float] = []
+        self._postings: dict[str, list[int]] = {}
+        self._idf: dict[str, float] = {}
+        self._max_idf = 1.0
+
+    def invalidate(self) -> None:
+        """Drop the vocabulary so the next extraction rebuilds it from the graph."""
+        self._names = None
+
+    async def _ensure_vocabulary(self) -> None:
+        if self._names is not None:
+            return
+        async with self._lock:
+            if self._names is not None:
+                return
+            labels = await self._graph.get_all_labels()
+            self._build(labels)
+
+    def _build(self, labels: list[str]) -> None:
+        names, name_tokens = [], []
+        postings = defaultdict(list)
+        for label in labels:
+            name = label.strip().strip('"').strip()
+            tokens = {t for t in _tokenize(name) if t not in _STOPWORDS}
+            if not tokens:
+                continue
+            for t in tokens:
+                postings[t].append(len(names))
+            names.append(name)
+            name_tokens.append(tokens)
+
+        n_names = len(names)
+        idf = {
+            t: math.log((1 + n_names) / (1 + len(p))) + 1 for t, p in postings.items()
+        }
+        self._idf = idf
+        self._max_idf = math.log(1 + n_names) + 1
+        self._postings = dict(postings)
+        self._name_tokens = name_tokens
+        self._name_weights = [sum(idf[t] for t in tokens) for tokens in name_tokens]
+        self._names = names
+        logger.info(f"Local keyword vocabulary built with {n_names} entity names")
+
+    async def extract(self, text: str) -> tuple[list[str], list[str]]:
+        """Return (hl_keywords, ll_keywords) for `text` without calling the LLM."""
+        await self._ensure_vocabulary()
+
+        tokens = _tokenize(text)
+        query_tokens = {t for t in tokens if t not in _STOPWORDS}
+        if not query_tokens:
+            return [], []
+
+        # ll keywords: entity names mostly covered by the query tokens
+        matched_weight = defaultdict(float)
+        for t in query_tokens:
+            for i in self._postings.get(t, ()):
+                matched_weight[i] += self._idf[t]
+        scored = [
+            (weight / self._name_weights[i], len(self._name_tokens[i]), i)
+            for i, weight in matched_weight.items()
+            if weight / self._name_weights[i] >= self._min_coverage
+        ]
+        scored.sort(reverse=True)
+        ll_indices = [i for _, _, i in scored[: self._max_ll_keywords]]
+        ll_keywords = [self._names[i] for i in ll_indices]
+
+        # hl keywords: content phrases of the query not already used as entities
+        covered = set().union(*(self._name_tokens[i] for i in ll_indices))
+        phrases, current = [], []
+        for t in tokens + [""]:
+            if t and t not in _STOPWORDS:
+                current.append(t)
+            elif current:
+                phrases.append(current)
+                current = []
+        ranked = []
+        for phrase in phrases:
+            if set(phrase) <= covered:
+                continue
+            score = sum(self._idf.get(t, self._max_idf) for t in phrase)
+            ranked.append((score, " ".join(phrase)))
+        ranked.sort(reverse=True)
+        seen = set()
+        hl_keywords = []
+        for _, phrase in ranked:
+            if phrase not in seen:
+                seen.add(phrase)
+                hl_keywords.append(phrase)
+            if len(hl_keywords) >= self._max_hl_keywords:
+                break
+
+        # keep both sides non-empty so kg_query does not switch modes needlessly
+        if not hl_keywords and ll_keywords:
+            hl_keywords = [" ".join(t for t in tokens if t not in _STOPWORDS)]
+        if not ll_keywords and hl_keywords:
+            ll_keywords = list(hl_keywords)
+        return hl_keywords, ll_keywords
@@ -38,6 +38,9 @@ import psycopg
 from psycopg.rows import namedtuple_row
 from psycopg_pool import AsyncConnectionPool, PoolTimeout
 
+# Maximum number of graph write statements sent in one round trip
+_BATCH_UPSERT_SIZE = 200
+
 
 class AGEQueryException(Exception):
     """Exception for the AGE queries."""
@@ -593,6 +596,91 @@ class AGEStorage(BaseGraphStorage):
             logger.error("Error during edge upsert: {%s}", e)
             raise
 
+    async def _execute_batch(self, queries: list[str]) -> None:
+        """
+        Execute already wrapped write queries, _BATCH_UPSERT_SIZE statements per round trip.
+
+        Node ids are labels in AGE and cannot be bound from an UNWIND row, so the
+        statements stay per item but each chunk is sent as one multi-statement
+        transaction on a single connection.
+        """
+        await self._driver.open()
+        async with self._get_pool_connection() as conn:
+            async with conn.cursor() as curs:
+                try:
+                    await curs.execute('SET search_path = ag_catalog, "$user", public')
+                    for i in range(0, len(queries), _BATCH_UPSERT_SIZE):
+                        await curs.execute(
+                            "\n".join(queries[i : i + _BATCH_UPSERT_SIZE])
+                        )
+                    await conn.commit()
+                except psycopg.Error as e:
+                    await conn.rollback()
+                    raise AGEQueryException(
+                        {
+                            "message": f"Error executing batch of {len(queries)} graph queries",
+                            "detail": str(e),
+                        }
+                    ) from e
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((AGEQueryException,)),
+    )
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        query = """
+                MERGE (n:`{label}`)
+                SET n += {properties}
+                """
+        queries = [
+            self._wrap_query(
+                query,
+                self.graph_name,
+                label=AGEStorage._encode_graph_label(node_id.strip('"')),
+                properties=AGEStorage._format_properties(node_data),
+            )
+            for node_id, node_data in nodes.items()
+        ]
+        try:
+            await self._execute_batch(queries)
+            logger.debug("Upserted {%s} nodes", len(queries))
+        except Exception as e:
+            logger.error("Error during batch upsert: {%s}", e)
+            raise
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((AGEQueryException,)),
+    )
+    async def upsert_edges_batch(
+        self, edges: dict[tuple[str, str], dict[str, str]]
+    ) -> None:
+        query = """
+                MATCH (source:`{src_label}`)
+                WITH source
+                MATCH (target:`{tgt_label}`)
+                MERGE (source)-[r:DIRECTED]->(target)
+                SET r += {properties}
+                """
+        queries = [
+            self._wrap_query(
+                query,
+                self.graph_name,
+                src_label=AGEStorage._encode_graph_label(src.strip('"')),
+                tgt_label=AGEStorage._encode_graph_label(tgt.strip('"')),
+                properties=AGEStorage._format_properties(edge_data),
+            )
+            for (src, tgt), edge_data in edges.items()
+        ]
+        try:
+            await self._execute_batch(queries)
+            logger.debug("Upserted {%s} edges", len(queries))
+        except Exception as e:
+            logger.error("Error during batch edge upsert: {%s}", e)
+            raise
+
     async def _node2vec_embed(self):
         print("Implemented but never called.")
 
@@ -55,6 +55,7 @@ class ChromaVectorDBStorage(BaseVectorStorage):
             }
 
             local_path = config.get("local_path", None)
+            self._local_path = local_path
             if local_path:
                 self._client = PersistentClient(
                     path=local_path,
@@ -159,11 +160,37 @@ class ChromaVectorDBStorage(BaseVectorStorage):
     async def query(self, query: str, top_k: int) -> list[dict[str, Any]]:
         try:
             embedding = await self.embedding_func([query])
+        except Exception as e:
+            logger.error(f"Error during ChromaDB query: {str(e)}")
+            raise
+        return await self.query_by_vector(embedding[0], top_k)
+
+    async def query_by_vector(
+        self, embedding: np.ndarray, top_k: int
+    ) -> list[dict[str, Any]]:
+        results = await self._query_embeddings([embedding], top_k)
+        return results[0]
+
+    async def query_batch(
+        self, queries: list[str], top_k: int
+    ) -> list[list[dict[str, Any]]]:
+        if not queries:
+            return []
+        try:
+            embeddings = await self.embedding_func(queries)
+        except Exception as e:
+            logger.error(f"Error during ChromaDB query: {str(e)}")
+            raise
+        return await self._query_embeddings(list(embeddings), top_k)
 
+    async def _query_embeddings(
+        self, embeddings: list[np.ndarray], top_k: int
+    ) -> list[list[dict[str, Any]]]:
+        try:
             results = self._collection.query(
-                query_embeddings=embedding.tolist()
-                if not isinstance(embedding, list)
-                else embedding,
+                query_embeddings=[
+                    e.tolist() if not isinstance(e, list) else e for e in embeddings
+                ],
                 n_results=top_k * 2,  # Request more results to allow for filtering
                 include=["metadatas", "distances", "documents"],
             )
@@ -174,24 +201,54 @@ class ChromaVectorDBStorage(BaseVectorStorage):
             # We convert to distance (0 = identical, 1 = orthogonal) via (1 - similarity)
             # Only keep results with distance below threshold, then take top k
             return [
-                {
-                    "id": results["ids"][0][i],
-                    "distance": 1 - results["distances"][0][i],
-                    "content": results["documents"][0][i],
-                    **results["metadatas"][0][i],
-                }
-                for i in range(len(results["ids"][0]))
-                if (1 - results["distances"][0][i]) >= self.cosine_better_than_threshold
-            ][:top_k]
+                [
+                    {
+                        "id": results["ids"][q][i],
+                        "distance": 1 - results["distances"][q][i],
+                        "content": results["documents"][q][i],
+                        **results["metadatas"][q][i],
+                    }
+                    for i in range(len(results["ids"][q]))
+                    if (1 - results["distances"][q][i])
+                    >= self.cosine_better_than_threshold
+                ][:top_k]
+                for q in range(len(embeddings))
+            ]
 
         except Exception as e:
             logger.error(f"Error during ChromaDB query: {str(e)}")
             raise
 
+    async def get_vectors_by_ids(self, ids: list[str]) -> dict[str, np.ndarray]:
+        if not ids:
+            return {}
+        try:
+            results = self._collection.get(ids=ids, include=["embeddings"])
+            return {
+                id_: np.asarray(embedding, dtype=np.float32)
+                for id_, embedding in zip(results["ids"], results["embeddings"])
+            }
+        except Exception as e:
+            logger.error(f"Error retrieving vectors from ChromaDB: {str(e)}")
+            raise
+
     async def index_done_callback(self) -> None:
         # ChromaDB handles persistence automatically
         pass
 
+    async def finalize(self):
+        if not self._local_path:
+            return
+        # Chroma caches one system (sqlite connection, HNSW segments) per path for
+        # the life of the process, stop ours and drop it from that cache
+        system = getattr(self._client, "_system", None)
+        if system is not None:
+            system.stop()
+            getattr(type(self._client), "_identifer_to_system", {}).pop(
+                getattr(self._client, "_identifier", None), None
+            )
+        self._collection = None
+
     async def delete_entity(self, entity_name: str) -> None:
         raise NotImplementedError
 
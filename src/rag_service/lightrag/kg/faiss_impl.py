@@ -148,41 +148,38 @@ class FaissVectorDBStorage(BaseVectorStorage):
         Search by a textual query; returns top_k results with their metadata + similarity distance.
         """
         embedding = await self.embedding_func([query])
-        # embedding is shape (1, dim)
-        embedding = np.array(embedding, dtype=np.float32)
-        faiss.normalize_L2(embedding)  # we do in-place normalization
 
         logger.info(
             f"Query: {query}, top_k: {top_k}, threshold: {self.cosine_better_than_threshold}"
         )
+        return self._search(embedding, top_k)[0]
 
-        # Perform the similarity search
-        distances, indices = self._index.search(embedding, top_k)
-
-        distances = distances[0]
-        indices = indices[0]
-
-        results = []
-        for dist, idx in zip(distances, indices):
-            if idx == -1:
-                # Faiss returns -1 if no neighbor
-                continue
-
-            # Cosine similarity threshold
-            if dist < self.cosine_better_than_threshold:
-                continue
-
-            meta = self._id_to_meta.get(idx, {})
-            results.append(
-                {
-                    **meta,
-                    "id": meta.get("__id__"),
-                    "distance": float(dist),
-                    "created_at": meta.get("__created_at__"),
-                }
-            )
+    async def query_by_vector(
+        self, embedding: np.ndarray, top_k: int
+    ) -> list[dict[str, Any]]:
+        """
+        Search by a precomputed query embedding.
+        """
+        return self._search(np.reshape(embedding, (1, -1)), top_k)[0]
 
-        return results
+    async def query_batch(
+        self, queries: list[str], top_k: int
+    ) -> list[list[dict[str, Any]]]:
+        """
+        Embed all queries at once and run a single Faiss search over the batch.
+        """
+        if not queries:
+            return []
+        embeddings = await self.embedding_func(queries)
+        return self._search(embeddings, top_k)
+
+    async def get_vectors_by_ids(self, ids: list[str]) -> dict[str, np.ndarray]:
+        wanted = set(ids)
+        return {
+            meta["__id__"]: np.asarray(meta["__vector__"], dtype=np.float32)
+            for meta in self._id_to_meta.values()
+            if meta.get("__id__") in wanted
+        }
 
     @property
     def client_storage(self):
@@ -242,6 +239,40 @@ class FaissVectorDBStorage(BaseVectorStorage):
                 return fid
         return None
 
+    def _search(self, embeddings, top_k: int) -> list[list[dict[str, Any]]]:
+        """
+        Run a similarity search for a (n, dim) matrix of query embeddings.
+        """
+        embeddings = np.array(embeddings, dtype=np.float32)
+        faiss.normalize_L2(embeddings)  # we do in-place normalization
+
+        # Perform the similarity search
+        distances, indices = self._index.search(embeddings, top_k)
+
+        batch_results = []
+        for row_distances, row_indices in zip(distances, indices):
+            results = []
+            for dist, idx in zip(row_distances, row_indices):
+                if idx == -1:
+                    # Faiss returns -1 if no neighbor
+                    continue
+
+                # Cosine similarity threshold
+                if dist < self.cosine_better_than_threshold:
+                    continue
+
+                meta = self._id_to_meta.get(idx, {})
+                results.append(
+                    {
+                        **meta,
+                        "id": meta.get("__id__"),
+                        "distance": float(dist),
+                        "created_at": meta.get("__created_at__"),
+                    }
+                )
+            batch_results.append(results)
+        return batch_results
+
     def _remove_faiss_ids(self, fid_list):
         """
         Remove a list of internal Faiss IDs from the index.
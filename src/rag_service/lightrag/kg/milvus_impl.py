@@ -103,9 +103,33 @@ class MilvusVectorDBStorage(BaseVectorStorage):
 
     async def query(self, query: str, top_k: int) -> list[dict[str, Any]]:
         embedding = await self.embedding_func([query])
+        return self._search(embedding, top_k)[0]
+
+    async def query_by_vector(
+        self, embedding: np.ndarray, top_k: int
+    ) -> list[dict[str, Any]]:
+        return self._search([embedding], top_k)[0]
+
+    async def query_batch(
+        self, queries: list[str], top_k: int
+    ) -> list[list[dict[str, Any]]]:
+        if not queries:
+            return []
+        embeddings = await self.embedding_func(queries)
+        return self._search(embeddings, top_k)
+
+    async def get_vectors_by_ids(self, ids: list[str]) -> dict[str, np.ndarray]:
+        if not ids:
+            return {}
+        results = self._client.get(
+            collection_name=self.namespace, ids=ids, output_fields=["vector"]
+        )
+        return {dp["id"]: np.asarray(dp["vector"], dtype=np.float32) for dp in results}
+
+    def _search(self, embeddings, top_k: int) -> list[list[dict[str, Any]]]:
         results = self._client.search(
             collection_name=self.namespace,
-            data=embedding,
+            data=[list(e) for e in embeddings],
             limit=top_k,
             output_fields=list(self.meta_fields),
             search_params={
@@ -113,10 +137,13 @@ class MilvusVectorDBStorage(BaseVectorStorage):
                 "params": {"radius": self.cosine_better_than_threshold},
             },
         )
-        print(results)
+        logger.debug(f"query result: {results}")
         return [
-            {**dp["entity"], "id": dp["id"], "distance": dp["distance"]}
-            for dp in results[0]
+            [
+                {**dp["entity"], "id": dp["id"], "distance": dp["distance"]}
+                for dp in hits
+            ]
+            for hits in results
         ]
 
     async def index_done_callback(self) -> None:
@@ -0,0 +1,397 @@
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, final
+
+import numpy as np
+
+from src.rag_service.lightrag.utils import (
+    logger,
+    compute_mdhash_id,
+)
+from src.rag_service.lightrag.base import (
+    BaseVectorStorage,
+)
+
+
+# Number of rows de-quantized at once when scoring, bounds the float32 scratch memory
+_SCORE_BLOCK_ROWS = 65536
+
+_SUPPORTED_DTYPES = ("float16", "int8")
+
+
+@final
+@dataclass
+class MmapVectorDBStorage(BaseVectorStorage):
+    """
+    Local vector storage backed by a memory-mapped ``.npy`` matrix.
+
+    Vectors are L2-normalized and stored as float16, or as int8 with a per-row
+    float32 scale, so cosine similarity is a plain (de-quantized) dot product.
+    Metadata lives in a compact JSON side file; loading only maps the matrix
+    instead of parsing it, so startup time and resident memory stay small.
+
+    Files written to ``working_dir``:
+        - ``vdb_{namespace}.npy``: the vector matrix (float16 or int8)
+        - ``vdb_{namespace}.scale.npy``: per-row scales (int8 only)
+        - ``vdb_{namespace}.meta.json``: row-ordered ids and meta fields
+    """
+
+    def __post_init__(self):
+        # Initialize lock only for file operations
+        self._save_lock = asyncio.Lock()
+        kwargs = self.global_config.get("vector_db_storage_cls_kwargs", {})
+        cosine_threshold = kwargs.get("cosine_better_than_threshold")
+        if cosine_threshold is None:
+            raise ValueError(
+                "cosine_better_than_threshold must be specified in vector_db_storage_cls_kwargs"
+            )
+        self.cosine_better_than_threshold = cosine_threshold
+
+        self._dtype = kwargs.get("vector_dtype", "float16")
+        if self._dtype not in _SUPPORTED_DTYPES:
+            raise ValueError(
+                f"vector_dtype must be one of {_SUPPORTED_DTYPES}, got {self._dtype}"
+            )
+
+        working_dir = self.global_config["working_dir"]
+        self._matrix_file = os.path.join(working_dir, f"vdb_{self.namespace}.npy")
+        self._scale_file = os.path.join(working_dir, f"vdb_{self.namespace}.scale.npy")
+        self._meta_file = os.path.join(working_dir, f"vdb_{self.namespace}.meta.json")
+        self._max_batch_size = self.global_config["embedding_batch_num"]
+        self._dim = self.embedding_func.embedding_dim
+
+        self._load()
+
+    # --------------------------------------------------------------------------------
+    # Public API
+    # --------------------------------------------------------------------------------
+
+    async def upsert(self, data: dict[str, dict[str, Any]]) -> None:
+        logger.info(f"Inserting {len(data)} to {self.namespace}")
+        if not data:
+            return
+
+        current_time = time.time()
+        list_data = [
+            {
+                "__id__": k,
+                "__created_at__": current_time,
+                **{k1: v1 for k1, v1 in v.items() if k1 in self.meta_fields},
+            }
+            for k, v in data.items()
+        ]
+        contents = [v["content"] for v in data.values()]
+        batches = [
+            contents[i : i + self._max_batch_size]
+            for i in range(0, len(contents), self._max_batch_size)
+        ]
+
+        embedding_tasks = [self.embedding_func(batch) for batch in batches]
+        embeddings_list = await asyncio.gather(*embedding_tasks)
+
+        embeddings = np.concatenate(embeddings_list)
+        if len(embeddings) != len(list_data):
+            # sometimes the embedding is not returned correctly. just log it.
+            logger.error(
+                f"embedding is not 1-1 with data, {len(embeddings)} != {len(list_data)}"
+            )
+            return
+
+        rows, scales = self._quantize(embeddings)
+        self._materialize()
+
+        new_rows, new_scales, new_meta = [], [], []
+        for i, meta in enumerate(list_data):
+            row_idx = self._id_to_row.get(meta["__id__"])
+            if row_idx is not None:
+                self._matrix[row_idx] = rows[i]
+                self._scales[row_idx] = scales[i]
+                self._meta[row_idx] = meta
+            else:
+                self._id_to_row[meta["__id__"]] = len(self._meta) + len(new_meta)
+                new_rows.append(rows[i])
+                new_scales.append(scales[i])
+                new_meta.append(meta)
+
+        if new_meta:
+            self._matrix = np.concatenate([self._matrix, np.stack(new_rows)])
+            self._scales = np.concatenate(
+                [self._scales, np.asarray(new_scales, dtype=np.float32)]
+            )
+            self._meta.extend(new_meta)
+        return [m["__id__"] for m in list_data]
+
+    async def query(self, query: str, top_k: int) -> list[dict[str, Any]]:
+        embedding = await self.embedding_func([query])
+        return await self.query_by_vector(embedding[0], top_k)
+
+    async def query_by_vector(
+        self, embedding: np.ndarray, top_k: int
+    ) -> list[dict[str, Any]]:
+        return self._top_k(self._normalize(embedding)[None, :], top_k)[0]
+
+    async def query_batch(
+        self, queries: list[str], top_k: int
+    ) -> list[list[dict[str, Any]]]:
+        if not queries:
+            return []
+        embeddings = await self.embedding_func(queries)
+        query_matrix = np.stack([self._normalize(e) for e in embeddings])
+        return self._top_k(query_matrix, top_k)
+
+    async def get_vectors_by_ids(self, ids: list[str]) -> dict[str, np.ndarray]:
+        vectors = {}
+        for id_ in ids:
+            row_idx = self._id_to_row.get(id_)
+            if row_idx is None:
+                continue
+            vectors[id_] = (
+                self._matrix[row_idx].astype(np.float32) * self._scales[row_idx]
+            )
+        return vectors
+
+    @property
+    def client_storage(self):
+        return {"data": self._meta}
+
+    async def delete(self, ids: list[str]):
+        """Delete vectors with specified IDs
+
+        Args:
+            ids: List of vector IDs to be deleted
+        """
+        try:
+            drop_rows = {self._id_to_row[i] for i in ids if i in self._id_to_row}
+            if drop_rows:
+                self._drop_rows(drop_rows)
+            logger.info(
+                f"Successfully deleted {len(drop_rows)} vectors from {self.namespace}"
+            )
+        except Exception as e:
+            logger.error(f"Error while deleting vectors from {self.namespace}: {e}")
+
+    async def delete_entity(self, entity_name: str) -> None:
+        try:
+            entity_id = compute_mdhash_id(entity_name, prefix="ent-")
+            logger.debug(
+                f"Attempting to delete entity {entity_name} with ID {entity_id}"
+            )
+            if entity_id in self._id_to_row:
+                await self.delete([entity_id])
+                logger.debug(f"Successfully deleted entity {entity_name}")
+            else:
+                logger.debug(f"Entity {entity_name} not found in storage")
+        except Exception as e:
+            logger.error(f"Error deleting entity {entity_name}: {e}")
+
+    async def delete_entity_relation(self, entity_name: str) -> None:
+        try:
+            ids_to_delete = [
+                dp["__id__"]
+                for dp in self._meta
+                if dp.get("src_id") == entity_name or dp.get("tgt_id") == entity_name
+            ]
+            logger.debug(
+                f"Found {len(ids_to_delete)} relations for entity {entity_name}"
+            )
+            if ids_to_delete:
+                await self.delete(ids_to_delete)
+                logger.debug(
+                    f"Deleted {len(ids_to_delete)} relations for {entity_name}"
+                )
+            else:
+                logger.debug(f"No relations found for entity {entity_name}")
+        except Exception as e:
+            logger.error(f"Error deleting relations for {entity_name}: {e}")
+
+    async def index_done_callback(self) -> None:
+        async with self._save_lock:
+            if not self._dirty:
+                return
+            self._save()
+
+    async def finalize(self):
+        # Unmap the vector files, the storage is not queried afterwards
+        async with self._save_lock:
+            self._matrix = self._empty_matrix()
+            self._scales = np.zeros(0, dtype=np.float32)
+            self._meta = []
+            self._id_to_row = {}
+
+    # --------------------------------------------------------------------------------
+    # Internal helper methods
+    # --------------------------------------------------------------------------------
+
+    def _empty_matrix(self) -> np.ndarray:
+        return np.zeros((0, self._dim), dtype=np.dtype(self._dtype))
+
+    def _quantize(self, embeddings: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Normalize rows and convert them to the storage dtype.
+
+        Returns the converted rows and their per-row scales (all ones for float16).
+        """
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        vectors = vectors / norms
+
+        if self._dtype == "float16":
+            return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+
+        max_abs = np.abs(vectors).max(axis=1)
+        scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype(np.float32)
+        rows = np.round(vectors / scales[:, None]).clip(-127, 127).astype(np.int8)
+        return rows, scales
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        query_vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(query_vec)
+        if norm > 0:
+            query_vec = query_vec / norm
+        return query_vec
+
+    def _score(self, query_matrix: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every stored row against normalized query vectors.
+
+        ``query_matrix`` has shape (n_queries, dim); the result is (n_queries, n_rows),
+        so each de-quantized block is shared by all queries in the batch.
+        """
+        n_rows = len(self._meta)
+        scores = np.empty((len(query_matrix), n_rows), dtype=np.float32)
+        for start in range(0, n_rows, _SCORE_BLOCK_ROWS):
+            block = self._matrix[start : start + _SCORE_BLOCK_ROWS]
+            scores[:, start : start + len(block)] = (
+                query_matrix @ block.astype(np.float32).T
+            )
+        if self._dtype == "int8":
+            scores *= self._scales[:n_rows]
+        return scores
+
+    def _top_k(
+        self, query_matrix: np.ndarray, top_k: int
+    ) -> list[list[dict[str, Any]]]:
+        if not len(self._meta):
+            return [[] for _ in range(len(query_matrix))]
+
+        all_scores = self._score(query_matrix)
+        k = min(top_k, all_scores.shape[1])
+        batch_results = []
+        for scores in all_scores:
+            top_idx = np.argpartition(-scores, k - 1)[:k]
+            top_idx = top_idx[np.argsort(-scores[top_idx])]
+
+            results = []
+            for idx in top_idx:
+                score = float(scores[idx])
+                if score < self.cosine_better_than_threshold:
+                    break
+                meta = self._meta[idx]
+                results.append(
+                    {
+                        **meta,
+                        "id": meta["__id__"],
+                        "distance": score,
+                        "created_at": meta.get("__created_at__"),
+                    }
+                )
+            batch_results.append(results)
+        return batch_results
+
+    def _materialize(self) -> None:
+        """Swap the read-only memory maps for writable in-memory copies before mutation."""
+        if isinstance(self._matrix, np.memmap):
+            self._matrix = np.array(self._matrix)
+        if isinstance(self._scales, np.memmap):
+            self._scales = np.array(self._scales)
+        self._dirty = True
+
+    def _drop_rows(self, drop_rows: set[int]) -> None:
+        self._materialize()
+        keep = np.ones(len(self._meta), dtype=bool)
+        keep[list(drop_rows)] = False
+        self._matrix = self._matrix[keep]
+        self._scales = self._scales[keep]
+        self._meta = [m for i, m in enumerate(self._meta) if keep[i]]
+        self._id_to_row = {m["__id__"]: i for i, m in enumerate(self._meta)}
+
+    def _load(self) -> None:
+        self._dirty = False
+        self._matrix = self._empty_matrix()
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._meta: list[dict[str, Any]] = []
+        self._id_to_row: dict[str, int] = {}
+
+        if not (os.path.exists(self._matrix_file) and os.path.exists(self._meta_file)):
+            logger.info(
+                f"No existing vector file for {self.namespace}. Starting fresh."
+            )
+            return
+
+        try:
+            with open(self._meta_file, encoding="utf-8") as f:
+                stored = json.load(f)
+            matrix = np.load(self._matrix_file, mmap_mode="r")
+            if stored.get("dtype") != self._dtype or matrix.shape[1:] != (self._dim,):
+                raise ValueError(
+                    f"stored vectors are {stored.get('dtype')} {matrix.shape}, "
+                    f"expected {self._dtype} with dimension {self._dim}"
+                )
+            if self._dtype == "int8":
+                scales = np.load(self._scale_file, mmap_mode="r")
+            else:
+                scales = np.ones(len(matrix), dtype=np.float32)
+            # The files are replaced one by one on save, a crash in between leaves
+            # them out of step and rows would be returned under the wrong ids
+            if not len(matrix) == len(scales) == len(stored["data"]):
+                raise ValueError(
+                    f"stored files disagree: {len(matrix)} vectors, "
+                    f"{len(scales)} scales, {len(stored['data'])} metadata entries"
+                )
+
+            self._matrix = matrix
+            self._scales = scales
+            self._meta = stored["data"]
+            self._id_to_row = {m["__id__"]: i for i, m in enumerate(self._meta)}
+            logger.info(
+                f"Mapped {len(self._meta)} {self._dtype} vectors from {self._matrix_file}"
+            )
+        except Exception as e:
+            logger.error(f"Failed to load vectors for {self.namespace}: {e}")
+            logger.warning("Starting with an empty vector storage.")
+            self._matrix = self._empty_matrix()
+            self._scales = np.zeros(0, dtype=np.float32)
+            self._meta = []
+            self._id_to_row = {}
+
+    def _save(self) -> None:
+        """Write the matrix, scales and metadata via temp files, then re-map them read-only."""
+        matrix_tmp = self._matrix_file + ".tmp"
+        with open(matrix_tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(self._matrix))
+        if self._dtype == "int8":
+            scale_tmp = self._scale_file + ".tmp"
+            with open(scale_tmp, "wb") as f:
+                np.save(f, np.ascontiguousarray(self._scales))
+        meta_tmp = self._meta_file + ".tmp"
+        with open(meta_tmp, "w", encoding="utf-8") as f:
+            json.dump(
+                {"dtype": self._dtype, "dim": self._dim, "data": self._meta},
+                f,
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+
+        os.replace(matrix_tmp, self._matrix_file)
+        if self._dtype == "int8":
+            os.replace(scale_tmp, self._scale_file)
+        os.replace(meta_tmp, self._meta_file)
+
+        self._matrix = np.load(self._matrix_file, mmap_mode="r")
+        if self._dtype == "int8":
+            self._scales = np.load(self._scale_file, mmap_mode="r")
+        self._dirty = False
+        logger.info(f"Saved {len(self._meta)} vectors to {self._matrix_file}")
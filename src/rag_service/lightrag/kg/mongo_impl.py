@@ -30,7 +30,7 @@ from motor.motor_asyncio import (
     AsyncIOMotorDatabase,
     AsyncIOMotorCollection,
 )
-from pymongo.operations import SearchIndexModel
+from pymongo.operations import SearchIndexModel, UpdateOne
 from pymongo.errors import PyMongoError
 
 config = configparser.ConfigParser()
@@ -527,6 +527,92 @@ class MongoGraphStorage(BaseGraphStorage):
         edges = result[0].get("edges", [])
         return [(source_node_id, e["target"]) for e in edges]
 
+    #
+    # -------------------------------------------------------------------------
+    # BATCHED READS
+    # -------------------------------------------------------------------------
+    #
+
+    async def get_nodes_batch(self, node_ids: list[str]) -> dict[str, dict]:
+        """
+        Fetch all requested node documents with a single $in query.
+        """
+        cursor = self.collection.find({"_id": {"$in": node_ids}})
+        return {doc["_id"]: doc async for doc in cursor}
+
+    async def node_degrees_batch(self, node_ids: list[str]) -> dict[str, int]:
+        """
+        Outbound edges come from each node's own edges array, inbound edges from a
+        single aggregation over every doc pointing at any of the requested nodes.
+        """
+        degrees = {node_id: 0 for node_id in node_ids}
+        cursor = self.collection.find({"_id": {"$in": node_ids}}, {"edges.target": 1})
+        async for doc in cursor:
+            degrees[doc["_id"]] += len(doc.get("edges", []))
+
+        inbound_count_pipeline = [
+            {"$match": {"edges.target": {"$in": node_ids}}},
+            {"$unwind": "$edges"},
+            {"$match": {"edges.target": {"$in": node_ids}}},
+            {"$group": {"_id": "$edges.target", "totalInbound": {"$sum": 1}}},
+        ]
+        inbound_cursor = self.collection.aggregate(inbound_count_pipeline)
+        async for doc in inbound_cursor:
+            degrees[doc["_id"]] += doc["totalInbound"]
+        return degrees
+
+    async def get_nodes_with_degrees_batch(
+        self, node_ids: list[str]
+    ) -> dict[str, dict]:
+        """
+        Node documents already carry their outbound edges, so only the inbound
+        counts need the extra aggregation.
+        """
+        nodes = await self.get_nodes_batch(node_ids)
+        if not nodes:
+            return {}
+        degrees = {node_id: len(doc.get("edges", [])) for node_id, doc in nodes.items()}
+        inbound_count_pipeline = [
+            {"$match": {"edges.target": {"$in": list(nodes)}}},
+            {"$unwind": "$edges"},
+            {"$match": {"edges.target": {"$in": list(nodes)}}},
+            {"$group": {"_id": "$edges.target", "totalInbound": {"$sum": 1}}},
+        ]
+        async for doc in self.collection.aggregate(inbound_count_pipeline):
+            degrees[doc["_id"]] += doc["totalInbound"]
+        return {
+            node_id: {**doc, "degree": degrees[node_id]}
+            for node_id, doc in nodes.items()
+        }
+
+    async def get_edges_batch(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], dict]:
+        """
+        Load the edges arrays of all source nodes at once and pick the requested targets.
+        """
+        source_ids = list({src for src, _ in pairs})
+        cursor = self.collection.find({"_id": {"$in": source_ids}}, {"edges": 1})
+        edges_by_pair = {}
+        async for doc in cursor:
+            for e in doc.get("edges", []):
+                edges_by_pair.setdefault((doc["_id"], e.get("target")), e)
+        return {pair: edges_by_pair[pair] for pair in pairs if pair in edges_by_pair}
+
+    async def get_nodes_edges_batch(
+        self, node_ids: list[str]
+    ) -> dict[str, list[tuple[str, str]]]:
+        """
+        Return (source_id, target_id) pairs for the direct edges of every requested node.
+        """
+        edges = {node_id: [] for node_id in node_ids}
+        cursor = self.collection.find({"_id": {"$in": node_ids}}, {"edges.target": 1})
+        async for doc in cursor:
+            edges[doc["_id"]] = [
+                (doc["_id"], e["target"]) for e in doc.get("edges", [])
+            ]
+        return edges
+
     #
     # -------------------------------------------------------------------------
     # UPSERTS
@@ -564,6 +650,54 @@ class MongoGraphStorage(BaseGraphStorage):
             {"_id": source_node_id}, {"$push": {"edges": new_edge}}
         )
 
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        """
+        Upsert all node documents with a single unordered bulk write.
+        """
+        if not nodes:
+            return
+        await self.collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": node_id},
+                    {"$set": {**node_data}, "$setOnInsert": {"edges": []}},
+                    upsert=True,
+                )
+                for node_id, node_data in nodes.items()
+            ],
+            ordered=False,
+        )
+
+    async def upsert_edges_batch(
+        self, edges: dict[tuple[str, str], dict[str, str]]
+    ) -> None:
+        """
+        Same steps as upsert_edge for every edge (ensure source, pull old edge, push
+        new edge), sent as one ordered bulk write so a pull always precedes its push.
+        """
+        if not edges:
+            return
+        operations = []
+        for (source_node_id, target_node_id), edge_data in edges.items():
+            operations.extend(
+                [
+                    UpdateOne(
+                        {"_id": source_node_id},
+                        {"$setOnInsert": {"edges": []}},
+                        upsert=True,
+                    ),
+                    UpdateOne(
+                        {"_id": source_node_id},
+                        {"$pull": {"edges": {"target": target_node_id}}},
+                    ),
+                    UpdateOne(
+                        {"_id": source_node_id},
+                        {"$push": {"edges": {"target": target_node_id, **edge_data}}},
+                    ),
+                ]
+            )
+        await self.collection.bulk_write(operations, ordered=True)
+
     #
     # -------------------------------------------------------------------------
     # DELETION
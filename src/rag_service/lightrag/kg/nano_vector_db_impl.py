@@ -81,7 +81,11 @@ class NanoVectorDBStorage(BaseVectorStorage):
 
     async def query(self, query: str, top_k: int) -> list[dict[str, Any]]:
         embedding = await self.embedding_func([query])
-        embedding = embedding[0]
+        return await self.query_by_vector(embedding[0], top_k)
+
+    async def query_by_vector(
+        self, embedding: np.ndarray, top_k: int
+    ) -> list[dict[str, Any]]:
         results = self._client.query(
             query=embedding,
             top_k=top_k,
@@ -98,6 +102,15 @@ class NanoVectorDBStorage(BaseVectorStorage):
         ]
         return results
 
+    async def get_vectors_by_ids(self, ids: list[str]) -> dict[str, np.ndarray]:
+        wanted = set(ids)
+        storage = self.client_storage
+        return {
+            dp["__id__"]: np.asarray(storage["matrix"][i], dtype=np.float32)
+            for i, dp in enumerate(storage["data"])
+            if dp["__id__"] in wanted
+        }
+
     @property
     def client_storage(self):
         return getattr(self._client, "_NanoVectorDB__storage")
@@ -34,6 +34,9 @@ from neo4j import (
 config = configparser.ConfigParser()
 config.read("config.ini", "utf-8")
 
+# Maximum number of per-item sub-queries combined into one batched read
+_BATCH_QUERY_SIZE = 200
+
 
 @final
 @dataclass
@@ -377,6 +380,127 @@ class Neo4JStorage(BaseGraphStorage):
 
             return edges
 
+    @staticmethod
+    def _escape_label(label: str) -> str:
+        return label.strip('"').replace("`", "``")
+
+    async def _run_per_label_union(self, branches: list[str]) -> list[dict[str, Any]]:
+        """
+        Run one read query per chunk of ``branches`` joined with UNION ALL.
+
+        Node ids are labels, which Cypher cannot take as parameters, so batched
+        lookups are expressed as a union of per-label sub-queries sharing a single
+        round trip instead of one session per item.
+        """
+        records = []
+        async with self._driver.session(database=self._DATABASE) as session:
+            for i in range(0, len(branches), _BATCH_QUERY_SIZE):
+                query = " UNION ALL ".join(branches[i : i + _BATCH_QUERY_SIZE])
+                result = await session.run(query)
+                records.extend(await result.data())
+        return records
+
+    async def get_nodes_batch(self, node_ids: list[str]) -> dict[str, dict]:
+        branches = [
+            f"MATCH (n:`{self._escape_label(node_id)}`) RETURN {i} AS idx, n"
+            for i, node_id in enumerate(node_ids)
+        ]
+        records = await self._run_per_label_union(branches)
+        return {node_ids[r["idx"]]: dict(r["n"]) for r in records}
+
+    async def node_degrees_batch(self, node_ids: list[str]) -> dict[str, int]:
+        branches = [
+            f"MATCH (n:`{self._escape_label(node_id)}`) "
+            f"RETURN {i} AS idx, COUNT {{ (n)--() }} AS degree"
+            for i, node_id in enumerate(node_ids)
+        ]
+        degrees = {node_id: 0 for node_id in node_ids}
+        for r in await self._run_per_label_union(branches):
+            degrees[node_ids[r["idx"]]] = int(r["degree"] or 0)
+        return degrees
+
+    async def get_edges_batch(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], dict]:
+        branches = [
+            f"MATCH (start:`{self._escape_label(src)}`)-[r]->(end:`{self._escape_label(tgt)}`) "
+            f"RETURN {i} AS idx, properties(r) AS edge_properties LIMIT 1"
+            for i, (src, tgt) in enumerate(pairs)
+        ]
+        found = {
+            r["idx"]: dict(r["edge_properties"])
+            for r in await self._run_per_label_union(branches)
+        }
+
+        # Mirror get_edge: missing edges and keys fall back to default properties
+        required_keys = {
+            "weight": 0.0,
+            "source_id": None,
+            "description": None,
+            "keywords": None,
+        }
+        return {
+            pair: {**required_keys, **found.get(i, {})} for i, pair in enumerate(pairs)
+        }
+
+    async def get_nodes_edges_batch(
+        self, node_ids: list[str]
+    ) -> dict[str, list[tuple[str, str]]]:
+        branches = [
+            f"MATCH (n:`{self._escape_label(node_id)}`) "
+            f"OPTIONAL MATCH (n)--(connected) "
+            f"RETURN {i} AS idx, labels(n) AS source_labels, "
+            f"labels(connected) AS target_labels"
+            for i, node_id in enumerate(node_ids)
+        ]
+        edges = {node_id: [] for node_id in node_ids}
+        for r in await self._run_per_label_union(branches):
+            if r["source_labels"] and r["target_labels"]:
+                edges[node_ids[r["idx"]]].append(
+                    (r["source_labels"][0], r["target_labels"][0])
+                )
+        return edges
+
+    async def get_nodes_with_degrees_batch(
+        self, node_ids: list[str]
+    ) -> dict[str, dict]:
+        # Neo4j keeps per-node relationship counts, so the degree comes at no extra cost
+        branches = [
+            f"MATCH (n:`{self._escape_label(node_id)}`) "
+            f"RETURN {i} AS idx, n, COUNT {{ (n)--() }} AS degree"
+            for i, node_id in enumerate(node_ids)
+        ]
+        return {
+            node_ids[r["idx"]]: {**dict(r["n"]), "degree": int(r["degree"] or 0)}
+            for r in await self._run_per_label_union(branches)
+        }
+
+    async def get_edges_with_degrees_batch(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], dict]:
+        branches = [
+            f"MATCH (start:`{self._escape_label(src)}`)-[r]->(end:`{self._escape_label(tgt)}`) "
+            f"RETURN {i} AS idx, properties(r) AS edge_properties, "
+            f"COUNT {{ (start)--() }} + COUNT {{ (end)--() }} AS degree LIMIT 1"
+            for i, (src, tgt) in enumerate(pairs)
+        ]
+        found = {
+            r["idx"]: {**dict(r["edge_properties"]), "degree": int(r["degree"] or 0)}
+            for r in await self._run_per_label_union(branches)
+        }
+
+        # Mirror get_edges_batch: missing edges and keys fall back to default properties
+        required_keys = {
+            "weight": 0.0,
+            "source_id": None,
+            "description": None,
+            "keywords": None,
+            "degree": 0,
+        }
+        return {
+            pair: {**required_keys, **found.get(i, {})} for i, pair in enumerate(pairs)
+        }
+
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=4, max=10),
@@ -466,6 +590,82 @@ class Neo4JStorage(BaseGraphStorage):
             logger.error(f"Error during edge upsert: {str(e)}")
             raise
 
+    async def _run_write_batch(
+        self, statements: list[str], params: list[dict[str, Any]]
+    ) -> None:
+        """
+        Execute unit ``CALL {}`` sub-queries in chunks, one write transaction per chunk.
+
+        Labels cannot be parameterized, so a plain UNWIND over the rows is not possible;
+        each row becomes its own sub-query with its properties passed as ``$p<i>``.
+        """
+
+        async def _do_write(tx: AsyncManagedTransaction, query: str, chunk_params):
+            await tx.run(query, **chunk_params)
+
+        async with self._driver.session(database=self._DATABASE) as session:
+            for start in range(0, len(statements), _BATCH_QUERY_SIZE):
+                chunk = range(start, min(start + _BATCH_QUERY_SIZE, len(statements)))
+                query = "\n".join(f"CALL {{ {statements[i]} }}" for i in chunk)
+                chunk_params = {f"p{i}": params[i] for i in chunk}
+                await session.execute_write(_do_write, query, chunk_params)
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type(
+            (
+                neo4jExceptions.ServiceUnavailable,
+                neo4jExceptions.TransientError,
+                neo4jExceptions.WriteServiceUnavailable,
+                neo4jExceptions.ClientError,
+            )
+        ),
+    )
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        statements, params = [], []
+        for i, (node_id, node_data) in enumerate(nodes.items()):
+            statements.append(
+                f"MERGE (n:`{self._escape_label(node_id)}`) SET n += $p{i}"
+            )
+            params.append(node_data)
+        try:
+            await self._run_write_batch(statements, params)
+            logger.debug(f"Upserted {len(statements)} nodes")
+        except Exception as e:
+            logger.error(f"Error during batch upsert: {str(e)}")
+            raise
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type(
+            (
+                neo4jExceptions.ServiceUnavailable,
+                neo4jExceptions.TransientError,
+                neo4jExceptions.WriteServiceUnavailable,
+                neo4jExceptions.ClientError,
+            )
+        ),
+    )
+    async def upsert_edges_batch(
+        self, edges: dict[tuple[str, str], dict[str, str]]
+    ) -> None:
+        statements, params = [], []
+        for i, ((src, tgt), edge_data) in enumerate(edges.items()):
+            statements.append(
+                f"MATCH (source:`{self._escape_label(src)}`) "
+                f"WITH source MATCH (target:`{self._escape_label(tgt)}`) "
+                f"MERGE (source)-[r:DIRECTED]->(target) SET r += $p{i}"
+            )
+            params.append(edge_data)
+        try:
+            await self._run_write_batch(statements, params)
+            logger.debug(f"Upserted {len(statements)} edges")
+        except Exception as e:
+            logger.error(f"Error during batch edge upsert: {str(e)}")
+            raise
+
     async def _node2vec_embed(self):
         print("Implemented but never called.")
 
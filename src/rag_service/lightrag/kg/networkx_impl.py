@@ -1,4 +1,7 @@
+import json
 import os
+import sqlite3
+from contextlib import closing
 from dataclasses import dataclass
 from typing import Any, final
 
@@ -29,14 +32,53 @@ import networkx as nx
 from graspologic import embed
 
 
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (id TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS edges (
+    src TEXT NOT NULL,
+    tgt TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (src, tgt)
+);
+"""
+
+
+def _edge_key(source: str, target: str) -> tuple[str, str]:
+    """Edges are undirected, store each one under a single (min, max) key."""
+    return (source, target) if source <= target else (target, source)
+
+
 @final
 @dataclass
 class NetworkXStorage(BaseGraphStorage):
+    """
+    In-memory NetworkX graph persisted to a SQLite node/edge table.
+
+    Only nodes and edges changed since the last flush are written by
+    ``index_done_callback``, and the file is read on first access rather than at
+    construction. A legacy ``graph_{namespace}.graphml`` file is migrated on first
+    load; GraphML export can be re-enabled with ``graphml_export`` in
+    ``graph_storage_cls_kwargs``.
+    """
+
     @staticmethod
     def load_nx_graph(file_name) -> nx.Graph:
-        if os.path.exists(file_name):
+        if not os.path.exists(file_name):
+            return None
+        if file_name.endswith(".graphml"):
             return nx.read_graphml(file_name)
-        return None
+
+        graph = nx.Graph()
+        with closing(sqlite3.connect(file_name)) as conn:
+            graph.add_nodes_from(
+                (node_id, json.loads(data))
+                for node_id, data in conn.execute("SELECT id, data FROM nodes")
+            )
+            graph.add_edges_from(
+                (src, tgt, json.loads(data))
+                for src, tgt, data in conn.execute("SELECT src, tgt, data FROM edges")
+            )
+        return graph
 
     @staticmethod
     def write_nx_graph(graph: nx.Graph, file_name):
@@ -79,21 +121,107 @@ class NetworkXStorage(BaseGraphStorage):
         return fixed_graph
 
     def __post_init__(self):
+        working_dir = self.global_config["working_dir"]
+        self._sqlite_file = os.path.join(working_dir, f"graph_{self.namespace}.sqlite")
         self._graphml_xml_file = os.path.join(
-            self.global_config["working_dir"], f"graph_{self.namespace}.graphml"
+            working_dir, f"graph_{self.namespace}.graphml"
         )
+        kwargs = self.global_config.get("graph_storage_cls_kwargs", {})
+        self._graphml_export = kwargs.get("graphml_export", False)
+
+        self._loaded_graph: nx.Graph | None = None
+        self._dirty_nodes: set[str] = set()
+        self._dirty_edges: set[tuple[str, str]] = set()
+        self._node_embed_algorithms = {
+            "node2vec": self._node2vec_embed,
+        }
+
+    @property
+    def _graph(self) -> nx.Graph:
+        if self._loaded_graph is None:
+            self._loaded_graph = self._load_graph()
+        return self._loaded_graph
+
+    def _load_graph(self) -> nx.Graph:
+        preloaded_graph = NetworkXStorage.load_nx_graph(self._sqlite_file)
+        if preloaded_graph is not None:
+            logger.info(
+                f"Loaded graph from {self._sqlite_file} with {preloaded_graph.number_of_nodes()} nodes, {preloaded_graph.number_of_edges()} edges"
+            )
+            return preloaded_graph
+
         preloaded_graph = NetworkXStorage.load_nx_graph(self._graphml_xml_file)
         if preloaded_graph is not None:
             logger.info(
-                f"Loaded graph from {self._graphml_xml_file} with {preloaded_graph.number_of_nodes()} nodes, {preloaded_graph.number_of_edges()} edges"
+                f"Migrating graph from {self._graphml_xml_file} with {preloaded_graph.number_of_nodes()} nodes, {preloaded_graph.number_of_edges()} edges"
+            )
+            # Everything is written to SQLite on the next flush
+            self._dirty_nodes.update(preloaded_graph.nodes)
+            self._dirty_edges.update(_edge_key(u, v) for u, v in preloaded_graph.edges)
+            return preloaded_graph
+        return nx.Graph()
+
+    def _mark_node(self, node_id: str) -> None:
+        self._dirty_nodes.add(node_id)
+        # removing a node drops its edges, make sure they are flushed too
+        if node_id in self._graph:
+            self._dirty_edges.update(
+                _edge_key(u, v) for u, v in self._graph.edges(node_id)
             )
-        self._graph = preloaded_graph or nx.Graph()
-        self._node_embed_algorithms = {
-            "node2vec": self._node2vec_embed,
-        }
+
+    def _mark_edge(self, source_node_id: str, target_node_id: str) -> None:
+        self._dirty_edges.add(_edge_key(source_node_id, target_node_id))
+
+    def _flush(self) -> None:
+        """Write dirty nodes and edges to SQLite in one transaction, deleting removed ones."""
+        graph = self._graph
+        node_rows, deleted_nodes = [], []
+        for node_id in self._dirty_nodes:
+            if node_id in graph:
+                node_rows.append((node_id, json.dumps(graph.nodes[node_id])))
+            else:
+                deleted_nodes.append((node_id,))
+        edge_rows, deleted_edges = [], []
+        for src, tgt in self._dirty_edges:
+            if graph.has_edge(src, tgt):
+                edge_rows.append((src, tgt, json.dumps(graph.edges[src, tgt])))
+            else:
+                deleted_edges.append((src, tgt))
+
+        with closing(sqlite3.connect(self._sqlite_file)) as conn, conn:
+            conn.executescript(_SQLITE_SCHEMA)
+            conn.executemany("DELETE FROM nodes WHERE id = ?", deleted_nodes)
+            conn.executemany(
+                "DELETE FROM edges WHERE src = ? AND tgt = ?", deleted_edges
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO nodes (id, data) VALUES (?, ?)", node_rows
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO edges (src, tgt, data) VALUES (?, ?, ?)",
+                edge_rows,
+            )
+        logger.info(
+            f"Flushed graph changes to {self._sqlite_file}: {len(node_rows)} nodes, {len(edge_rows)} edges written, "
+            f"{len(deleted_nodes)} nodes, {len(deleted_edges)} edges deleted"
+        )
+        self._dirty_nodes.clear()
+        self._dirty_edges.clear()
 
     async def index_done_callback(self) -> None:
-        NetworkXStorage.write_nx_graph(self._graph, self._graphml_xml_file)
+        if self._loaded_graph is None:
+            # never loaded, so nothing changed
+            return
+        if self._dirty_nodes or self._dirty_edges:
+            self._flush()
+        if self._graphml_export:
+            NetworkXStorage.write_nx_graph(self._graph, self._graphml_xml_file)
+
+    def export_graphml(self, file_name: str | None = None) -> str:
+        """Write the current graph as GraphML, by default next to the SQLite file."""
+        file_name = file_name or self._graphml_xml_file
+        NetworkXStorage.write_nx_graph(self._graph, file_name)
+        return file_name
 
     async def has_node(self, node_id: str) -> bool:
         return self._graph.has_node(node_id)
@@ -120,16 +248,75 @@ class NetworkXStorage(BaseGraphStorage):
             return list(self._graph.edges(source_node_id))
         return None
 
+    async def get_nodes_batch(self, node_ids: list[str]) -> dict[str, dict]:
+        nodes = self._graph.nodes
+        return {n: nodes[n] for n in node_ids if n in nodes}
+
+    async def node_degrees_batch(self, node_ids: list[str]) -> dict[str, int]:
+        graph = self._graph
+        return {n: graph.degree(n) if n in graph else 0 for n in node_ids}
+
+    async def get_edges_batch(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], dict]:
+        edges = self._graph.edges
+        return {pair: edges[pair] for pair in pairs if pair in edges}
+
+    async def get_nodes_edges_batch(
+        self, node_ids: list[str]
+    ) -> dict[str, list[tuple[str, str]]]:
+        graph = self._graph
+        return {n: list(graph.edges(n)) if n in graph else [] for n in node_ids}
+
+    async def get_nodes_with_degrees_batch(
+        self, node_ids: list[str]
+    ) -> dict[str, dict]:
+        graph = self._graph
+        return {
+            n: {**graph.nodes[n], "degree": graph.degree(n)}
+            for n in node_ids
+            if n in graph
+        }
+
+    async def get_edges_with_degrees_batch(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], dict]:
+        graph = self._graph
+        return {
+            (s, t): {**graph.edges[s, t], "degree": graph.degree(s) + graph.degree(t)}
+            for s, t in pairs
+            if graph.has_edge(s, t)
+        }
+
     async def upsert_node(self, node_id: str, node_data: dict[str, str]) -> None:
         self._graph.add_node(node_id, **node_data)
+        self._dirty_nodes.add(node_id)
 
     async def upsert_edge(
         self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
     ) -> None:
         self._graph.add_edge(source_node_id, target_node_id, **edge_data)
+        # add_edge creates missing endpoints
+        self._dirty_nodes.update((source_node_id, target_node_id))
+        self._mark_edge(source_node_id, target_node_id)
+
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        self._graph.add_nodes_from(nodes.items())
+        self._dirty_nodes.update(nodes)
+
+    async def upsert_edges_batch(
+        self, edges: dict[tuple[str, str], dict[str, str]]
+    ) -> None:
+        self._graph.add_edges_from(
+            (src, tgt, edge_data) for (src, tgt), edge_data in edges.items()
+        )
+        for src, tgt in edges:
+            self._dirty_nodes.update((src, tgt))
+            self._mark_edge(src, tgt)
 
     async def delete_node(self, node_id: str) -> None:
         if self._graph.has_node(node_id):
+            self._mark_node(node_id)
             self._graph.remove_node(node_id)
             logger.info(f"Node {node_id} deleted from the graph.")
         else:
@@ -160,6 +347,7 @@ class NetworkXStorage(BaseGraphStorage):
         """
         for node in nodes:
             if self._graph.has_node(node):
+                self._mark_node(node)
                 self._graph.remove_node(node)
 
     def remove_edges(self, edges: list[tuple[str, str]]):
@@ -170,6 +358,7 @@ class NetworkXStorage(BaseGraphStorage):
         """
         for source, target in edges:
             if self._graph.has_edge(source, target):
+                self._mark_edge(source, target)
                 self._graph.remove_edge(source, target)
 
     async def get_all_labels(self) -> list[str]:
@@ -41,6 +41,9 @@ if not pm.is_installed("asyncpg"):
 import asyncpg
 from asyncpg import Pool
 
+# Maximum number of rows written by one multi-row graph upsert statement
+_BATCH_UPSERT_SIZE = 500
+
 
 class PostgreSQLDB:
     def __init__(self, config: dict[str, Any], **kwargs: Any):
@@ -1015,6 +1018,129 @@ class PGGraphStorage(BaseGraphStorage):
 
         return edges
 
+    async def get_nodes_batch(self, node_ids: list[str]) -> dict[str, dict]:
+        if not node_ids:
+            return {}
+        labels = [self._encode_graph_label(n.strip('"')) for n in node_ids]
+        query = """SELECT * FROM cypher('%s', $$
+                     UNWIND %s AS nid
+                     MATCH (n:Entity {node_id: nid})
+                     RETURN nid, n
+                   $$) AS (nid agtype, n agtype)""" % (
+            self.graph_name,
+            json.dumps(labels),
+        )
+        records = await self._query(query)
+        by_label = {r["nid"]: r["n"] for r in records}
+        return {
+            node_id: by_label[label]
+            for node_id, label in zip(node_ids, labels)
+            if label in by_label
+        }
+
+    async def node_degrees_batch(self, node_ids: list[str]) -> dict[str, int]:
+        if not node_ids:
+            return {}
+        labels = [self._encode_graph_label(n.strip('"')) for n in node_ids]
+        query = """SELECT * FROM cypher('%s', $$
+                     UNWIND %s AS nid
+                     MATCH (n:Entity {node_id: nid})
+                     OPTIONAL MATCH (n)-[]->(x)
+                     RETURN nid, count(x) AS total_edge_count
+                   $$) AS (nid agtype, total_edge_count integer)""" % (
+            self.graph_name,
+            json.dumps(labels),
+        )
+        records = await self._query(query)
+        by_label = {r["nid"]: int(r["total_edge_count"]) for r in records}
+        return {
+            node_id: by_label.get(label, 0) for node_id, label in zip(node_ids, labels)
+        }
+
+    async def get_nodes_with_degrees_batch(
+        self, node_ids: list[str]
+    ) -> dict[str, dict]:
+        if not node_ids:
+            return {}
+        labels = [self._encode_graph_label(n.strip('"')) for n in node_ids]
+        query = """SELECT * FROM cypher('%s', $$
+                     UNWIND %s AS nid
+                     MATCH (n:Entity {node_id: nid})
+                     OPTIONAL MATCH (n)-[]->(x)
+                     RETURN nid, n, count(x) AS total_edge_count
+                   $$) AS (nid agtype, n agtype, total_edge_count integer)""" % (
+            self.graph_name,
+            json.dumps(labels),
+        )
+        by_label = {
+            r["nid"]: {**r["n"], "degree": int(r["total_edge_count"])}
+            for r in await self._query(query)
+        }
+        return {
+            node_id: by_label[label]
+            for node_id, label in zip(node_ids, labels)
+            if label in by_label
+        }
+
+    async def get_edges_batch(
+        self, pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], dict]:
+        if not pairs:
+            return {}
+        label_pairs = [
+            [
+                self._encode_graph_label(src.strip('"')),
+                self._encode_graph_label(tgt.strip('"')),
+            ]
+            for src, tgt in pairs
+        ]
+        query = """SELECT * FROM cypher('%s', $$
+                     UNWIND %s AS pair
+                     MATCH (a:Entity {node_id: pair[0]})-[r]->(b:Entity {node_id: pair[1]})
+                     RETURN pair[0] AS src, pair[1] AS tgt, properties(r) AS edge_properties
+                   $$) AS (src agtype, tgt agtype, edge_properties agtype)""" % (
+            self.graph_name,
+            json.dumps(label_pairs),
+        )
+        by_pair = {}
+        for r in await self._query(query):
+            if r["edge_properties"]:
+                by_pair.setdefault((r["src"], r["tgt"]), r["edge_properties"])
+        return {
+            pair: by_pair[tuple(label_pair)]
+            for pair, label_pair in zip(pairs, label_pairs)
+            if tuple(label_pair) in by_pair
+        }
+
+    async def get_nodes_edges_batch(
+        self, node_ids: list[str]
+    ) -> dict[str, list[tuple[str, str]]]:
+        if not node_ids:
+            return {}
+        labels = [self._encode_graph_label(n.strip('"')) for n in node_ids]
+        query = """SELECT * FROM cypher('%s', $$
+                     UNWIND %s AS nid
+                     MATCH (n:Entity {node_id: nid})
+                     OPTIONAL MATCH (n)-[]-(connected)
+                     RETURN nid, connected
+                   $$) AS (nid agtype, connected agtype)""" % (
+            self.graph_name,
+            json.dumps(labels),
+        )
+        by_label: dict[str, list[tuple[str, str]]] = {}
+        for r in await self._query(query):
+            connected_node = r["connected"] if r["connected"] else None
+            if connected_node and connected_node.get("node_id"):
+                by_label.setdefault(r["nid"], []).append(
+                    (
+                        self._decode_graph_label(r["nid"]),
+                        self._decode_graph_label(connected_node["node_id"]),
+                    )
+                )
+        return {
+            node_id: by_label.get(label, []) for node_id, label in zip(node_ids, labels)
+        }
+
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=4, max=10),
@@ -1082,6 +1208,75 @@ class PGGraphStorage(BaseGraphStorage):
             logger.error("Error during edge upsert: {%s}", e)
             raise
 
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((PGGraphQueryException,)),
+    )
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        """
+        Upsert nodes with one multi-row UNWIND statement per chunk of _BATCH_UPSERT_SIZE.
+        """
+        rows = [
+            "{node_id: %s, properties: %s}"
+            % (
+                json.dumps(self._encode_graph_label(node_id.strip('"'))),
+                self._format_properties(node_data),
+            )
+            for node_id, node_data in nodes.items()
+        ]
+        for i in range(0, len(rows), _BATCH_UPSERT_SIZE):
+            query = """SELECT * FROM cypher('%s', $$
+                         UNWIND [%s] AS row
+                         MERGE (n:Entity {node_id: row.node_id})
+                         SET n += row.properties
+                       $$) AS (n agtype)""" % (
+                self.graph_name,
+                ", ".join(rows[i : i + _BATCH_UPSERT_SIZE]),
+            )
+            try:
+                await self._query(query, readonly=False, upsert=True)
+            except Exception as e:
+                logger.error("POSTGRES, Error during batch upsert: {%s}", e)
+                raise
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((PGGraphQueryException,)),
+    )
+    async def upsert_edges_batch(
+        self, edges: dict[tuple[str, str], dict[str, str]]
+    ) -> None:
+        """
+        Upsert edges with one multi-row UNWIND statement per chunk of _BATCH_UPSERT_SIZE.
+        """
+        rows = [
+            "{src: %s, tgt: %s, properties: %s}"
+            % (
+                json.dumps(self._encode_graph_label(src.strip('"'))),
+                json.dumps(self._encode_graph_label(tgt.strip('"'))),
+                self._format_properties(edge_data),
+            )
+            for (src, tgt), edge_data in edges.items()
+        ]
+        for i in range(0, len(rows), _BATCH_UPSERT_SIZE):
+            query = """SELECT * FROM cypher('%s', $$
+                         UNWIND [%s] AS row
+                         MATCH (source:Entity {node_id: row.src})
+                         MATCH (target:Entity {node_id: row.tgt})
+                         MERGE (source)-[r:DIRECTED]->(target)
+                         SET r += row.properties
+                       $$) AS (r agtype)""" % (
+                self.graph_name,
+                ", ".join(rows[i : i + _BATCH_UPSERT_SIZE]),
+            )
+            try:
+                await self._query(query, readonly=False, upsert=True)
+            except Exception as e:
+                logger.error("Error during batch edge upsert: {%s}", e)
+                raise
+
     async def _node2vec_embed(self):
         print("Implemented but never called.")
 
@@ -125,9 +125,14 @@ class QdrantVectorDBStorage(BaseVectorStorage):
 
     async def query(self, query: str, top_k: int) -> list[dict[str, Any]]:
         embedding = await self.embedding_func([query])
+        return await self.query_by_vector(embedding[0], top_k)
+
+    async def query_by_vector(
+        self, embedding: np.ndarray, top_k: int
+    ) -> list[dict[str, Any]]:
         results = self._client.search(
             collection_name=self.namespace,
-            query_vector=embedding[0],
+            query_vector=embedding,
             limit=top_k,
             with_payload=True,
             score_threshold=self.cosine_better_than_threshold,
@@ -137,6 +142,43 @@ class QdrantVectorDBStorage(BaseVectorStorage):
 
         return [{**dp.payload, "id": dp.id, "distance": dp.score} for dp in results]
 
+    async def query_batch(
+        self, queries: list[str], top_k: int
+    ) -> list[list[dict[str, Any]]]:
+        if not queries:
+            return []
+        embeddings = await self.embedding_func(queries)
+        batch_results = self._client.search_batch(
+            collection_name=self.namespace,
+            requests=[
+                models.SearchRequest(
+                    vector=list(embedding),
+                    limit=top_k,
+                    with_payload=True,
+                    score_threshold=self.cosine_better_than_threshold,
+                )
+                for embedding in embeddings
+            ],
+        )
+        return [
+            [{**dp.payload, "id": dp.id, "distance": dp.score} for dp in results]
+            for results in batch_results
+        ]
+
+    async def get_vectors_by_ids(self, ids: list[str]) -> dict[str, np.ndarray]:
+        if not ids:
+            return {}
+        points = self._client.retrieve(
+            collection_name=self.namespace,
+            ids=[compute_mdhash_id_for_qdrant(id_) for id_ in ids],
+            with_payload=True,
+            with_vectors=True,
+        )
+        return {
+            point.payload["id"]: np.asarray(point.vector, dtype=np.float32)
+            for point in points
+        }
+
     async def index_done_callback(self) -> None:
         # Qdrant handles persistence automatically
         pass
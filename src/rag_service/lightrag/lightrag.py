@@ -3,10 +3,11 @@ from __future__ import annotations
 import asyncio
 import configparser
 import os
-from dataclasses import asdict, dataclass, field
+from dataclasses import asdict, dataclass, field, replace
 from datetime import datetime
 from functools import partial
-from typing import Any, AsyncIterator, Callable, Iterator, cast, final
+from types import MappingProxyType
+from typing import Any, AsyncIterator, Callable, Iterator, Mapping, cast, final
 
 from src.rag_service.lightrag.kg import (
     STORAGE_ENV_REQUIREMENTS,
@@ -25,6 +26,8 @@ from .base import (
     StorageNameSpace,
     StoragesStatus,
 )
+from .exceptions import QueryDeadlineExceeded
+from .keyword_extraction import LocalKeywordExtractor
 from .namespace import NameSpace, make_namespace
 from .operate import (
     chunking_by_token_size,
@@ -45,6 +48,8 @@ from .utils import (
     lazy_external_import,
     limit_async_func_call,
     logger,
+    prefetched_embeddings,
+    query_deadline,
     set_logger,
 )
 from .types import KnowledgeGraph
@@ -225,6 +230,9 @@ class LightRAG:
     vector_db_storage_cls_kwargs: dict[str, Any] = field(default_factory=dict)
     """Additional parameters for vector database storage."""
 
+    graph_storage_cls_kwargs: dict[str, Any] = field(default_factory=dict)
+    """Additional parameters for graph storage, e.g. graphml_export for NetworkXStorage."""
+
     namespace_prefix: str = field(default="")
     """Prefix for namespacing stored data across different environments."""
 
@@ -266,6 +274,40 @@ class LightRAG:
 
     _storages_status: StoragesStatus = field(default=StoragesStatus.NOT_CREATED)
 
+    def __setattr__(self, name: str, value: Any) -> None:
+        super().__setattr__(name, value)
+        # reassigning any config field invalidates the cached global_config snapshot
+        if name in self.__dataclass_fields__:
+            self.__dict__.pop("_global_config_cache", None)
+
+    @property
+    def global_config(self) -> Mapping[str, Any]:
+        """Read-only ``asdict(self)`` snapshot shared by queries and indexing.
+
+        It is built once and rebuilt only after a field is reassigned, instead of
+        deep-copying every field on each query. In-place mutation of nested values
+        (e.g. ``addon_params["language"] = ...``) is not tracked; reassign the field.
+        """
+        cached = self.__dict__.get("_global_config_cache")
+        if cached is None:
+            cached = MappingProxyType(asdict(self))
+            self.__dict__["_global_config_cache"] = cached
+        return cached
+
+    def _get_hashing_kv(self) -> BaseKVStorage:
+        """LLM response cache used for query caching, with a fallback KV storage."""
+        if self.llm_response_cache and hasattr(
+            self.llm_response_cache, "global_config"
+        ):
+            return self.llm_response_cache
+        return self.key_string_value_json_storage_cls(  # type: ignore
+            namespace=make_namespace(
+                self.namespace_prefix, NameSpace.KV_STORE_LLM_RESPONSE_CACHE
+            ),
+            global_config=self.global_config,
+            embedding_func=self.embedding_func,
+        )
+
     def __post_init__(self):
         os.makedirs(os.path.dirname(self.log_file_path), exist_ok=True)
         set_logger(self.log_file_path, self.log_level)
@@ -296,7 +338,7 @@ class LightRAG:
         }
 
         # Show config
-        global_config = asdict(self)
+        global_config = self.global_config
         _print_config = ",\n  ".join([f"{k} = {v}" for k, v in global_config.items()])
         logger.debug(f"LightRAG init with param:\n  {_print_config}\n")
 
@@ -353,6 +395,9 @@ class LightRAG:
             ),
             embedding_func=self.embedding_func,
         )
+        self.local_keyword_extractor = LocalKeywordExtractor(
+            self.chunk_entity_relation_graph
+        )
 
         self.entities_vdb: BaseVectorStorage = self.vector_db_storage_cls(  # type: ignore
             namespace=make_namespace(
@@ -910,7 +955,7 @@ class LightRAG:
                 entity_vdb=self.entities_vdb,
                 relationships_vdb=self.relationships_vdb,
                 llm_response_cache=self.llm_response_cache,
-                global_config=asdict(self),
+                global_config=self.global_config,
             )
         except Exception as e:
             logger.error("Failed to extract entities and relationships")
@@ -931,6 +976,7 @@ class LightRAG:
             if storage_inst is not None
         ]
         await asyncio.gather(*tasks)
+        self.local_keyword_extractor.invalidate()
         logger.info("All Insert done")
 
     def insert_custom_kg(self, custom_kg: dict[str, Any]) -> None:
@@ -1123,73 +1169,144 @@ class LightRAG:
         Returns:
             str: The result of the query execution.
         """
-        if param.mode in ["local", "global", "hybrid"]:
-            response = await kg_query(
-                query,
-                self.chunk_entity_relation_graph,
-                self.entities_vdb,
-                self.relationships_vdb,
-                self.text_chunks,
-                param,
-                asdict(self),
-                hashing_kv=self.llm_response_cache
-                if self.llm_response_cache
-                and hasattr(self.llm_response_cache, "global_config")
-                else self.key_string_value_json_storage_cls(
-                    namespace=make_namespace(
-                        self.namespace_prefix, NameSpace.KV_STORE_LLM_RESPONSE_CACHE
-                    ),
-                    global_config=asdict(self),
-                    embedding_func=self.embedding_func,
-                ),
-                system_prompt=system_prompt,
-            )
-        elif param.mode == "naive":
-            response = await naive_query(
-                query,
-                self.chunks_vdb,
-                self.text_chunks,
-                param,
-                asdict(self),
-                hashing_kv=self.llm_response_cache
-                if self.llm_response_cache
-                and hasattr(self.llm_response_cache, "global_config")
-                else self.key_string_value_json_storage_cls(
-                    namespace=make_namespace(
-                        self.namespace_prefix, NameSpace.KV_STORE_LLM_RESPONSE_CACHE
-                    ),
-                    global_config=asdict(self),
-                    embedding_func=self.embedding_func,
-                ),
-                system_prompt=system_prompt,
-            )
-        elif param.mode == "mix":
-            response = await mix_kg_vector_query(
-                query,
-                self.chunk_entity_relation_graph,
-                self.entities_vdb,
-                self.relationships_vdb,
-                self.chunks_vdb,
-                self.text_chunks,
-                param,
-                asdict(self),
-                hashing_kv=self.llm_response_cache
-                if self.llm_response_cache
-                and hasattr(self.llm_response_cache, "global_config")
-                else self.key_string_value_json_storage_cls(
-                    namespace=make_namespace(
-                        self.namespace_prefix, NameSpace.KV_STORE_LLM_RESPONSE_CACHE
-                    ),
-                    global_config=asdict(self),
-                    embedding_func=self.embedding_func,
-                ),
-                system_prompt=system_prompt,
-            )
-        else:
-            raise ValueError(f"Unknown mode {param.mode}")
+        with query_deadline(param.timeout):
+            if param.mode in ["local", "global", "hybrid"]:
+                try:
+                    response = await kg_query(
+                        query,
+                        self.chunk_entity_relation_graph,
+                        self.entities_vdb,
+                        self.relationships_vdb,
+                        self.text_chunks,
+                        param,
+                        self.global_config,
+                        hashing_kv=self._get_hashing_kv(),
+                        system_prompt=system_prompt,
+                        keyword_extractor=self.local_keyword_extractor,
+                    )
+                except QueryDeadlineExceeded as e:
+                    if e.stage == "generation":
+                        raise
+                    logger.warning(
+                        f"Knowledge graph query ran out of time during {e.stage}, falling back to naive retrieval"
+                    )
+                    # A naive run of its own, so its answer is cached as a naive
+                    # answer and never under the knowledge graph mode
+                    naive_param = replace(param, mode="naive")
+                    response = await naive_query(
+                        query,
+                        self.chunks_vdb,
+                        self.text_chunks,
+                        naive_param,
+                        self.global_config,
+                        hashing_kv=self._get_hashing_kv(),
+                        system_prompt=system_prompt,
+                    )
+                    param.included_contexts = naive_param.included_contexts
+            elif param.mode == "naive":
+                response = await naive_query(
+                    query,
+                    self.chunks_vdb,
+                    self.text_chunks,
+                    param,
+                    self.global_config,
+                    hashing_kv=self._get_hashing_kv(),
+                    system_prompt=system_prompt,
+                )
+            elif param.mode == "mix":
+                response = await mix_kg_vector_query(
+                    query,
+                    self.chunk_entity_relation_graph,
+                    self.entities_vdb,
+                    self.relationships_vdb,
+                    self.chunks_vdb,
+                    self.text_chunks,
+                    param,
+                    self.global_config,
+                    hashing_kv=self._get_hashing_kv(),
+                    system_prompt=system_prompt,
+                    keyword_extractor=self.local_keyword_extractor,
+                )
+            else:
+                raise ValueError(f"Unknown mode {param.mode}")
         await self._query_done()
         return response
 
+    async def aquery_batch(
+        self,
+        queries: list[str],
+        param: QueryParam = QueryParam(),
+        max_concurrency: int = 4,
+    ) -> AsyncIterator[tuple[int, str | Exception]]:
+        """
+        Answer many queries with shared work, yielding (index, answer) as each completes.
+
+        Keywords are extracted for all queries first (with bounded concurrency), then
+        every text the retrieval will embed (queries and keyword strings, each once) is
+        embedded in `embedding_batch_num`-sized calls. The queries then run with at most
+        `max_concurrency` at a time, reading those embeddings from memory. A failed
+        query yields its exception instead of an answer.
+        """
+        limiter = asyncio.Semaphore(max_concurrency)
+        params = [replace(param, stream=False, stats=None) for _ in queries]
+
+        if param.mode in ["local", "global", "hybrid", "mix"]:
+
+            async def extract(i: int) -> None:
+                async with limiter:
+                    try:
+                        hl, ll = await extract_keywords_only(
+                            queries[i],
+                            params[i],
+                            self.global_config,
+                            hashing_kv=self._get_hashing_kv(),
+                            keyword_extractor=self.local_keyword_extractor,
+                        )
+                        params[i].hl_keywords, params[i].ll_keywords = hl, ll
+                    except Exception as e:
+                        # The query extracts them again, and reports the failure
+                        logger.warning(f"Batch keyword extraction failed: {e}")
+
+            await asyncio.gather(*[extract(i) for i in range(len(queries))])
+
+        texts: dict[str, None] = {}
+        for query, query_param in zip(queries, params):
+            if param.mode in ["naive", "mix"] or param.speculative_retrieval:
+                texts[query] = None
+            for keywords in [query_param.ll_keywords, query_param.hl_keywords]:
+                if keywords:
+                    texts[", ".join(keywords)] = None
+        unique_texts = list(texts)
+        batches = [
+            unique_texts[i : i + self.embedding_batch_num]
+            for i in range(0, len(unique_texts), self.embedding_batch_num)
+        ]
+        embeddings = {}
+        for batch, vectors in zip(
+            batches,
+            await asyncio.gather(*[self.embedding_func(batch) for batch in batches]),
+        ):
+            embeddings.update(zip(batch, vectors))
+        logger.info(
+            f"Batch of {len(queries)} queries embedded {len(unique_texts)} texts in {len(batches)} calls"
+        )
+
+        async def run(i: int) -> tuple[int, str | Exception]:
+            async with limiter:
+                try:
+                    return i, await self.aquery(queries[i], params[i])
+                except Exception as e:
+                    return i, e
+
+        with prefetched_embeddings(embeddings):
+            tasks = [asyncio.create_task(run(i)) for i in range(len(queries))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
     def query_with_separate_keyword_extraction(
         self, query: str, prompt: str, param: QueryParam = QueryParam()
     ):
@@ -1215,15 +1332,9 @@ class LightRAG:
         hl_keywords, ll_keywords = await extract_keywords_only(
             text=query,
             param=param,
-            global_config=asdict(self),
-            hashing_kv=self.llm_response_cache
-            or self.key_string_value_json_storage_cls(
-                namespace=make_namespace(
-                    self.namespace_prefix, NameSpace.KV_STORE_LLM_RESPONSE_CACHE
-                ),
-                global_config=asdict(self),
-                embedding_func=self.embedding_func,
-            ),
+            global_config=self.global_config,
+            hashing_kv=self.llm_response_cache or self._get_hashing_kv(),
+            keyword_extractor=self.local_keyword_extractor,
         )
 
         param.hl_keywords = hl_keywords
@@ -1246,17 +1357,8 @@ class LightRAG:
                 self.relationships_vdb,
                 self.text_chunks,
                 param,
-                asdict(self),
-                hashing_kv=self.llm_response_cache
-                if self.llm_response_cache
-                and hasattr(self.llm_response_cache, "global_config")
-                else self.key_string_value_json_storage_cls(
-                    namespace=make_namespace(
-                        self.namespace_prefix, NameSpace.KV_STORE_LLM_RESPONSE_CACHE
-                    ),
-                    global_config=asdict(self),
-                    embedding_func=self.embedding_func,
-                ),
+                self.global_config,
+                hashing_kv=self._get_hashing_kv(),
             )
         elif param.mode == "naive":
             response = await naive_query(
@@ -1264,17 +1366,8 @@ class LightRAG:
                 self.chunks_vdb,
                 self.text_chunks,
                 param,
-                asdict(self),
-                hashing_kv=self.llm_response_cache
-                if self.llm_response_cache
-                and hasattr(self.llm_response_cache, "global_config")
-                else self.key_string_value_json_storage_cls(
-                    namespace=make_namespace(
-                        self.namespace_prefix, NameSpace.KV_STORE_LLM_RESPONSE_CACHE
-                    ),
-                    global_config=asdict(self),
-                    embedding_func=self.embedding_func,
-                ),
+                self.global_config,
+                hashing_kv=self._get_hashing_kv(),
             )
         elif param.mode == "mix":
             response = await mix_kg_vector_query(
@@ -1285,17 +1378,8 @@ class LightRAG:
                 self.chunks_vdb,
                 self.text_chunks,
                 param,
-                asdict(self),
-                hashing_kv=self.llm_response_cache
-                if self.llm_response_cache
-                and hasattr(self.llm_response_cache, "global_config")
-                else self.key_string_value_json_storage_cls(
-                    namespace=make_namespace(
-                        self.namespace_prefix, NameSpace.KV_STORE_LLM_RESPONSE_CACHE
-                    ),
-                    global_config=asdict(self),
-                    embedding_func=self.embedding_func,
-                ),
+                self.global_config,
+                hashing_kv=self._get_hashing_kv(),
             )
         else:
             raise ValueError(f"Unknown mode {param.mode}")
@@ -1336,6 +1420,7 @@ class LightRAG:
                 ]
             ]
         )
+        self.local_keyword_extractor.invalidate()
 
     def _get_content_summary(self, content: str, max_length: int = 100) -> str:
         """Get summary of document content
@@ -2,10 +2,15 @@ from __future__ import annotations
 
 import asyncio
 import json
+import logging
 import re
+from dataclasses import replace
 from typing import Any, AsyncIterator
 from collections import Counter, defaultdict
 
+import numpy as np
+import scipy.sparse as sp
+
 from .utils import (
     logger,
     clean_str,
@@ -17,6 +22,10 @@ from .utils import (
     pack_user_ass_to_openai_messages,
     split_string_by_multi_markers,
     truncate_list_by_token_size,
+    count_tokens,
+    deadline_remaining,
+    record_deadline_hit,
+    run_before_deadline,
     process_combine_contexts,
     compute_args_hash,
     handle_cache,
@@ -33,6 +42,8 @@ from .base import (
     TextChunkSchema,
     QueryParam,
 )
+from .exceptions import QueryDeadlineExceeded
+from .keyword_extraction import LocalKeywordExtractor
 from .prompt import GRAPH_FIELD_SEP, PROMPTS
 import time
 from dotenv import load_dotenv
@@ -40,6 +51,23 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv(override=True)
 
+# Fractions of the query deadline left for the stages that follow keyword
+# extraction, knowledge graph retrieval and vector retrieval respectively
+_KEYWORDS_DEADLINE_RESERVE = 0.6
+_KG_DEADLINE_RESERVE = 0.4
+_VECTOR_DEADLINE_RESERVE = 0.2
+
+# Adaptive retrieval keeps at least this many hits, cut at the score knee or
+# once this share of the score mass is covered
+_ADAPTIVE_MIN_K = 5
+_ADAPTIVE_SCORE_MASS = 0.9
+# Lower bound of the context budget scale for weak initial hits
+_ADAPTIVE_MIN_BUDGET_SCALE = 0.25
+
+# Speculative hits stand in for the keyword searches when they fill top_k with
+# at least this mean similarity
+_SPECULATIVE_MIN_SCORE = 0.5
+
 
 def chunking_by_token_size(
     content: str,
@@ -182,18 +210,17 @@ async def _handle_single_relationship_extraction(
     )
 
 
-async def _merge_nodes_then_upsert(
+async def _merge_nodes(
     entity_name: str,
     nodes_data: list[dict],
-    knowledge_graph_inst: BaseGraphStorage,
+    already_node: dict | None,
     global_config: dict,
 ):
-    """Get existing nodes from knowledge graph use name,if exists, merge data, else create, then upsert."""
+    """Merge extracted node data with the existing node (if any) into the node to upsert."""
     already_entity_types = []
     already_source_ids = []
     already_description = []
 
-    already_node = await knowledge_graph_inst.get_node(entity_name)
     if already_node is not None:
         already_entity_types.append(already_node["entity_type"])
         already_source_ids.extend(
@@ -220,54 +247,49 @@ async def _merge_nodes_then_upsert(
     node_data = dict(
         entity_type=entity_type,
         description=description,
+        description_tokens=count_tokens(description),
         source_id=source_id,
     )
-    await knowledge_graph_inst.upsert_node(
-        entity_name,
-        node_data=node_data,
-    )
-    node_data["entity_name"] = entity_name
     return node_data
 
 
-async def _merge_edges_then_upsert(
+async def _merge_edges(
     src_id: str,
     tgt_id: str,
     edges_data: list[dict],
-    knowledge_graph_inst: BaseGraphStorage,
+    already_edge: dict | None,
     global_config: dict,
 ):
+    """Merge extracted edge data with the existing edge (if any) into the edge to upsert."""
     already_weights = []
     already_source_ids = []
     already_description = []
     already_keywords = []
 
-    if await knowledge_graph_inst.has_edge(src_id, tgt_id):
-        already_edge = await knowledge_graph_inst.get_edge(src_id, tgt_id)
-        # Handle the case where get_edge returns None or missing fields
-        if already_edge:
-            # Get weight with default 0.0 if missing
-            already_weights.append(already_edge.get("weight", 0.0))
-
-            # Get source_id with empty string default if missing or None
-            if already_edge.get("source_id") is not None:
-                already_source_ids.extend(
-                    split_string_by_multi_markers(
-                        already_edge["source_id"], [GRAPH_FIELD_SEP]
-                    )
+    # get_edges_batch omits missing edges, some backends return default fields
+    if already_edge:
+        # Get weight with default 0.0 if missing
+        already_weights.append(already_edge.get("weight", 0.0))
+
+        # Get source_id with empty string default if missing or None
+        if already_edge.get("source_id") is not None:
+            already_source_ids.extend(
+                split_string_by_multi_markers(
+                    already_edge["source_id"], [GRAPH_FIELD_SEP]
                 )
+            )
 
-            # Get description with empty string default if missing or None
-            if already_edge.get("description") is not None:
-                already_description.append(already_edge["description"])
+        # Get description with empty string default if missing or None
+        if already_edge.get("description") is not None:
+            already_description.append(already_edge["description"])
 
-            # Get keywords with empty string default if missing or None
-            if already_edge.get("keywords") is not None:
-                already_keywords.extend(
-                    split_string_by_multi_markers(
-                        already_edge["keywords"], [GRAPH_FIELD_SEP]
-                    )
+        # Get keywords with empty string default if missing or None
+        if already_edge.get("keywords") is not None:
+            already_keywords.extend(
+                split_string_by_multi_markers(
+                    already_edge["keywords"], [GRAPH_FIELD_SEP]
                 )
+            )
 
     # Process edges_data with None checks
     weight = sum([dp["weight"] for dp in edges_data] + already_weights)
@@ -294,38 +316,97 @@ async def _merge_edges_then_upsert(
         )
     )
 
-    for need_insert_id in [src_id, tgt_id]:
-        if not (await knowledge_graph_inst.has_node(need_insert_id)):
-            await knowledge_graph_inst.upsert_node(
-                need_insert_id,
-                node_data={
-                    "source_id": source_id,
-                    "description": description,
-                    "entity_type": "UNKNOWN",
-                },
-            )
+    # placeholder for an endpoint that was never extracted as an entity
+    placeholder_node = {
+        "source_id": source_id,
+        "description": description,
+        "entity_type": "UNKNOWN",
+    }
     description = await _handle_entity_relation_summary(
         f"({src_id}, {tgt_id})", description, global_config
     )
-    await knowledge_graph_inst.upsert_edge(
-        src_id,
-        tgt_id,
-        edge_data=dict(
-            weight=weight,
-            description=description,
-            keywords=keywords,
-            source_id=source_id,
-        ),
-    )
-
     edge_data = dict(
-        src_id=src_id,
-        tgt_id=tgt_id,
+        weight=weight,
         description=description,
+        description_tokens=count_tokens(description),
         keywords=keywords,
+        source_id=source_id,
     )
+    return edge_data, placeholder_node
+
+
+async def _merge_nodes_then_upsert(
+    maybe_nodes: dict[str, list[dict]],
+    knowledge_graph_inst: BaseGraphStorage,
+    global_config: dict,
+) -> list[dict]:
+    """Get existing nodes from knowledge graph use name,if exists, merge data, else create, then upsert.
 
-    return edge_data
+    Existing nodes are read and merged nodes written with one batch call each.
+    """
+    entity_names = list(maybe_nodes)
+    already_nodes = await knowledge_graph_inst.get_nodes_batch(entity_names)
+    merged = await asyncio.gather(
+        *[
+            _merge_nodes(k, maybe_nodes[k], already_nodes.get(k), global_config)
+            for k in entity_names
+        ]
+    )
+    await knowledge_graph_inst.upsert_nodes_batch(dict(zip(entity_names, merged)))
+    return [
+        {**node_data, "entity_name": k} for k, node_data in zip(entity_names, merged)
+    ]
+
+
+async def _merge_edges_then_upsert(
+    maybe_edges: dict[tuple[str, str], list[dict]],
+    knowledge_graph_inst: BaseGraphStorage,
+    global_config: dict,
+    known_nodes: set[str],
+) -> list[dict]:
+    """Merge edges with the existing ones, create missing endpoint nodes, then upsert.
+
+    ``known_nodes`` are node ids already present in the graph, their existence is
+    not checked again.
+    """
+    edge_keys = list(maybe_edges)
+    already_edges = await knowledge_graph_inst.get_edges_batch(edge_keys)
+    merged = await asyncio.gather(
+        *[
+            _merge_edges(
+                src_id,
+                tgt_id,
+                maybe_edges[(src_id, tgt_id)],
+                already_edges.get((src_id, tgt_id)),
+                global_config,
+            )
+            for src_id, tgt_id in edge_keys
+        ]
+    )
+
+    placeholders = {}
+    for (src_id, tgt_id), (_, placeholder_node) in zip(edge_keys, merged):
+        for need_insert_id in [src_id, tgt_id]:
+            if need_insert_id not in known_nodes:
+                placeholders.setdefault(need_insert_id, placeholder_node)
+    if placeholders:
+        existing = await knowledge_graph_inst.get_nodes_batch(list(placeholders))
+        missing = {k: v for k, v in placeholders.items() if k not in existing}
+        if missing:
+            await knowledge_graph_inst.upsert_nodes_batch(missing)
+
+    await knowledge_graph_inst.upsert_edges_batch(
+        {key: edge_data for key, (edge_data, _) in zip(edge_keys, merged)}
+    )
+    return [
+        dict(
+            src_id=src_id,
+            tgt_id=tgt_id,
+            description=edge_data["description"],
+            keywords=edge_data["keywords"],
+        )
+        for (src_id, tgt_id), (edge_data, _) in zip(edge_keys, merged)
+    ]
 
 
 async def extract_entities(
@@ -512,18 +593,15 @@ async def extract_entities(
         for k, v in m_edges.items():
             maybe_edges[tuple(sorted(k))].extend(v)
 
-    all_entities_data = await asyncio.gather(
-        *[
-            _merge_nodes_then_upsert(k, v, knowledge_graph_inst, global_config)
-            for k, v in maybe_nodes.items()
-        ]
+    all_entities_data = await _merge_nodes_then_upsert(
+        maybe_nodes, knowledge_graph_inst, global_config
     )
 
-    all_relationships_data = await asyncio.gather(
-        *[
-            _merge_edges_then_upsert(k[0], k[1], v, knowledge_graph_inst, global_config)
-            for k, v in maybe_edges.items()
-        ]
+    all_relationships_data = await _merge_edges_then_upsert(
+        maybe_edges,
+        knowledge_graph_inst,
+        global_config,
+        known_nodes=set(maybe_nodes),
     )
 
     if not (all_entities_data or all_relationships_data):
@@ -571,6 +649,17 @@ async def extract_entities(
         await relationships_vdb.upsert(data_for_vdb)
 
 
+def _record_query_stats(query: str, sys_prompt: str, query_param: QueryParam) -> None:
+    """Fill `query_param.stats`, when the caller asked for them, once the prompt is built."""
+    if query_param.stats is None:
+        return
+    query_param.stats.update(
+        retrieval_done_at=time.perf_counter(),
+        contexts=list(query_param.included_contexts),
+        prompt_tokens=count_tokens(query + sys_prompt),
+    )
+
+
 async def kg_query(
     query: str,
     knowledge_graph_inst: BaseGraphStorage,
@@ -581,6 +670,7 @@ async def kg_query(
     global_config: dict[str, str],
     hashing_kv: BaseKVStorage | None = None,
     system_prompt: str | None = None,
+    keyword_extractor: LocalKeywordExtractor | None = None,
 ) -> str:
     # Handle cache
     use_model_func = global_config["llm_model_func"]
@@ -591,45 +681,97 @@ async def kg_query(
     if cached_response is not None:
         return cached_response
 
-    # Extract keywords using extract_keywords_only function which already supports conversation history
-    hl_keywords, ll_keywords = await extract_keywords_only(
-        query, query_param, global_config, hashing_kv
-    )
+    # Optionally search with the raw query while the keywords are being extracted
+    speculative_tasks = {}
+    if query_param.speculative_retrieval:
+        speculative_tasks = _start_speculative_retrieval(
+            query, entities_vdb, relationships_vdb, query_param
+        )
 
-    logger.debug(f"High-level keywords: {hl_keywords}")
-    logger.debug(f"Low-level  keywords: {ll_keywords}")
+    # Set when the deadline cut a corner, such an answer is never cached
+    degraded = False
 
-    # Handle empty keywords
-    if hl_keywords == [] and ll_keywords == []:
-        logger.warning("low_level_keywords and high_level_keywords is empty")
-        return PROMPTS["fail_response"]
-    if ll_keywords == [] and query_param.mode in ["local", "hybrid"]:
-        logger.warning(
-            "low_level_keywords is empty, switching from %s mode to global mode",
-            query_param.mode,
-        )
-        query_param.mode = "global"
-    if hl_keywords == [] and query_param.mode in ["global", "hybrid"]:
-        logger.warning(
-            "high_level_keywords is empty, switching from %s mode to local mode",
-            query_param.mode,
+    # Extract keywords using extract_keywords_only function which already supports
+    # conversation history, while the speculative searches finish
+    keywords_task = asyncio.ensure_future(
+        _extract_keywords_before_deadline(
+            query, query_param, global_config, hashing_kv, keyword_extractor
         )
-        query_param.mode = "local"
+    )
+    try:
+        speculative_hits = None
+        if speculative_tasks:
+            speculative_hits = await _sufficient_speculative_hits(
+                speculative_tasks, query_param
+            )
+        if speculative_hits is None:
+            hl_keywords, ll_keywords, degraded = await keywords_task
+    except BaseException:
+        keywords_task.cancel()
+        _cancel_speculative_retrieval(speculative_tasks)
+        raise
+
+    if speculative_hits is not None:
+        # The raw query found enough, so neither the keyword LLM call nor the
+        # keyword searches are waited for
+        keywords_task.cancel()
+        logger.debug("Speculative hits are sufficient, keyword extraction skipped")
+        ll_keywords_str = hl_keywords_str = None
+    else:
+        logger.debug(f"High-level keywords: {hl_keywords}")
+        logger.debug(f"Low-level  keywords: {ll_keywords}")
+
+        # Handle empty keywords
+        if hl_keywords == [] and ll_keywords == []:
+            logger.warning("low_level_keywords and high_level_keywords is empty")
+            _cancel_speculative_retrieval(speculative_tasks)
+            return PROMPTS["fail_response"]
+        if ll_keywords == [] and query_param.mode in ["local", "hybrid"]:
+            logger.warning(
+                "low_level_keywords is empty, switching from %s mode to global mode",
+                query_param.mode,
+            )
+            query_param.mode = "global"
+        if hl_keywords == [] and query_param.mode in ["global", "hybrid"]:
+            logger.warning(
+                "high_level_keywords is empty, switching from %s mode to local mode",
+                query_param.mode,
+            )
+            query_param.mode = "local"
 
-    ll_keywords_str = ", ".join(ll_keywords) if ll_keywords else ""
-    hl_keywords_str = ", ".join(hl_keywords) if hl_keywords else ""
+        ll_keywords_str = ", ".join(ll_keywords) if ll_keywords else ""
+        hl_keywords_str = ", ".join(hl_keywords) if hl_keywords else ""
+
+    # Retrieve less when over half of the deadline is already spent, without
+    # touching the caller's parameters
+    context_param = query_param
+    if deadline_remaining(reserve=0.5) == 0.0:
+        top_k = max(1, query_param.top_k // 2)
+        context_param = replace(query_param, top_k=top_k)
+        degraded = True
+        logger.warning(f"Query deadline running out, top_k reduced to {top_k}")
 
     # Build context
-    context = await _build_query_context(
-        ll_keywords_str,
-        hl_keywords_str,
-        knowledge_graph_inst,
-        entities_vdb,
-        relationships_vdb,
-        text_chunks_db,
-        query_param,
-    )
+    try:
+        context = await run_before_deadline(
+            _build_query_context(
+                ll_keywords_str,
+                hl_keywords_str,
+                knowledge_graph_inst,
+                entities_vdb,
+                relationships_vdb,
+                text_chunks_db,
+                context_param,
+                speculative_tasks,
+            ),
+            "knowledge graph retrieval",
+            reserve=_KG_DEADLINE_RESERVE,
+        )
+    except BaseException:
+        _cancel_speculative_retrieval(speculative_tasks)
+        raise
 
+    query_param.included_contexts = ["kg"] if context else []
     if query_param.only_need_context:
         return context
     if context is None:
@@ -652,13 +794,18 @@ async def kg_query(
     if query_param.only_need_prompt:
         return sys_prompt
 
-    len_of_prompts = len(encode_string_by_tiktoken(query + sys_prompt))
-    logger.debug(f"[kg_query]Prompt Tokens: {len_of_prompts}")
+    _record_query_stats(query, sys_prompt, query_param)
+    if logger.isEnabledFor(logging.DEBUG):
+        len_of_prompts = len(encode_string_by_tiktoken(query + sys_prompt))
+        logger.debug(f"[kg_query]Prompt Tokens: {len_of_prompts}")
 
-    response = await use_model_func(
-        query,
-        system_prompt=sys_prompt,
-        stream=query_param.stream,
+    response = await run_before_deadline(
+        use_model_func(
+            query,
+            system_prompt=sys_prompt,
+            stream=query_param.stream,
+        ),
+        "generation",
     )
     if isinstance(response, str) and len(response) > len(sys_prompt):
         response = (
@@ -671,34 +818,70 @@ async def kg_query(
             .strip()
         )
 
-    # Save to cache
-    await save_to_cache(
-        hashing_kv,
-        CacheData(
-            args_hash=args_hash,
-            content=response,
-            prompt=query,
-            quantized=quantized,
-            min_val=min_val,
-            max_val=max_val,
-            mode=query_param.mode,
-            cache_type="query",
-        ),
-    )
+    # Save to cache, unless the answer was degraded by the deadline
+    if not degraded:
+        await save_to_cache(
+            hashing_kv,
+            CacheData(
+                args_hash=args_hash,
+                content=response,
+                prompt=query,
+                quantized=quantized,
+                min_val=min_val,
+                max_val=max_val,
+                mode=query_param.mode,
+                cache_type="query",
+            ),
+        )
     return response
 
 
+async def _extract_keywords_before_deadline(
+    query: str,
+    query_param: QueryParam,
+    global_config: dict[str, str],
+    hashing_kv: BaseKVStorage | None,
+    keyword_extractor: LocalKeywordExtractor | None,
+) -> tuple[list[str], list[str], bool]:
+    """Keywords for kg_query, the flag tells whether the local extractor stood in for the LLM."""
+    try:
+        hl_keywords, ll_keywords = await run_before_deadline(
+            extract_keywords_only(
+                query, query_param, global_config, hashing_kv, keyword_extractor
+            ),
+            "keyword extraction",
+            reserve=_KEYWORDS_DEADLINE_RESERVE,
+        )
+        return hl_keywords, ll_keywords, False
+    except QueryDeadlineExceeded:
+        if keyword_extractor is None:
+            raise
+        logger.warning("Falling back to local keyword extraction")
+        hl_keywords, ll_keywords = await keyword_extractor.extract(query)
+        return hl_keywords, ll_keywords, True
+
+
 async def extract_keywords_only(
     text: str,
     param: QueryParam,
     global_config: dict[str, str],
     hashing_kv: BaseKVStorage | None = None,
+    keyword_extractor: LocalKeywordExtractor | None = None,
 ) -> tuple[list[str], list[str]]:
     """
     Extract high-level and low-level keywords from the given 'text' using the LLM.
     This method does NOT build the final RAG context or provide a final answer.
     It ONLY extracts keywords (hl_keywords, ll_keywords).
+    With param.keyword_extractor == "local", the local extractor is used instead of the LLM.
+    Keywords already set on param (hl_keywords / ll_keywords) are returned as they are.
     """
+    if param.hl_keywords or param.ll_keywords:
+        return param.hl_keywords, param.ll_keywords
+
+    if param.keyword_extractor == "local":
+        if keyword_extractor is not None:
+            return await keyword_extractor.extract(text)
+        logger.warning("No local keyword extractor available, falling back to LLM")
 
     # 1. Handle cache if needed - add cache type for keywords
     args_hash = compute_args_hash(param.mode, text, cache_type="keywords")
@@ -740,8 +923,9 @@ async def extract_keywords_only(
         query=text, examples=examples, language=language, history=history_context
     )
 
-    len_of_prompts = len(encode_string_by_tiktoken(kw_prompt))
-    logger.debug(f"[kg_query]Prompt Tokens: {len_of_prompts}")
+    if logger.isEnabledFor(logging.DEBUG):
+        len_of_prompts = len(encode_string_by_tiktoken(kw_prompt))
+        logger.debug(f"[kg_query]Prompt Tokens: {len_of_prompts}")
 
     # 5. Call the LLM for keyword extraction
     use_model_func = global_config["llm_model_func"]
@@ -794,6 +978,7 @@ async def mix_kg_vector_query(
     global_config: dict[str, str],
     hashing_kv: BaseKVStorage | None = None,
     system_prompt: str | None = None,
+    keyword_extractor: LocalKeywordExtractor | None = None,
 ) -> str | AsyncIterator[str]:
     """
     Hybrid retrieval implementation combining knowledge graph and vector search.
@@ -824,7 +1009,7 @@ async def mix_kg_vector_query(
         try:
             # Extract keywords using extract_keywords_only function which already supports conversation history
             hl_keywords, ll_keywords = await extract_keywords_only(
-                query, query_param, global_config, hashing_kv
+                query, query_param, global_config, hashing_kv, keyword_extractor
             )
 
             if not hl_keywords and not ll_keywords:
@@ -874,6 +1059,8 @@ async def mix_kg_vector_query(
             results = await chunks_vdb.query(augmented_query, top_k=mix_topk)
             if not results:
                 return None
+            if query_param.adaptive_retrieval:
+                results = _adaptive_cutoff(results)
 
             chunks_ids = [r["id"] for r in results]
             chunks = await text_chunks_db.get_by_ids(chunks_ids)
@@ -884,6 +1071,7 @@ async def mix_kg_vector_query(
                     # Merge chunk content and time metadata
                     chunk_with_time = {
                         "content": chunk["content"],
+                        "tokens": chunk.get("tokens"),
                         "created_at": result.get("created_at", None),
                     }
                     valid_chunks.append(chunk_with_time)
@@ -895,6 +1083,7 @@ async def mix_kg_vector_query(
                 valid_chunks,
                 key=lambda x: x["content"],
                 max_token_size=query_param.max_token_for_text_unit,
+                token_count=lambda x: x.get("tokens"),
             )
 
             if not maybe_trun_chunks:
@@ -916,9 +1105,51 @@ async def mix_kg_vector_query(
             logger.error(f"Error in get_vector_context: {e}")
             return None
 
-    # 3. Execute both retrievals in parallel
-    kg_context, vector_context = await asyncio.gather(
-        get_kg_context(), get_vector_context()
+    # 3. Execute both retrievals in parallel, optionally bounding the wait for the
+    # knowledge graph once the vector context is ready
+    retrieval_start = time.monotonic()
+    kg_task = asyncio.create_task(get_kg_context())
+    vector_task = asyncio.create_task(get_vector_context())
+    kg_timed_out = False
+    # Set when the deadline cut vector retrieval short
+    degraded = False
+    try:
+        try:
+            vector_context = await run_before_deadline(
+                vector_task, "vector retrieval", reserve=_VECTOR_DEADLINE_RESERVE
+            )
+        except QueryDeadlineExceeded:
+            vector_context = None
+            degraded = True
+        kg_timeout = deadline_remaining(reserve=_KG_DEADLINE_RESERVE)
+        kg_hits_deadline = kg_timeout is not None
+        if query_param.kg_context_timeout is not None and vector_context is not None:
+            elapsed = time.monotonic() - retrieval_start
+            kg_budget = max(0.0, query_param.kg_context_timeout - elapsed)
+            if kg_timeout is None or kg_budget < kg_timeout:
+                kg_timeout, kg_hits_deadline = kg_budget, False
+        try:
+            kg_context = await asyncio.wait_for(kg_task, timeout=kg_timeout)
+        except asyncio.TimeoutError:
+            if kg_hits_deadline:
+                record_deadline_hit("knowledge graph retrieval")
+            logger.warning(
+                f"Knowledge graph context not ready after {kg_timeout:.2f}s, using vector context only"
+            )
+            kg_context = None
+            kg_timed_out = True
+    finally:
+        kg_task.cancel()
+        vector_task.cancel()
+
+    query_param.included_contexts = [
+        name
+        for name, context in [("kg", kg_context), ("vector", vector_context)]
+        if context
+    ]
+    logger.info(
+        f"[mix_kg_vector_query]Included contexts: {query_param.included_contexts} "
+        f"({time.monotonic() - retrieval_start:.2f}s)"
     )
 
     # 4. Merge contexts
@@ -947,14 +1178,19 @@ async def mix_kg_vector_query(
     if query_param.only_need_prompt:
         return sys_prompt
 
-    len_of_prompts = len(encode_string_by_tiktoken(query + sys_prompt))
-    logger.debug(f"[mix_kg_vector_query]Prompt Tokens: {len_of_prompts}")
+    _record_query_stats(query, sys_prompt, query_param)
+    if logger.isEnabledFor(logging.DEBUG):
+        len_of_prompts = len(encode_string_by_tiktoken(query + sys_prompt))
+        logger.debug(f"[mix_kg_vector_query]Prompt Tokens: {len_of_prompts}")
 
     # 6. Generate response
-    response = await use_model_func(
-        query,
-        system_prompt=sys_prompt,
-        stream=query_param.stream,
+    response = await run_before_deadline(
+        use_model_func(
+            query,
+            system_prompt=sys_prompt,
+            stream=query_param.stream,
+        ),
+        "generation",
     )
 
     # 清理响应内容
@@ -969,33 +1205,216 @@ async def mix_kg_vector_query(
             .strip()
         )
 
-        # 7. Save cache - 只有在收集完整响应后才缓存
-        await save_to_cache(
-            hashing_kv,
-            CacheData(
-                args_hash=args_hash,
-                content=response,
-                prompt=query,
-                quantized=quantized,
-                min_val=min_val,
-                max_val=max_val,
-                mode="mix",
-                cache_type="query",
-            ),
-        )
+        # 7. Save cache - 只有在收集完整响应后才缓存, never for a degraded answer
+        if not (kg_timed_out or degraded):
+            await save_to_cache(
+                hashing_kv,
+                CacheData(
+                    args_hash=args_hash,
+                    content=response,
+                    prompt=query,
+                    quantized=quantized,
+                    min_val=min_val,
+                    max_val=max_val,
+                    mode="mix",
+                    cache_type="query",
+                ),
+            )
 
     return response
 
 
+def _start_speculative_retrieval(
+    query: str,
+    entities_vdb: BaseVectorStorage,
+    relationships_vdb: BaseVectorStorage,
+    query_param: QueryParam,
+) -> dict[str, asyncio.Task]:
+    """Start the entity ("local") and relationship ("global") searches with the raw query.
+
+    The query is embedded once and shared by both searches. The returned tasks are
+    consumed by _build_query_context once the keywords and final mode are known.
+    """
+    if query_param.mode not in ["local", "global", "hybrid"]:
+        return {}
+    embedding_task = asyncio.ensure_future(entities_vdb.embedding_func([query]))
+
+    async def search(vdb: BaseVectorStorage) -> list[dict]:
+        embedding = await asyncio.shield(embedding_task)
+        try:
+            return await vdb.query_by_vector(embedding[0], top_k=query_param.top_k)
+        except NotImplementedError:
+            return await vdb.query(query, top_k=query_param.top_k)
+
+    tasks = {"embedding": embedding_task}
+    if query_param.mode in ["local", "hybrid"]:
+        tasks["local"] = asyncio.create_task(search(entities_vdb))
+    if query_param.mode in ["global", "hybrid"]:
+        tasks["global"] = asyncio.create_task(search(relationships_vdb))
+    return tasks
+
+
+def _cancel_speculative_retrieval(speculative_tasks: dict[str, asyncio.Task]) -> None:
+    for task in speculative_tasks.values():
+        if not task.done():
+            task.cancel()
+
+
+async def _collect_speculative_retrieval(
+    speculative_tasks: dict[str, asyncio.Task], mode: str
+) -> dict[str, list[dict]]:
+    """Await the speculative searches still useful for `mode` and cancel the stale ones.
+
+    Speculative results are best effort: a failed search is logged and ignored.
+    """
+    needed = {"local": ["local"], "global": ["global"]}.get(mode, ["local", "global"])
+    for name, task in speculative_tasks.items():
+        if name != "embedding" and name not in needed and not task.done():
+            task.cancel()
+
+    results = {}
+    for name in needed:
+        task = speculative_tasks.get(name)
+        if task is None or task.cancelled():
+            continue
+        try:
+            results[name] = await task
+        except Exception as e:
+            logger.warning(f"Speculative {name} retrieval failed: {e}")
+    _cancel_speculative_retrieval(speculative_tasks)
+    return results
+
+
+async def _sufficient_speculative_hits(
+    speculative_tasks: dict[str, asyncio.Task], query_param: QueryParam
+) -> dict[str, list[dict]] | None:
+    """Wait for the speculative searches of the mode's sides and return their hits if
+    every side filled top_k with a mean similarity of _SPECULATIVE_MIN_SCORE, else None.
+    """
+    needed = {"local": ["local"], "global": ["global"]}.get(
+        query_param.mode, ["local", "global"]
+    )
+    hits = {}
+    for name in needed:
+        task = speculative_tasks.get(name)
+        if task is None:
+            return None
+        try:
+            results = await task
+        except Exception:
+            # Logged when the results are collected for merging
+            return None
+        if len(results) < query_param.top_k or any(
+            r.get("distance") is None for r in results
+        ):
+            return None
+        mean_score = sum(float(r["distance"]) for r in results) / len(results)
+        if mean_score < _SPECULATIVE_MIN_SCORE:
+            return None
+        hits[name] = results
+    return hits
+
+
+def _merge_vdb_results(
+    results: list[dict], speculative: list[dict] | None, top_k: int
+) -> list[dict]:
+    """Merge keyword and speculative hits by score, keeping the top_k best distinct ids."""
+    if not speculative:
+        return results
+
+    def score(r: dict) -> float:
+        return r.get("distance") or 0.0
+
+    best = {}
+    for r in [*results, *speculative]:
+        known = best.get(r.get("id"))
+        if known is None or score(r) > score(known):
+            best[r.get("id")] = r
+    merged = sorted(best.values(), key=score, reverse=True)[:top_k]
+    speculative_rows = {id(r) for r in speculative}
+    from_speculative = sum(1 for r in merged if id(r) in speculative_rows)
+    logger.debug(
+        f"Speculative retrieval contributed {from_speculative} of {len(merged)} results"
+    )
+    return merged
+
+
+def _adaptive_cutoff(results: list[dict]) -> list[dict]:
+    """Cut vector hits at the largest score drop or at the score-mass threshold.
+
+    Scores are the "distance" similarities returned by the vector storages, higher
+    is better. The mass is measured above the weakest hit, and at least
+    _ADAPTIVE_MIN_K hits are kept.
+    """
+    if len(results) <= _ADAPTIVE_MIN_K or any(
+        r.get("distance") is None for r in results
+    ):
+        return results
+    results = sorted(results, key=lambda r: r["distance"], reverse=True)
+    scores = [float(r["distance"]) for r in results]
+
+    weights = [score - scores[-1] for score in scores]
+    total = sum(weights)
+    if total <= 0:
+        return results
+    mass_cut, cumulative = len(results), 0.0
+    for i, weight in enumerate(weights):
+        cumulative += weight
+        if cumulative >= _ADAPTIVE_SCORE_MASS * total:
+            mass_cut = i + 1
+            break
+
+    gaps = [scores[i] - scores[i + 1] for i in range(len(scores) - 1)]
+    knee = gaps.index(max(gaps)) + 1
+    cut = min(mass_cut, knee) if knee >= _ADAPTIVE_MIN_K else mass_cut
+    return results[: max(_ADAPTIVE_MIN_K, cut)]
+
+
+def _adapt_to_hits(
+    results: list[dict], query_param: QueryParam
+) -> tuple[list[dict], QueryParam]:
+    """Apply the adaptive cutoff and scale the context budgets to the hits kept.
+
+    Few surviving hits mean a weak match, so the graph expansion built from them
+    gets a proportionally smaller token budget.
+    """
+    if not query_param.adaptive_retrieval or not results:
+        return results, query_param
+    kept = _adaptive_cutoff(results)
+    scale = min(
+        1.0, max(_ADAPTIVE_MIN_BUDGET_SCALE, len(kept) / max(1, query_param.top_k))
+    )
+    logger.debug(
+        f"Adaptive retrieval kept {len(kept)} of {len(results)} hits, budget scale {scale:.2f}"
+    )
+    return kept, replace(
+        query_param,
+        max_token_for_text_unit=int(query_param.max_token_for_text_unit * scale),
+        max_token_for_global_context=int(
+            query_param.max_token_for_global_context * scale
+        ),
+        max_token_for_local_context=int(
+            query_param.max_token_for_local_context * scale
+        ),
+    )
+
+
 async def _build_query_context(
-    ll_keywords: str,
-    hl_keywords: str,
+    ll_keywords: str | None,
+    hl_keywords: str | None,
     knowledge_graph_inst: BaseGraphStorage,
     entities_vdb: BaseVectorStorage,
     relationships_vdb: BaseVectorStorage,
     text_chunks_db: BaseKVStorage,
     query_param: QueryParam,
+    speculative_tasks: dict[str, asyncio.Task] | None = None,
 ):
+    speculative = {}
+    if speculative_tasks:
+        speculative = await _collect_speculative_retrieval(
+            speculative_tasks, query_param.mode
+        )
+
     if query_param.mode == "local":
         entities_context, relations_context, text_units_context = await _get_node_data(
             ll_keywords,
@@ -1003,6 +1422,7 @@ async def _build_query_context(
             entities_vdb,
             text_chunks_db,
             query_param,
+            speculative.get("local"),
         )
     elif query_param.mode == "global":
         entities_context, relations_context, text_units_context = await _get_edge_data(
@@ -1011,6 +1431,7 @@ async def _build_query_context(
             relationships_vdb,
             text_chunks_db,
             query_param,
+            speculative.get("global"),
         )
     else:  # hybrid mode
         ll_data, hl_data = await asyncio.gather(
@@ -1020,6 +1441,7 @@ async def _build_query_context(
                 entities_vdb,
                 text_chunks_db,
                 query_param,
+                speculative.get("local"),
             ),
             _get_edge_data(
                 hl_keywords,
@@ -1027,6 +1449,7 @@ async def _build_query_context(
                 relationships_vdb,
                 text_chunks_db,
                 query_param,
+                speculative.get("global"),
             ),
         )
 
@@ -1069,36 +1492,36 @@ async def _build_query_context(
 
 
 async def _get_node_data(
-    query: str,
+    query: str | None,
     knowledge_graph_inst: BaseGraphStorage,
     entities_vdb: BaseVectorStorage,
     text_chunks_db: BaseKVStorage,
     query_param: QueryParam,
+    speculative_results: list[dict] | None = None,
 ):
-    # get similar entities
-    logger.info(
-        f"Query nodes: {query}, top_k: {query_param.top_k}, cosine: {entities_vdb.cosine_better_than_threshold}"
-    )
-    results = await entities_vdb.query(query, top_k=query_param.top_k)
+    # get similar entities, without keywords the speculative hits are used as they are
+    if query is None:
+        results = speculative_results or []
+    else:
+        logger.info(
+            f"Query nodes: {query}, top_k: {query_param.top_k}, cosine: {entities_vdb.cosine_better_than_threshold}"
+        )
+        results = await entities_vdb.query(query, top_k=query_param.top_k)
+        results = _merge_vdb_results(results, speculative_results, query_param.top_k)
+    results, query_param = _adapt_to_hits(results, query_param)
     if not len(results):
         return "", "", ""
     # get entity information
-    node_datas, node_degrees = await asyncio.gather(
-        asyncio.gather(
-            *[knowledge_graph_inst.get_node(r["entity_name"]) for r in results]
-        ),
-        asyncio.gather(
-            *[knowledge_graph_inst.node_degree(r["entity_name"]) for r in results]
-        ),
-    )
+    entity_names = [r["entity_name"] for r in results]
+    nodes = await knowledge_graph_inst.get_nodes_with_degrees_batch(entity_names)
 
-    if not all([n is not None for n in node_datas]):
+    if not all([name in nodes for name in entity_names]):
         logger.warning("Some nodes are missing, maybe the storage is damaged")
 
     node_datas = [
-        {**n, "entity_name": k["entity_name"], "rank": d}
-        for k, n, d in zip(results, node_datas, node_degrees)
-        if n is not None
+        {**nodes[name], "entity_name": name, "rank": nodes[name]["degree"]}
+        for name in entity_names
+        if name in nodes
     ]  # what is this text_chunks_db doing.  dont remember it in airvx.  check the diagram.
     # get entitytext chunk
     use_text_units, use_relations = await asyncio.gather(
@@ -1115,6 +1538,7 @@ async def _get_node_data(
         node_datas,
         key=lambda x: x["description"],
         max_token_size=query_param.max_token_for_local_context,
+        token_count=lambda x: x.get("description_tokens"),
     )
     logger.debug(
         f"Truncate entities from {len_node_datas} to {len(node_datas)} (max tokens:{query_param.max_token_for_local_context})"
@@ -1186,79 +1610,100 @@ async def _find_most_related_text_unit_from_entities(
         split_string_by_multi_markers(dp["source_id"], [GRAPH_FIELD_SEP])
         for dp in node_datas
     ]
-    edges = await asyncio.gather(
-        *[knowledge_graph_inst.get_node_edges(dp["entity_name"]) for dp in node_datas]
+    nodes_edges = await knowledge_graph_inst.get_nodes_edges_batch(
+        [dp["entity_name"] for dp in node_datas]
     )
-    all_one_hop_nodes = set()
-    for this_edges in edges:
-        if not this_edges:
-            continue
-        all_one_hop_nodes.update([e[1] for e in this_edges])
+    edges = [nodes_edges.get(dp["entity_name"]) or [] for dp in node_datas]
+    all_one_hop_nodes = {e[1] for this_edges in edges for e in this_edges}
 
-    all_one_hop_nodes = list(all_one_hop_nodes)
-    all_one_hop_nodes_data = await asyncio.gather(
-        *[knowledge_graph_inst.get_node(e) for e in all_one_hop_nodes]
+    all_one_hop_nodes_data = await knowledge_graph_inst.get_nodes_batch(
+        list(all_one_hop_nodes)
     )
 
-    # Add null check for node data
-    all_one_hop_text_units_lookup = {
-        k: set(split_string_by_multi_markers(v["source_id"], [GRAPH_FIELD_SEP]))
-        for k, v in zip(all_one_hop_nodes, all_one_hop_nodes_data)
-        if v is not None and "source_id" in v  # Add source_id check
-    }
-
-    all_text_units_lookup = {}
-    tasks = []
-    for index, (this_text_units, this_edges) in enumerate(zip(text_units, edges)):
+    # Chunks are indexed in first-seen order, so ties keep the entity ranking
+    chunk_index: dict[str, int] = {}
+    unit_rows, unit_cols = [], []
+    for i, this_text_units in enumerate(text_units):
         for c_id in this_text_units:
-            if c_id not in all_text_units_lookup:
-                tasks.append((c_id, index, this_edges))
-
-    results = await asyncio.gather(
-        *[text_chunks_db.get_by_id(c_id) for c_id, _, _ in tasks]
-    )
+            unit_rows.append(i)
+            unit_cols.append(chunk_index.setdefault(c_id, len(chunk_index)))
+    if not chunk_index:
+        logger.warning("No valid text units found")
+        return []
+    n_entities, n_chunks = len(node_datas), len(chunk_index)
 
-    for (c_id, index, this_edges), data in zip(tasks, results):
-        all_text_units_lookup[c_id] = {
-            "data": data,
-            "order": index,
-            "relation_counts": 0,
-        }
+    # One-hop neighbour × chunk incidence, limited to the candidate chunks
+    neighbor_index: dict[str, int] = {}
+    neighbor_rows, neighbor_cols = [], []
+    for name, data in all_one_hop_nodes_data.items():
+        if "source_id" not in data:
+            continue
+        for c_id in set(
+            split_string_by_multi_markers(data["source_id"], [GRAPH_FIELD_SEP])
+        ):
+            if c_id in chunk_index:
+                neighbor_rows.append(
+                    neighbor_index.setdefault(name, len(neighbor_index))
+                )
+                neighbor_cols.append(chunk_index[c_id])
 
-        if this_edges:
-            for e in this_edges:
-                if (
-                    e[1] in all_one_hop_text_units_lookup
-                    and c_id in all_one_hop_text_units_lookup[e[1]]
-                ):
-                    all_text_units_lookup[c_id]["relation_counts"] += 1
-
-    # Filter out None values and ensure data has content
-    all_text_units = [
-        {"id": k, **v}
-        for k, v in all_text_units_lookup.items()
-        if v is not None and v.get("data") is not None and "content" in v["data"]
-    ]
+    # Entity × neighbour edge counts
+    edge_rows, edge_cols = [], []
+    for i, this_edges in enumerate(edges):
+        for e in this_edges:
+            if e[1] in neighbor_index:
+                edge_rows.append(i)
+                edge_cols.append(neighbor_index[e[1]])
+
+    # A chunk belongs to the first (best ranked) entity citing it
+    _, first_seen = np.unique(unit_cols, return_index=True)
+    order = np.asarray(unit_rows, dtype=np.int64)[first_seen]
+    incidence = sp.csr_matrix(
+        (np.ones(n_chunks), (order, np.arange(n_chunks))),
+        shape=(n_entities, n_chunks),
+    )
+    adjacency = sp.csr_matrix(
+        (np.ones(len(edge_rows)), (edge_rows, edge_cols)),
+        shape=(n_entities, len(neighbor_index)),
+    )
+    neighbor_chunks = sp.csr_matrix(
+        (np.ones(len(neighbor_rows)), (neighbor_rows, neighbor_cols)),
+        shape=(len(neighbor_index), n_chunks),
+    )
+    # Edges of the owning entity whose neighbour also cites the chunk
+    relation_counts = np.asarray(
+        (adjacency @ neighbor_chunks).multiply(incidence).sum(axis=0)
+    ).ravel()
+
+    chunk_ids = list(chunk_index)
+    ranked_ids = [chunk_ids[i] for i in np.lexsort((-relation_counts, order))]
+
+    # Fetch in rank order, a window of roughly one token budget at a time, until
+    # the budget is exceeded
+    chunk_token_size = text_chunks_db.global_config.get("chunk_token_size") or 1200
+    window = max(1, query_param.max_token_for_text_unit // chunk_token_size + 1)
+    candidates, all_text_units = [], []
+    for start in range(0, len(ranked_ids), window):
+        chunks = await text_chunks_db.get_by_ids(ranked_ids[start : start + window])
+        candidates.extend(
+            chunk for chunk in chunks if chunk is not None and "content" in chunk
+        )
+        all_text_units = truncate_list_by_token_size(
+            candidates,
+            key=lambda x: x["content"],
+            max_token_size=query_param.max_token_for_text_unit,
+            token_count=lambda x: x.get("tokens"),
+        )
+        if len(all_text_units) < len(candidates):
+            break
 
-    if not all_text_units:
+    if not candidates:
         logger.warning("No valid text units found")
         return []
 
-    all_text_units = sorted(
-        all_text_units, key=lambda x: (x["order"], -x["relation_counts"])
-    )
-
-    all_text_units = truncate_list_by_token_size(
-        all_text_units,
-        key=lambda x: x["data"]["content"],
-        max_token_size=query_param.max_token_for_text_unit,
-    )
-
     logger.debug(
-        f"Truncate chunks from {len(all_text_units_lookup)} to {len(all_text_units)} (max tokens:{query_param.max_token_for_text_unit})"
+        f"Truncate chunks from {n_chunks} to {len(all_text_units)} (max tokens:{query_param.max_token_for_text_unit})"
     )
-
-    all_text_units = [t["data"] for t in all_text_units]
     return all_text_units
 
 
@@ -1267,29 +1712,23 @@ async def _find_most_related_edges_from_entities(
     query_param: QueryParam,
     knowledge_graph_inst: BaseGraphStorage,
 ):
-    all_related_edges = await asyncio.gather(
-        *[knowledge_graph_inst.get_node_edges(dp["entity_name"]) for dp in node_datas]
-    )
+    entity_names = [dp["entity_name"] for dp in node_datas]
+    all_related_edges = await knowledge_graph_inst.get_nodes_edges_batch(entity_names)
     all_edges = []
     seen = set()
 
-    for this_edges in all_related_edges:
-        for e in this_edges:
+    for name in entity_names:
+        for e in all_related_edges.get(name, []):
             sorted_edge = tuple(sorted(e))
             if sorted_edge not in seen:
                 seen.add(sorted_edge)
                 all_edges.append(sorted_edge)
 
-    all_edges_pack, all_edges_degree = await asyncio.gather(
-        asyncio.gather(*[knowledge_graph_inst.get_edge(e[0], e[1]) for e in all_edges]),
-        asyncio.gather(
-            *[knowledge_graph_inst.edge_degree(e[0], e[1]) for e in all_edges]
-        ),
-    )
+    all_edges_pack = await knowledge_graph_inst.get_edges_with_degrees_batch(all_edges)
     all_edges_data = [
-        {"src_tgt": k, "rank": d, **v}
-        for k, v, d in zip(all_edges, all_edges_pack, all_edges_degree)
-        if v is not None
+        {"src_tgt": k, "rank": all_edges_pack[k]["degree"], **all_edges_pack[k]}
+        for k in all_edges
+        if k in all_edges_pack
     ]
     all_edges_data = sorted(
         all_edges_data, key=lambda x: (x["rank"], x["weight"]), reverse=True
@@ -1298,6 +1737,7 @@ async def _find_most_related_edges_from_entities(
         all_edges_data,
         key=lambda x: x["description"],
         max_token_size=query_param.max_token_for_global_context,
+        token_count=lambda x: x.get("description_tokens"),
     )
 
     logger.debug(
@@ -1308,42 +1748,40 @@ async def _find_most_related_edges_from_entities(
 
 
 async def _get_edge_data(
-    keywords,
+    keywords: str | None,
     knowledge_graph_inst: BaseGraphStorage,
     relationships_vdb: BaseVectorStorage,
     text_chunks_db: BaseKVStorage,
     query_param: QueryParam,
+    speculative_results: list[dict] | None = None,
 ):
-    logger.info(
-        f"Query edges: {keywords}, top_k: {query_param.top_k}, cosine: {relationships_vdb.cosine_better_than_threshold}"
-    )
-    results = await relationships_vdb.query(keywords, top_k=query_param.top_k)
+    # Without keywords the speculative hits are used as they are
+    if keywords is None:
+        results = speculative_results or []
+    else:
+        logger.info(
+            f"Query edges: {keywords}, top_k: {query_param.top_k}, cosine: {relationships_vdb.cosine_better_than_threshold}"
+        )
+        results = await relationships_vdb.query(keywords, top_k=query_param.top_k)
+        results = _merge_vdb_results(results, speculative_results, query_param.top_k)
+    results, query_param = _adapt_to_hits(results, query_param)
 
     if not len(results):
         return "", "", ""
 
-    edge_datas, edge_degree = await asyncio.gather(
-        asyncio.gather(
-            *[knowledge_graph_inst.get_edge(r["src_id"], r["tgt_id"]) for r in results]
-        ),
-        asyncio.gather(
-            *[
-                knowledge_graph_inst.edge_degree(r["src_id"], r["tgt_id"])
-                for r in results
-            ]
-        ),
-    )
+    pairs = [(r["src_id"], r["tgt_id"]) for r in results]
+    edges = await knowledge_graph_inst.get_edges_with_degrees_batch(pairs)
 
     edge_datas = [
         {
             "src_id": k["src_id"],
             "tgt_id": k["tgt_id"],
-            "rank": d,
+            "rank": edges[pair]["degree"],
             "created_at": k.get("__created_at__", None),
-            **v,
+            **edges[pair],
         }
-        for k, v, d in zip(results, edge_datas, edge_degree)
-        if v is not None
+        for k, pair in zip(results, pairs)
+        if pair in edges
     ]
     edge_datas = sorted(
         edge_datas, key=lambda x: (x["rank"], x["weight"]), reverse=True
@@ -1352,6 +1790,7 @@ async def _get_edge_data(
         edge_datas,
         key=lambda x: x["description"],
         max_token_size=query_param.max_token_for_global_context,
+        token_count=lambda x: x.get("description_tokens"),
     )
     use_entities, use_text_units = await asyncio.gather(
         _find_most_related_entities_from_relationships(
@@ -1432,23 +1871,11 @@ async def _find_most_related_entities_from_relationships(
             entity_names.append(e["tgt_id"])
             seen.add(e["tgt_id"])
 
-    node_datas, node_degrees = await asyncio.gather(
-        asyncio.gather(
-            *[
-                knowledge_graph_inst.get_node(entity_name)
-                for entity_name in entity_names
-            ]
-        ),
-        asyncio.gather(
-            *[
-                knowledge_graph_inst.node_degree(entity_name)
-                for entity_name in entity_names
-            ]
-        ),
-    )
+    nodes = await knowledge_graph_inst.get_nodes_with_degrees_batch(entity_names)
     node_datas = [
-        {**n, "entity_name": k, "rank": d}
-        for k, n, d in zip(entity_names, node_datas, node_degrees)
+        {**nodes[k], "entity_name": k, "rank": nodes[k]["degree"]}
+        for k in entity_names
+        if k in nodes
     ]
 
     len_node_datas = len(node_datas)
@@ -1456,6 +1883,7 @@ async def _find_most_related_entities_from_relationships(
         node_datas,
         key=lambda x: x["description"],
         max_token_size=query_param.max_token_for_local_context,
+        token_count=lambda x: x.get("description_tokens"),
     )
     logger.debug(
         f"Truncate entities from {len_node_datas} to {len(node_datas)} (max tokens:{query_param.max_token_for_local_context})"
@@ -1513,6 +1941,7 @@ async def _find_related_text_unit_from_relationships(
         valid_text_units,
         key=lambda x: x["data"]["content"],
         max_token_size=query_param.max_token_for_text_unit,
+        token_count=lambda x: x["data"].get("tokens"),
     )
 
     logger.debug(
@@ -1561,9 +1990,14 @@ async def naive_query(
     if cached_response is not None:
         return cached_response
 
-    results = await chunks_vdb.query(query, top_k=query_param.top_k)
+    results = await run_before_deadline(
+        chunks_vdb.query(query, top_k=query_param.top_k),
+        "vector retrieval",
+        reserve=_VECTOR_DEADLINE_RESERVE,
+    )
     if not len(results):
         return PROMPTS["fail_response"]
+    results, chunk_param = _adapt_to_hits(results, query_param)
 
     chunks_ids = [r["id"] for r in results]
     chunks = await text_chunks_db.get_by_ids(chunks_ids)
@@ -1580,7 +2014,8 @@ async def naive_query(
     maybe_trun_chunks = truncate_list_by_token_size(
         valid_chunks,
         key=lambda x: x["content"],
-        max_token_size=query_param.max_token_for_text_unit,
+        max_token_size=chunk_param.max_token_for_text_unit,
+        token_count=lambda x: x.get("tokens"),
     )
 
     if not maybe_trun_chunks:
@@ -1588,10 +2023,11 @@ async def naive_query(
         return PROMPTS["fail_response"]
 
     logger.debug(
-        f"Truncate chunks from {len(chunks)} to {len(maybe_trun_chunks)} (max tokens:{query_param.max_token_for_text_unit})"
+        f"Truncate chunks from {len(chunks)} to {len(maybe_trun_chunks)} (max tokens:{chunk_param.max_token_for_text_unit})"
     )
 
     section = "\n--New Chunk--\n".join([c["content"] for c in maybe_trun_chunks])
+    query_param.included_contexts = ["vector"]
 
     if query_param.only_need_context:
         return section
@@ -1613,12 +2049,17 @@ async def naive_query(
     if query_param.only_need_prompt:
         return sys_prompt
 
-    len_of_prompts = len(encode_string_by_tiktoken(query + sys_prompt))
-    logger.debug(f"[naive_query]Prompt Tokens: {len_of_prompts}")
+    _record_query_stats(query, sys_prompt, query_param)
+    if logger.isEnabledFor(logging.DEBUG):
+        len_of_prompts = len(encode_string_by_tiktoken(query + sys_prompt))
+        logger.debug(f"[naive_query]Prompt Tokens: {len_of_prompts}")
 
-    response = await use_model_func(
-        query,
-        system_prompt=sys_prompt,
+    response = await run_before_deadline(
+        use_model_func(
+            query,
+            system_prompt=sys_prompt,
+        ),
+        "generation",
     )
 
     if len(response) > len(sys_prompt):
@@ -1755,13 +2196,18 @@ async def kg_query_with_keywords(
     if query_param.only_need_prompt:
         return sys_prompt
 
-    len_of_prompts = len(encode_string_by_tiktoken(query + sys_prompt))
-    logger.debug(f"[kg_query_with_keywords]Prompt Tokens: {len_of_prompts}")
+    _record_query_stats(query, sys_prompt, query_param)
+    if logger.isEnabledFor(logging.DEBUG):
+        len_of_prompts = len(encode_string_by_tiktoken(query + sys_prompt))
+        logger.debug(f"[kg_query_with_keywords]Prompt Tokens: {len_of_prompts}")
 
-    response = await use_model_func(
-        query,
-        system_prompt=sys_prompt,
-        stream=query_param.stream,
+    response = await run_before_deadline(
+        use_model_func(
+            query,
+            system_prompt=sys_prompt,
+            stream=query_param.stream,
+        ),
+        "generation",
     )
     if isinstance(response, str) and len(response) > len(sys_prompt):
         response = (
@@ -0,0 +1,110 @@
+"""Compare the LLM and local keyword extractors on a set of queries.
+
+For every query both extractors run against the same LightRAG instance, and the
+entities (low-level keywords) and relationships (high-level keywords) they retrieve
+are compared by Jaccard overlap, alongside the extraction latency.
+
+Usage:
+    python -m src.rag_service.lightrag.tools.keyword_benchmark queries.txt [--top-k 20]
+
+`queries.txt` holds one query per line. The knowledge base is loaded the same way
+the service does it, from the environment configuration.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from dataclasses import replace
+
+from ..base import QueryParam
+from ..lightrag import LightRAG
+from ..operate import extract_keywords_only
+
+
+def _jaccard(a: set[str], b: set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+async def _retrieve_ids(
+    rag: LightRAG, hl_keywords: list[str], ll_keywords: list[str], top_k: int
+) -> tuple[set[str], set[str]]:
+    entities, relationships = await asyncio.gather(
+        rag.entities_vdb.query(", ".join(ll_keywords), top_k=top_k)
+        if ll_keywords
+        else asyncio.sleep(0, result=[]),
+        rag.relationships_vdb.query(", ".join(hl_keywords), top_k=top_k)
+        if hl_keywords
+        else asyncio.sleep(0, result=[]),
+    )
+    return {r["id"] for r in entities}, {r["id"] for r in relationships}
+
+
+async def run_keyword_benchmark(
+    rag: LightRAG, queries: list[str], top_k: int = 20
+) -> dict:
+    """Run both extractors on every query and return per-query and aggregate results."""
+    rows = []
+    for query in queries:
+        row = {"query": query}
+        retrieved = {}
+        for extractor in ["llm", "local"]:
+            param = replace(QueryParam(mode="hybrid"), keyword_extractor=extractor)
+            start = time.perf_counter()
+            hl_keywords, ll_keywords = await extract_keywords_only(
+                query,
+                param,
+                rag.global_config,
+                rag._get_hashing_kv(),
+                rag.local_keyword_extractor,
+            )
+            row[f"{extractor}_seconds"] = time.perf_counter() - start
+            row[f"{extractor}_keywords"] = {"hl": hl_keywords, "ll": ll_keywords}
+            retrieved[extractor] = await _retrieve_ids(
+                rag, hl_keywords, ll_keywords, top_k
+            )
+        row["entity_overlap"] = _jaccard(retrieved["llm"][0], retrieved["local"][0])
+        row["relationship_overlap"] = _jaccard(
+            retrieved["llm"][1], retrieved["local"][1]
+        )
+        rows.append(row)
+
+    summary = {}
+    if rows:
+        for key in [
+            "llm_seconds",
+            "local_seconds",
+            "entity_overlap",
+            "relationship_overlap",
+        ]:
+            summary[f"mean_{key}"] = statistics.mean(r[key] for r in rows)
+    return {"queries": rows, "summary": summary}
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from src.rag_service.service import RAGService
+
+    with open(args.queries, encoding="utf8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+
+    rag_service = RAGService()
+    await rag_service.init()
+    await rag_service.set_rag_llm("openai", "gpt-4o")
+    results = await run_keyword_benchmark(rag_service.light_rag, queries, args.top_k)
+    if args.verbose:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        print(json.dumps(results["summary"], indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("queries", help="file with one query per line")
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--verbose", action="store_true", help="print every query")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,146 @@
+"""Compare fixed and adaptive, or plain and speculative, retrieval on a set of queries.
+
+Every query builds its context twice against the same LightRAG instance, once with
+the fixed `top_k` and token limits and once with `adaptive_retrieval`, and the
+context-building latency and context size in tokens are reported side by side.
+
+With `--speculative` the two runs are without and with `speculative_retrieval`
+instead, in a local, global or hybrid `--mode`. The LLM cache is disabled for
+them, so both runs pay for keyword extraction, the step speculative retrieval
+can skip.
+
+Usage:
+    python -m src.rag_service.lightrag.tools.retrieval_benchmark queries.txt [--mode mix] [--top-k 120] [--speculative]
+
+`queries.txt` holds one query per line. The knowledge base is loaded the same way
+the service does it, from the environment configuration. Keywords are extracted
+once per query before timing, so both runs measure retrieval only. Queries whose
+answer is already in the LLM response cache return that answer instead of a
+context, so run it against a fresh cache.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from dataclasses import replace
+
+from ..base import QueryParam
+from ..lightrag import LightRAG
+from ..utils import count_tokens
+
+
+async def run_retrieval_benchmark(
+    rag: LightRAG, queries: list[str], mode: str = "mix", top_k: int = 120
+) -> dict:
+    """Build the context in fixed and adaptive mode for every query and return per-query and aggregate results."""
+    rows = []
+    for query in queries:
+        row = {"query": query}
+        base = QueryParam(mode=mode, only_need_context=True, top_k=top_k)
+        # Warm the keyword cache so that both timed runs skip extraction
+        await rag.aquery(query, replace(base))
+        for name, adaptive in [("fixed", False), ("adaptive", True)]:
+            start = time.perf_counter()
+            context = await rag.aquery(
+                query, replace(base, adaptive_retrieval=adaptive)
+            )
+            row[f"{name}_seconds"] = time.perf_counter() - start
+            row[f"{name}_tokens"] = _context_tokens(context)
+        row["token_saving"] = (
+            1 - row["adaptive_tokens"] / row["fixed_tokens"]
+            if row["fixed_tokens"]
+            else 0.0
+        )
+        rows.append(row)
+
+    summary = {}
+    if rows:
+        for key in [
+            "fixed_seconds",
+            "adaptive_seconds",
+            "fixed_tokens",
+            "adaptive_tokens",
+            "token_saving",
+        ]:
+            summary[f"mean_{key}"] = statistics.mean(r[key] for r in rows)
+    return {"queries": rows, "summary": summary}
+
+
+def _context_tokens(context: str | dict | None) -> int:
+    # mix mode returns its KG and vector contexts separately, either may be None
+    if isinstance(context, dict):
+        return sum(count_tokens(part) for part in context.values() if part)
+    return count_tokens(context) if context else 0
+
+
+async def run_speculative_benchmark(
+    rag: LightRAG, queries: list[str], mode: str = "hybrid", top_k: int = 60
+) -> dict:
+    """Build the context without and with speculative retrieval for every query, keyword extraction included."""
+    # global_config is a read-only snapshot: reassign the field to get a new one, and
+    # hand it to the cache storage, which keeps the snapshot it was created with
+    cache = rag.llm_response_cache
+    cache_config, enable_llm_cache = cache.global_config, rag.enable_llm_cache
+    rag.enable_llm_cache = False
+    cache.global_config = rag.global_config
+    rows = []
+    try:
+        for query in queries:
+            row = {"query": query}
+            base = QueryParam(mode=mode, only_need_context=True, top_k=top_k)
+            for name, speculative in [("plain", False), ("speculative", True)]:
+                start = time.perf_counter()
+                await rag.aquery(
+                    query, replace(base, speculative_retrieval=speculative)
+                )
+                row[f"{name}_seconds"] = time.perf_counter() - start
+            rows.append(row)
+    finally:
+        rag.enable_llm_cache = enable_llm_cache
+        cache.global_config = cache_config
+
+    summary = {}
+    if rows:
+        for key in ["plain_seconds", "speculative_seconds"]:
+            summary[f"mean_{key}"] = statistics.mean(r[key] for r in rows)
+            summary[f"median_{key}"] = statistics.median(r[key] for r in rows)
+    return {"queries": rows, "summary": summary}
+
+
+async def _main(args: argparse.Namespace) -> None:
+    from src.rag_service.service import RAGService
+
+    with open(args.queries, encoding="utf8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+
+    rag_service = RAGService()
+    await rag_service.init()
+    await rag_service.set_rag_llm("openai", "gpt-4o")
+    benchmark = (
+        run_speculative_benchmark if args.speculative else run_retrieval_benchmark
+    )
+    results = await benchmark(rag_service.light_rag, queries, args.mode, args.top_k)
+    if args.verbose:
+        print(json.dumps(results, indent=2, ensure_ascii=False))
+    else:
+        print(json.dumps(results["summary"], indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("queries", help="file with one query per line")
+    parser.add_argument(
+        "--mode", default="mix", choices=["local", "global", "hybrid", "naive", "mix"]
+    )
+    parser.add_argument("--top-k", type=int, default=120)
+    parser.add_argument(
+        "--speculative",
+        action="store_true",
+        help="compare plain and speculative retrieval instead of fixed and adaptive",
+    )
+    parser.add_argument("--verbose", action="store_true", help="print every query")
+    asyncio.run(_main(parser.parse_args()))
@@ -8,13 +8,18 @@ import json
 import logging
 import os
 import re
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
 from functools import wraps
 from hashlib import md5
-from typing import Any, Callable
+from typing import Any, AsyncIterator, Callable
 import xml.etree.ElementTree as ET
 import numpy as np
 import tiktoken
+from src.rag_service.lightrag.exceptions import QueryDeadlineExceeded
 from src.rag_service.lightrag.prompt import PROMPTS
 from dotenv import load_dotenv
 
@@ -68,7 +73,20 @@ class UnlimitedSemaphore:
 
 ENCODER = None
 
-statistic_data = {"llm_call": 0, "llm_cache": 0, "embed_call": 0}
+TOKEN_COUNT_CACHE_SIZE = int(os.getenv("TOKEN_COUNT_CACHE_SIZE", "65536"))
+_token_count_cache: OrderedDict[bytes, int] = OrderedDict()
+
+statistic_data = {"llm_call": 0, "llm_cache": 0, "embed_call": 0, "deadline_hit": 0}
+
+# (deadline, timeout) of the query running in the current context
+_query_deadline: ContextVar[tuple[float, float] | None] = ContextVar(
+    "query_deadline", default=None
+)
+
+# text -> embedding computed ahead of time for the queries running in this context
+_prefetched_embeddings: ContextVar[dict[str, np.ndarray] | None] = ContextVar(
+    "prefetched_embeddings", default=None
+)
 
 logger = logging.getLogger("lightrag")
 
@@ -105,6 +123,14 @@ class EmbeddingFunc:
     # concurrent_limit: int = 16
 
     async def __call__(self, *args, **kwargs) -> np.ndarray:
+        prefetched = _prefetched_embeddings.get()
+        if (
+            prefetched
+            and args
+            and isinstance(args[0], list)
+            and all(text in prefetched for text in args[0])
+        ):
+            return np.stack([prefetched[text] for text in args[0]])
         return await self.func(*args, **kwargs)
 
 
@@ -173,6 +199,42 @@ def compute_mdhash_id(content: str, prefix: str = "") -> str:
     return prefix + md5(content.encode()).hexdigest()
 
 
+class _SlotHoldingStream:
+    """Async iterator that keeps a concurrency slot until the stream ends or is closed.
+
+    A streamed LLM response keeps the model busy after the call returns, so the slot
+    is released only once the stream is exhausted, fails, is cancelled or is closed.
+    """
+
+    def __init__(self, stream: AsyncIterator, sem: asyncio.Semaphore):
+        self._stream = stream
+        self._sem = sem
+        self._released = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._stream.__anext__()
+        except BaseException:
+            self._release()
+            raise
+
+    async def aclose(self) -> None:
+        self._release()
+        if hasattr(self._stream, "aclose"):
+            await self._stream.aclose()
+
+    def _release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._sem.release()
+
+    def __del__(self):
+        self._release()
+
+
 def limit_async_func_call(max_size: int):
     """Add restriction of maximum concurrent async calls using asyncio.Semaphore"""
 
@@ -181,9 +243,16 @@ def limit_async_func_call(max_size: int):
 
         @wraps(func)
         async def wait_func(*args, **kwargs):
-            async with sem:
+            await sem.acquire()
+            try:
                 result = await func(*args, **kwargs)
-                return result
+            except BaseException:
+                sem.release()
+                raise
+            if hasattr(result, "__anext__"):
+                return _SlotHoldingStream(result, sem)
+            sem.release()
+            return result
 
         return wait_func
 
@@ -208,8 +277,12 @@ def load_json(file_name):
 
 
 def write_json(json_obj, file_name):
-    with open(file_name, "w", encoding="utf-8") as f:
+    # Write through a temp file so that concurrent readers (other worker processes
+    # sharing a snapshot) never see a partially written file
+    tmp_file_name = f"{file_name}.{os.getpid()}.tmp"
+    with open(tmp_file_name, "w", encoding="utf-8") as f:
         json.dump(json_obj, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_file_name, file_name)
 
 
 def encode_string_by_tiktoken(content: str, model_name: str = "gpt-4o"):
@@ -220,6 +293,20 @@ def encode_string_by_tiktoken(content: str, model_name: str = "gpt-4o"):
     return tokens
 
 
+def count_tokens(content: str) -> int:
+    """Count the tokens of `content`, memoized in an LRU keyed by the content hash."""
+    key = md5(content.encode("utf-8")).digest()
+    count = _token_count_cache.get(key)
+    if count is not None:
+        _token_count_cache.move_to_end(key)
+        return count
+    count = len(encode_string_by_tiktoken(content))
+    _token_count_cache[key] = count
+    if len(_token_count_cache) > TOKEN_COUNT_CACHE_SIZE:
+        _token_count_cache.popitem(last=False)
+    return count
+
+
 def decode_tokens_by_tiktoken(tokens: list[int], model_name: str = "gpt-4o"):
     global ENCODER
     if ENCODER is None:
@@ -228,6 +315,68 @@ def decode_tokens_by_tiktoken(tokens: list[int], model_name: str = "gpt-4o"):
     return content
 
 
+@contextmanager
+def query_deadline(timeout: float | None):
+    """Set a deadline of `timeout` seconds for the query running in this context.
+
+    Tasks created inside inherit it, stages read it with `deadline_remaining` and
+    `run_before_deadline`. A None timeout leaves the query unbounded.
+    """
+    if timeout is None:
+        yield
+        return
+    token = _query_deadline.set((time.monotonic() + timeout, timeout))
+    try:
+        yield
+    finally:
+        _query_deadline.reset(token)
+
+
+@contextmanager
+def prefetched_embeddings(embeddings: dict[str, np.ndarray]):
+    """Serve the embeddings of these texts from memory in this context.
+
+    Used by batch queries, which embed all their texts in a few large calls up front.
+    """
+    token = _prefetched_embeddings.set(embeddings)
+    try:
+        yield
+    finally:
+        _prefetched_embeddings.reset(token)
+
+
+def deadline_remaining(reserve: float = 0.0) -> float | None:
+    """Seconds left before the query deadline, minus `reserve` (a fraction of the
+    whole timeout kept for later stages). None when no deadline is set.
+    """
+    deadline = _query_deadline.get()
+    if deadline is None:
+        return None
+    end, timeout = deadline
+    return max(0.0, end - timeout * reserve - time.monotonic())
+
+
+def record_deadline_hit(stage: str) -> None:
+    statistic_data["deadline_hit"] += 1
+    logger.warning(f"Query deadline hit during {stage}")
+
+
+async def run_before_deadline(awaitable, stage: str, reserve: float = 0.0):
+    """Await `awaitable` within the query deadline (see `deadline_remaining`).
+
+    Raises:
+        QueryDeadlineExceeded: the budget for `stage` ran out, the work is cancelled.
+    """
+    remaining = deadline_remaining(reserve)
+    if remaining is None:
+        return await awaitable
+    try:
+        return await asyncio.wait_for(awaitable, timeout=remaining)
+    except asyncio.TimeoutError:
+        record_deadline_hit(stage)
+        raise QueryDeadlineExceeded(stage) from None
+
+
 def pack_user_ass_to_openai_messages(*args: str):
     roles = ["user", "assistant"]
     return [
@@ -261,14 +410,25 @@ def is_float_regex(value: str) -> bool:
 
 
 def truncate_list_by_token_size(
-    list_data: list[Any], key: Callable[[Any], str], max_token_size: int
+    list_data: list[Any],
+    key: Callable[[Any], str],
+    max_token_size: int,
+    token_count: Callable[[Any], Any] | None = None,
 ) -> list[int]:
-    """Truncate a list of data by token size"""
+    """Truncate a list of data by token size
+
+    `token_count` returns the token count stored with an item at write time, items
+    without a usable count are counted with the memoized `count_tokens`.
+    """
     if max_token_size <= 0:
         return []
     tokens = 0
     for i, data in enumerate(list_data):
-        tokens += len(encode_string_by_tiktoken(key(data)))
+        stored = token_count(data) if token_count is not None else None
+        try:
+            tokens += int(stored)
+        except (TypeError, ValueError):
+            tokens += count_tokens(key(data))
         if tokens > max_token_size:
             return list_data[:i]
     return list_data
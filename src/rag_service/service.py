@@ -1,19 +1,23 @@
 import os
 import asyncio
-from typing import AsyncIterator, Dict
+import hashlib
+import time
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, Dict
 from typing import List
 from functools import partial
 from src.rag_service.config import Config
 import nest_asyncio
 import logfire
 import shutil
+from collections import OrderedDict
+from contextlib import asynccontextmanager
 
-from pyvis.network import Network
-import tempfile
-import aiofiles
-import networkx as nx
-from pathlib import Path
+from src.rag_service.docs_watcher import DocsWatcher
+from src.rag_service.graph_view import build_graph_view, render_graph_html
 from src.rag_service.input_validation import validate_input
+from src.rag_service.single_flight import SingleFlight, query_flight_key
+from src.rag_service.snapshots import SnapshotStore, WriterBusyError
+from src.rag_service.uploads import stage_upload
 from src.log import get_logger
 from src.rag_service.lightrag import LightRAG
 from src.rag_service.llms import create_embedding_function_instance
@@ -38,9 +42,34 @@ class RAGService:
         self.light_rag: LightRAG | None = None
         self.rag_docs: RAGDocs | None = None
         self.rag_docs_lock = asyncio.Lock()
+        # Keeps rag_docs in step with changes made to the source docs from outside
+        self.docs_watcher: DocsWatcher | None = None
+        # Uploaded source files waiting to be indexed
+        self.ingest_pending: List[str] = []
+        self.ingest_task: asyncio.Task | None = None
         self.stop_metrics_update = False
         self.knowledge_base_status: RagServiceStatus = RagServiceStatus.INIT
         self.knowledge_base_status_lock = asyncio.Lock()
+        self.rag_llm_name: str | None = None
+        self.query_flights = SingleFlight()
+        # Bumped whenever the indexed knowledge changes, quick answers of an older
+        # generation are not served
+        self.kb_generation = 0
+        self.quick_answers: Dict[str, tuple[int, str]] = {}
+        self.quick_answers_task: asyncio.Task | None = None
+        # Views of the graph with ETag graph_views_etag, by (max_nodes, min_degree),
+        # least recently used first
+        self.graph_views: OrderedDict[tuple[int, int], asyncio.Future] = OrderedDict()
+        self.graph_views_etag: str | None = None
+        # Multi-worker serving: workers read published snapshots of the working dir
+        self.snapshots = SnapshotStore(self.config.root_dir, self.config.snapshot_keep)
+        self.snapshot_dir: str | None = None
+        self.snapshot_watch_task: asyncio.Task | None = None
+        self.embedding_func = None
+        # Queries running per LightRAG instance (by id), and the replaced instances
+        # whose storages are finalized once their last query is done
+        self.light_rag_users: Dict[int, int] = {}
+        self.retired_light_rags: Dict[int, LightRAG] = {}
 
     async def init(self):
         try:
@@ -53,6 +82,12 @@ class RAGService:
             self.logger.error(f"Failed to init Log Fire: {str(e)}")
             raise
 
+        if self.docs_watcher is None:
+            # Started before the full load, so no change can fall in between
+            self.docs_watcher = DocsWatcher(self._on_docs_changed)
+            self.docs_watcher.start(
+                [(self.config.source_dir, True), (self.config.root_dir, False)]
+            )
         await self.refresh_rag_docs()
 
         try:
@@ -61,39 +96,26 @@ class RAGService:
                 self.config.service_name,
                 self.config.root_dir,
             )
-            embedding_func_instance = await create_embedding_function_instance(
+            self.embedding_func = await create_embedding_function_instance(
                 self.config.embedding_max_token_size, self.config.embedding_model
             )
-            self.light_rag = LightRAG(
-                working_dir=self.config.root_dir,
-                llm_model_func=openai_complete_if_cache,
-                embedding_func=embedding_func_instance,
-                entity_summary_to_max_tokens=self.config.entity_summary_to_max_tokens,
-                chunk_token_size=self.config.chunk_token_size,
-                chunk_overlap_token_size=self.config.chunk_overlap_token_size,
-                log_level=self.config.log_level_int,
-                entity_extract_max_gleaning=self.config.entity_extract_max_gleaning,
-                embedding_batch_num=self.config.embedding_batch_num,
-                embedding_func_max_async=self.config.embedding_func_max_async,
-                llm_model_max_token_size=self.config.llm_model_max_token_size,
-                llm_model_max_async=self.config.llm_model_max_async,
-                max_parallel_insert=self.config.max_parallel_insert,
-                vector_storage=self.config.vector_storage,
-                vector_db_storage_cls_kwargs={
-                    "local_path": self.config.root_dir + "/chromadb",
-                    "collection_settings": {
-                        "hnsw:space": "cosine",
-                        "hnsw:construction_ef": 128,
-                        "hnsw:search_ef": 128,
-                        "hnsw:M": 16,
-                        "hnsw:batch_size": 100,
-                        "hnsw:sync_threshold": 1000,
-                    },
-                },
-            )
+            working_dir = self.config.root_dir
+            if self._serves_snapshots:
+                working_dir = await self._current_snapshot()
+                self.snapshot_dir = working_dir
+                if self.snapshot_watch_task is None or self.snapshot_watch_task.done():
+                    self.snapshot_watch_task = asyncio.create_task(
+                        self._watch_snapshots()
+                    )
+            self._replace_light_rag(self._create_light_rag(working_dir))
             self.logger.info("RAG Service initialized")
             async with self.knowledge_base_status_lock:
                 self.knowledge_base_status = RagServiceStatus.READY
+            # One worker warms the snapshot it starts on, the others answer on demand
+            self._knowledge_base_changed(
+                warm=not self._serves_snapshots
+                or self.snapshots.claim(working_dir, "warm_quick_answers")
+            )
         except Exception as e:
             async with self.knowledge_base_status_lock:
                 self.knowledge_base_status = RagServiceStatus.NOT_READY
@@ -101,18 +123,144 @@ class RAGService:
             raise
 
     async def stop(self):
-        pass
+        if self.docs_watcher is not None:
+            self.docs_watcher.stop()
+        if self.ingest_task is not None:
+            self.ingest_task.cancel()
+        if self.snapshot_watch_task is not None:
+            self.snapshot_watch_task.cancel()
+
+    @property
+    def _serves_snapshots(self) -> bool:
+        return self.config.api_workers > 1
+
+    def _create_light_rag(self, working_dir: str) -> LightRAG:
+        return LightRAG(
+            working_dir=working_dir,
+            llm_model_func=openai_complete_if_cache,
+            embedding_func=self.embedding_func,
+            entity_summary_to_max_tokens=self.config.entity_summary_to_max_tokens,
+            chunk_token_size=self.config.chunk_token_size,
+            chunk_overlap_token_size=self.config.chunk_overlap_token_size,
+            log_level=self.config.log_level_int,
+            entity_extract_max_gleaning=self.config.entity_extract_max_gleaning,
+            embedding_batch_num=self.config.embedding_batch_num,
+            embedding_func_max_async=self.config.embedding_func_max_async,
+            llm_model_max_token_size=self.config.llm_model_max_token_size,
+            llm_model_max_async=self.config.llm_model_max_async,
+            max_parallel_insert=self.config.max_parallel_insert,
+            vector_storage=self.config.vector_storage,
+            vector_db_storage_cls_kwargs={
+                "local_path": working_dir + "/chromadb",
+                "vector_dtype": self.config.vector_dtype,
+                "collection_settings": {
+                    "hnsw:space": "cosine",
+                    "hnsw:construction_ef": 128,
+                    "hnsw:search_ef": 128,
+                    "hnsw:M": 16,
+                    "hnsw:batch_size": 100,
+                    "hnsw:sync_threshold": 1000,
+                },
+            },
+            graph_storage_cls_kwargs={
+                "graphml_export": self.config.graphml_export,
+            },
+        )
+
+    async def _current_snapshot(self) -> str:
+        """Return the current snapshot, publishing the first one if there is none yet"""
+        while True:
+            snapshot_dir = self.snapshots.current()
+            if snapshot_dir is not None:
+                return snapshot_dir
+            try:
+                with self.snapshots.writer_lock():
+                    if self.snapshots.current() is None:
+                        await asyncio.to_thread(self.snapshots.publish)
+            except WriterBusyError:
+                # Another worker is publishing it
+                await asyncio.sleep(self.config.snapshot_poll_interval)
+
+    async def _load_snapshot(self, snapshot_dir: str) -> None:
+        light_rag = self._create_light_rag(snapshot_dir)
+        light_rag.llm_model_func = self.light_rag.llm_model_func
+        self._replace_light_rag(light_rag)
+        self.snapshot_dir = snapshot_dir
+        self.logger.info(f"Serving knowledge base snapshot {snapshot_dir}")
+
+    def _replace_light_rag(self, light_rag: LightRAG) -> None:
+        """Serve from `light_rag`, the previous instance is finalized once it is idle"""
+        previous, self.light_rag = self.light_rag, light_rag
+        if previous is None:
+            return
+        if self.light_rag_users.get(id(previous)):
+            self.retired_light_rags[id(previous)] = previous
+        else:
+            asyncio.create_task(self._finalize_light_rag(previous))
+
+    @asynccontextmanager
+    async def _light_rag_in_use(self) -> AsyncIterator[LightRAG]:
+        """The current LightRAG, kept open until the block exits even if replaced"""
+        light_rag = self.light_rag
+        key = id(light_rag)
+        self.light_rag_users[key] = self.light_rag_users.get(key, 0) + 1
+        try:
+            yield light_rag
+        finally:
+            self.light_rag_users[key] -= 1
+            if self.light_rag_users[key] == 0:
+                del self.light_rag_users[key]
+                retired = self.retired_light_rags.pop(key, None)
+                if retired is not None:
+                    asyncio.create_task(self._finalize_light_rag(retired))
+
+    async def _finalize_light_rag(self, light_rag: LightRAG) -> None:
+        try:
+            await light_rag.finalize_storages()
+        except Exception as e:
+            self.logger.error(f"Failed to finalize LightRAG storages: {str(e)}")
+
+    async def _watch_snapshots(self) -> None:
+        while True:
+            await asyncio.sleep(self.config.snapshot_poll_interval)
+            try:
+                snapshot_dir = self.snapshots.current()
+                if snapshot_dir is not None and snapshot_dir != self.snapshot_dir:
+                    await self._load_snapshot(snapshot_dir)
+                    self._knowledge_base_changed(warm=False)
+            except Exception as e:
+                self.logger.error(f"Failed to load knowledge base snapshot: {e}")
+
+    async def _write_knowledge_base(
+        self, operation: Callable[[LightRAG], Awaitable[None]]
+    ) -> None:
+        """
+        Run a mutating operation. When serving snapshots it runs on the live working
+        dir under the single-writer lock, and a new snapshot is published after it.
+        """
+        if not self._serves_snapshots:
+            await operation(self.light_rag)
+            return
+        with self.snapshots.writer_lock():
+            writer = self._create_light_rag(self.config.root_dir)
+            writer.llm_model_func = self.light_rag.llm_model_func
+            try:
+                await operation(writer)
+            finally:
+                await self._finalize_light_rag(writer)
+            snapshot_dir = await asyncio.to_thread(self.snapshots.publish)
+        await self._load_snapshot(snapshot_dir)
+
+    @property
+    def _doc_status_file(self) -> str:
+        return os.path.join(self.config.root_dir, "kv_store_doc_status.json")
 
     async def refresh_rag_docs(self):
         try:
             self.logger.info("loading source docs and status")
-            status_file_path = os.path.join(
-                self.config.root_dir, "kv_store_doc_status.json"
-            )
-
             async with self.rag_docs_lock:
                 self.rag_docs = await RAGDocs.load(
-                    self.config.source_dir, status_file_path
+                    self.config.source_dir, self._doc_status_file
                 )
                 (
                     self.logger.info(
@@ -123,7 +271,37 @@ class RAGService:
             self.logger.error(f"Failed to load source docs: {str(e)}")
             raise
 
+    async def refresh_doc_status(self):
+        async with self.rag_docs_lock:
+            if self.rag_docs is not None:
+                await self.rag_docs.load_status(self._doc_status_file)
+
+    async def _on_docs_changed(self, paths: set[str]) -> None:
+        source_prefix = os.path.join(self.config.source_dir, "")
+        async with self.rag_docs_lock:
+            if self.rag_docs is None:
+                return
+            for path in sorted(paths):
+                try:
+                    if path == self._doc_status_file:
+                        await self.rag_docs.load_status(path)
+                    elif not path.startswith(source_prefix):
+                        continue
+                    elif os.path.isdir(path):
+                        # A directory moved in brings files without events of their own
+                        for root, _, files in os.walk(path):
+                            for file in files:
+                                await self.rag_docs.load_file(os.path.join(root, file))
+                    else:
+                        await self.rag_docs.load_file(path)
+                except Exception as e:
+                    self.logger.error(f"Failed to update source doc {path}: {str(e)}")
+
     async def set_rag_llm(self, llm_type: str, llm_model_name: str):
+        """
+        Set the LLM answering queries. With API_WORKERS > 1 this only changes the
+        worker process that handled the call, the other workers keep their LLM.
+        """
         async with self.knowledge_base_status_lock:
             if self.knowledge_base_status != RagServiceStatus.READY:
                 self.logger.warning("Cannot set RAG LLM: knowledge base is not ready")
@@ -153,6 +331,7 @@ class RAGService:
             else:
                 raise Exception(f"Invalid llm_type: {llm_type}")
             self.light_rag.llm_model_func = llm_model_func
+            self.rag_llm_name = f"{llm_type}:{llm_model_name}"
         except Exception as e:
             self.logger.error(f"Failed to set RAG LLM: {str(e)}")
             raise
@@ -160,7 +339,7 @@ class RAGService:
             async with self.knowledge_base_status_lock:
                 self.knowledge_base_status = RagServiceStatus.READY
 
-    async def _process_batch(self, batch_files: List[str]) -> None:
+    async def _process_batch(self, batch_files: List[str], light_rag: LightRAG) -> None:
         current_batch = []
         for file_path in batch_files:
             try:
@@ -176,7 +355,7 @@ class RAGService:
         if current_batch:
             try:
                 self.logger.info(f"Inserting batch of {len(current_batch)} documents")
-                await self.light_rag.ainsert(current_batch)
+                await light_rag.ainsert(current_batch)
                 self.logger.info(
                     f"Successfully inserted batch of {len(current_batch)} documents"
                 )
@@ -184,18 +363,25 @@ class RAGService:
                 self.logger.exception(f"Error inserting batch: {e}")
                 raise Exception(f"Error inserting batch: {e}")
 
-    async def _batch_process(self) -> None:
+    async def _batch_process(self, light_rag: LightRAG) -> None:
         source_files = []
         for root, _, files in os.walk(self.config.source_dir):
             for file in files:
                 source_files.append(os.path.join(root, file))
         self.logger.info(f"Found {len(source_files)} files to process")
+        await self._process_files(source_files, light_rag)
 
+    async def _process_files(
+        self, source_files: List[str], light_rag: LightRAG
+    ) -> None:
         for i in range(0, len(source_files), self.config.processing_batch_size):
             batch_files = source_files[i : i + self.config.processing_batch_size]
-            await self._process_batch(batch_files)
+            await self._process_batch(batch_files, light_rag)
 
     async def index(self):
+        await self._index(self._batch_process)
+
+    async def _index(self, process: Callable[[LightRAG], Awaitable[None]]) -> None:
         async with self.knowledge_base_status_lock:
             if self.knowledge_base_status != RagServiceStatus.READY:
                 self.logger.warning("Cannot process index: knowledge base is not ready")
@@ -209,7 +395,8 @@ class RAGService:
             )
             async with self.knowledge_base_status_lock:
                 self.knowledge_base_status = RagServiceStatus.INDEXING
-            await self._batch_process()
+            await self._write_knowledge_base(process)
+            self._knowledge_base_changed()
 
         except Exception as e:
             self.logger.error(f"Failed to process index: {str(e)}")
@@ -217,7 +404,7 @@ class RAGService:
         finally:
             async with self.knowledge_base_status_lock:
                 self.knowledge_base_status = RagServiceStatus.READY
-            await self.refresh_rag_docs()
+            await self.refresh_doc_status()
 
     async def reset(self):
         async with self.knowledge_base_status_lock:
@@ -230,27 +417,14 @@ class RAGService:
             async with self.knowledge_base_status_lock:
                 self.knowledge_base_status = RagServiceStatus.NOT_READY
 
-            # Convert source_dir to absolute path for accurate comparison
-            source_dir_abs = os.path.abspath(self.config.source_dir)
-
-            for item in os.listdir(self.config.root_dir):
-                item_path = os.path.join(self.config.root_dir, item)
-                item_abs_path = os.path.abspath(item_path)
-
-                # Skip if the item is source_dir or is inside source_dir
-                if item_abs_path.startswith(source_dir_abs):
-                    self.logger.info(f"Keeping path: {item_path}")
-                    continue
-
-                try:
-                    if os.path.isfile(item_path):
-                        os.remove(item_path)
-                        self.logger.info(f"Removed file: {item_path}")
-                    elif os.path.isdir(item_path):
-                        shutil.rmtree(item_path)
-                        self.logger.info(f"Removed directory: {item_path}")
-                except Exception as e:
-                    self.logger.error(f"Error removing {item_path}: {str(e)}")
+            if self._serves_snapshots:
+                # Other workers keep serving their snapshot until the empty one is
+                # published, and no other worker may index meanwhile
+                with self.snapshots.writer_lock():
+                    self._clear_working_dir()
+                    await asyncio.to_thread(self.snapshots.publish)
+            else:
+                self._clear_working_dir()
 
             await self.init()
             self.logger.info("Knowledge base reset successfully")
@@ -261,14 +435,53 @@ class RAGService:
             async with self.knowledge_base_status_lock:
                 self.knowledge_base_status = RagServiceStatus.READY
 
+    def _clear_working_dir(self) -> None:
+        # Convert source_dir to absolute path for accurate comparison
+        source_dir_abs = os.path.abspath(self.config.source_dir)
+        # The published snapshots and the writer lock belong to every worker
+        kept_paths = {
+            os.path.abspath(self.snapshots.snapshots_dir),
+            os.path.abspath(self.snapshots.lock_file),
+        }
+
+        for item in os.listdir(self.config.root_dir):
+            item_path = os.path.join(self.config.root_dir, item)
+            item_abs_path = os.path.abspath(item_path)
+
+            # Skip if the item is source_dir or is inside source_dir
+            if item_abs_path.startswith(source_dir_abs) or item_abs_path in kept_paths:
+                self.logger.info(f"Keeping path: {item_path}")
+                continue
+
+            try:
+                if os.path.isfile(item_path):
+                    os.remove(item_path)
+                    self.logger.info(f"Removed file: {item_path}")
+                elif os.path.isdir(item_path):
+                    shutil.rmtree(item_path)
+                    self.logger.info(f"Removed directory: {item_path}")
+            except Exception as e:
+                self.logger.error(f"Error removing {item_path}: {str(e)}")
+
     async def query(
-        self, user_query: str, query_params: QueryParameters
+        self,
+        user_query: str,
+        query_params: QueryParameters,
+        stats: Dict | None = None,
+        raise_errors: bool = False,
     ) -> AsyncIterator[str]:
+        """
+        Answer a query. If `stats` is a dict it is filled with the retrieval stats
+        (see QueryParam.stats) before the answer starts. Errors are returned as the
+        answer text unless `raise_errors` is set.
+        """
         async with self.knowledge_base_status_lock:
             if self.knowledge_base_status != RagServiceStatus.READY:
                 self.logger.warning(
                     "Cannot query knowledge base: knowledge base is not ready"
                 )
+                if raise_errors:
+                    raise Exception("Knowledge base is not ready")
 
                 async def not_ready_iterator():
                     yield "Knowledge base is not ready"
@@ -278,18 +491,28 @@ class RAGService:
         try:
             is_valid, result = validate_input(user_query)
             if not is_valid:
+                if raise_errors:
+                    raise Exception(result)
 
                 async def validation_error_iterator():
                     yield f"Error: {result}"
 
                 return validation_error_iterator()
 
-            response = await self.light_rag.aquery(
-                user_query, query_params.to_light_rag_params()
+            quick_answer = self._get_quick_answer(user_query, query_params)
+            if quick_answer is not None:
+                return self._quick_answer_iterator(quick_answer, query_params.stream)
+            if not self.config.coalesce_queries:
+                return await self._run_query(user_query, query_params, stats)
+            return await self.query_flights.do(
+                self._flight_key(user_query, query_params),
+                partial(self._run_query, user_query, query_params, stats),
+                shared=stats,
             )
-            return response
         except Exception as e:
             self.logger.error(f"Error querying RAG: {str(e)}")
+            if raise_errors:
+                raise
             error_message = str(e)  # Capture the error message
 
             async def error_iterator():
@@ -297,6 +520,83 @@ class RAGService:
 
             return error_iterator()
 
+    async def query_batch(
+        self, user_queries: List[str], query_params: QueryParameters
+    ) -> AsyncIterator[Dict]:
+        """
+        Answer a list of queries, yielding one result per query as it completes:
+        {"index", "query", "response"} or {"index", "query", "error"}.
+        Duplicate queries (ignoring case and whitespace) are answered once.
+        """
+        async with self.knowledge_base_status_lock:
+            if self.knowledge_base_status != RagServiceStatus.READY:
+                raise Exception("Knowledge base is not ready")
+
+        started = time.perf_counter()
+        unique_queries: List[str] = []
+        indexes_by_key: Dict[str, List[int]] = {}
+        for i, user_query in enumerate(user_queries):
+            is_valid, result = validate_input(user_query)
+            if not is_valid:
+                yield {"index": i, "query": user_query, "error": result}
+                continue
+            key = self._quick_answer_key(user_query)
+            if key not in indexes_by_key:
+                indexes_by_key[key] = []
+                unique_queries.append(user_query)
+            indexes_by_key[key].append(i)
+        self.logger.info(
+            f"Answering batch of {len(user_queries)} queries, {len(unique_queries)} unique"
+        )
+
+        light_rag_params = query_params.to_light_rag_params()
+        if light_rag_params.timeout is None:
+            light_rag_params.timeout = self.config.query_timeout
+        async with self._light_rag_in_use() as light_rag:
+            async for unique_index, response in light_rag.aquery_batch(
+                unique_queries, light_rag_params, self.config.batch_max_concurrency
+            ):
+                user_query = unique_queries[unique_index]
+                if isinstance(response, Exception):
+                    outcome = {"error": str(response)}
+                else:
+                    outcome = {"response": response}
+                for i in indexes_by_key[self._quick_answer_key(user_query)]:
+                    yield {
+                        "index": i,
+                        "query": user_queries[i],
+                        **outcome,
+                        "seconds": round(time.perf_counter() - started, 3),
+                    }
+
+    def _flight_key(self, user_query: str, query_params: QueryParameters) -> str:
+        # Streamed and collected callers can share a flight, the API handles both
+        return query_flight_key(
+            user_query,
+            {
+                "llm": self.rag_llm_name,
+                **query_params.model_dump(exclude={"stream"}),
+            },
+        )
+
+    async def _run_query(
+        self,
+        user_query: str,
+        query_params: QueryParameters,
+        stats: Dict | None = None,
+    ) -> str | AsyncIterator[str]:
+        light_rag_params = query_params.to_light_rag_params()
+        if light_rag_params.timeout is None:
+            light_rag_params.timeout = self.config.query_timeout
+        light_rag_params.stats = stats
+        # Retrieval is done when aquery returns, a streamed answer only needs the LLM
+        async with self._light_rag_in_use() as light_rag:
+            response = await light_rag.aquery(user_query, light_rag_params)
+        self.logger.info(
+            "Query answered from contexts: %s", light_rag_params.included_contexts
+        )
+        return response
+
     async def add_doc(self, file_name: str, content: str) -> None:
         async with self.knowledge_base_status_lock:
             if self.knowledge_base_status != RagServiceStatus.READY:
@@ -307,11 +607,106 @@ class RAGService:
             full_file_path = os.path.join(self.config.source_dir, file_name)
             async with self.rag_docs_lock:
                 await self.rag_docs.add_doc(full_file_path, content)
-            await self.refresh_rag_docs()
         except Exception as e:
             self.logger.error(f"Failed to add document to source: {str(e)}")
             raise
 
+    async def upload_docs(
+        self, uploads: List[tuple[str, BinaryIO]], index: bool = True
+    ) -> List[Dict]:
+        """
+        Add uploaded files, or the documents inside zip/tar archives, to the source
+        dir. Each is streamed to disk and hashed in chunks, never held in memory
+        whole. New documents are queued for indexing unless `index` is False.
+        Returns one result per document, with its status "added", "duplicate",
+        "conflict" or "failed". A document whose path is already taken, by a source
+        file or an earlier document of the same upload, is a conflict: replacing the
+        file would leave the old document indexed with nothing behind it.
+        """
+        async with self.knowledge_base_status_lock:
+            if self.knowledge_base_status not in (
+                RagServiceStatus.READY,
+                RagServiceStatus.INDEXING,
+            ):
+                raise Exception("Knowledge base is not ready")
+
+        staging_dir = os.path.join(self.config.root_dir, "uploads")
+        semaphore = asyncio.Semaphore(self.config.upload_max_parallel)
+
+        async def stage(file_name: str, fileobj: BinaryIO):
+            async with semaphore:
+                return await asyncio.to_thread(
+                    stage_upload,
+                    file_name,
+                    fileobj,
+                    staging_dir,
+                    self.config.upload_max_bytes,
+                )
+
+        staged_uploads = await asyncio.gather(
+            *(stage(file_name, fileobj) for file_name, fileobj in uploads)
+        )
+
+        results = []
+        added_files = []
+        async with self.rag_docs_lock:
+            for staged in (doc for docs in staged_uploads for doc in docs):
+                result = {"file_name": staged.file_name, "doc_id": staged.doc_id}
+                try:
+                    if staged.error is not None:
+                        raise Exception(staged.error)
+                    full_file_path = os.path.join(
+                        self.config.source_dir, staged.file_name
+                    )
+                    if self.rag_docs.doc_id_exists(staged.doc_id):
+                        os.unlink(staged.staging_path)
+                        result["status"] = "duplicate"
+                    elif os.path.lexists(full_file_path):
+                        os.unlink(staged.staging_path)
+                        result.update(
+                            status="conflict",
+                            error="A document with this name already exists",
+                        )
+                    else:
+                        os.makedirs(os.path.dirname(full_file_path), exist_ok=True)
+                        os.replace(staged.staging_path, full_file_path)
+                        self.rag_docs.register_file(
+                            full_file_path, staged.doc_id, staged.content_length
+                        )
+                        added_files.append(full_file_path)
+                        result["status"] = "added"
+                except Exception as e:
+                    self.logger.error(
+                        f"Failed to add uploaded document {staged.file_name}: {str(e)}"
+                    )
+                    result.update(status="failed", error=str(e))
+                results.append(result)
+
+        self.logger.info(
+            f"Uploaded {len(added_files)} new documents out of {len(results)}"
+        )
+        if index and added_files:
+            self.enqueue_for_indexing(added_files)
+        return results
+
+    def enqueue_for_indexing(self, file_paths: List[str]) -> None:
+        """Index these source files in the background, after any running operation"""
+        self.ingest_pending.extend(file_paths)
+        if self.ingest_task is None or self.ingest_task.done():
+            self.ingest_task = asyncio.create_task(self._ingest_pending())
+
+    async def _ingest_pending(self) -> None:
+        while self.ingest_pending:
+            # An index, reset or LLM switch in progress finishes first
+            while await self.get_status() != RagServiceStatus.READY:
+                await asyncio.sleep(1)
+            file_paths, self.ingest_pending = self.ingest_pending, []
+            self.logger.info(f"Indexing {len(file_paths)} uploaded documents")
+            try:
+                await self._index(partial(self._process_files, file_paths))
+            except Exception as e:
+                self.logger.error(f"Failed to index uploaded documents: {str(e)}")
+
     async def delete_doc_by_file_name(self, file_name: str) -> None:
         async with self.knowledge_base_status_lock:
             if self.knowledge_base_status != RagServiceStatus.READY:
@@ -325,9 +720,13 @@ class RAGService:
             async with self.rag_docs_lock:
                 doc_id = self.rag_docs.get_doc_id_by_file_path(full_file_path)
                 self.logger.info(f"Deleting document with id: {doc_id}")
-            await self.light_rag.adelete_by_doc_id(doc_id)
+            await self._write_knowledge_base(
+                lambda light_rag: light_rag.adelete_by_doc_id(doc_id)
+            )
+            self._knowledge_base_changed()
             async with self.rag_docs_lock:
                 await self.rag_docs.remove_doc_with_file_name(full_file_path)
+            await self.refresh_doc_status()
         except Exception as e:
             self.logger.error(f"Failed to delete document from source: {str(e)}")
             raise
@@ -347,20 +746,52 @@ class RAGService:
                     raise Exception(f"Document with id {doc_id} does not exist")
 
             self.logger.info(f"Deleting document with id: {doc_id}")
-            await self.light_rag.adelete_by_doc_id(doc_id)
+            await self._write_knowledge_base(
+                lambda light_rag: light_rag.adelete_by_doc_id(doc_id)
+            )
+            self._knowledge_base_changed()
 
             async with self.rag_docs_lock:
                 await self.rag_docs.remove_doc_with_doc_id(doc_id)
-            await self.refresh_rag_docs()
+            await self.refresh_doc_status()
         except Exception as e:
             self.logger.error(f"Failed to delete document from source: {str(e)}")
             raise
 
     async def get_docs(self) -> RAGDocs:
-        await self.refresh_rag_docs()
         async with self.rag_docs_lock:
             return self.rag_docs
 
+    def knowledge_base_etag(self) -> str:
+        """
+        Validator of the document listing, from the service status and the content
+        of the docs index. Counters like kb_generation are per worker process, so
+        with several workers they could match while the listings differ.
+        """
+        docs = self.rag_docs.fingerprint if self.rag_docs is not None else ""
+        return hashlib.md5(
+            f"{self.knowledge_base_status.value}:{docs}".encode()
+        ).hexdigest()
+
+    def graph_etag(self) -> str:
+        """Validator of the graph page, from the knowledge base generation and the graph file"""
+        parts = [str(self.kb_generation), str(self.knowledge_base_status.value)]
+        graph_dir = self.snapshot_dir or self.config.root_dir
+        for name in (
+            "graph_chunk_entity_relation.sqlite",
+            "graph_chunk_entity_relation.graphml",
+        ):
+            parts.append(self._stat_key(os.path.join(graph_dir, name)))
+        return hashlib.md5(":".join(parts).encode()).hexdigest()
+
+    @staticmethod
+    def _stat_key(path: str) -> str:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return f"{path}:missing"
+        return f"{path}:{stat.st_mtime_ns}:{stat.st_size}"
+
     async def get_status(self) -> RagServiceStatus:
         async with self.knowledge_base_status_lock:
             return self.knowledge_base_status
@@ -416,7 +847,133 @@ class RAGService:
             # Return empty list on error instead of throwing
             return []
 
-    async def visualize(self) -> str:
+    def _knowledge_base_changed(self, warm: bool = True) -> None:
+        """
+        Start a new knowledge base generation and, if `warm`, re-answer the quick
+        questions in the background. With API_WORKERS > 1 only the worker that
+        published the snapshot, or at startup the one that claimed it, warms them,
+        so the LLM calls are paid once instead of once per worker; the other
+        workers answer quick questions on demand.
+        """
+        self.kb_generation += 1
+        if self.quick_answers_task is not None and not self.quick_answers_task.done():
+            self.quick_answers_task.cancel()
+        if not warm or not self.config.warm_quick_questions:
+            return
+        self.quick_answers_task = asyncio.create_task(
+            self._warm_quick_answers(self.kb_generation)
+        )
+
+    async def _warm_quick_answers(self, generation: int) -> None:
+        questions = await self.get_quick_questions()
+        self.logger.info(
+            f"Warming {len(questions)} quick answers for knowledge base generation {generation}"
+        )
+        for question in questions:
+            text = question["text"]
+            query_params = QueryParameters()
+            try:
+                # Goes through the flight so that clicks during warm-up share the work
+                response = await self.query_flights.do(
+                    self._flight_key(text, query_params),
+                    partial(self._run_query, text, query_params),
+                )
+                if not isinstance(response, str):
+                    response = "".join([chunk async for chunk in response])
+            except Exception as e:
+                self.logger.error(f"Failed to warm quick answer for '{text}': {e}")
+                continue
+            if generation != self.kb_generation:
+                return
+            self.quick_answers[self._quick_answer_key(text)] = (generation, response)
+        self.logger.info(
+            f"Quick answers ready for knowledge base generation {generation}"
+        )
+
+    @staticmethod
+    def _quick_answer_key(user_query: str) -> str:
+        return " ".join(user_query.split()).casefold()
+
+    def _get_quick_answer(
+        self, user_query: str, query_params: QueryParameters
+    ) -> str | None:
+        """Return the warm answer for a quick question asked with default parameters, if it is current"""
+        cached = self.quick_answers.get(self._quick_answer_key(user_query))
+        if cached is None or cached[0] != self.kb_generation:
+            return None
+        if query_params.model_dump(exclude={"stream"}) != QueryParameters().model_dump(
+            exclude={"stream"}
+        ):
+            return None
+        self.logger.info("Serving warm quick answer")
+        return cached[1]
+
+    async def _quick_answer_iterator(
+        self, answer: str, stream: bool
+    ) -> AsyncIterator[str]:
+        if not stream or not self.config.simulate_quick_answer_stream:
+            yield answer
+            return
+        for i in range(0, len(answer), self.config.quick_answer_stream_chunk_size):
+            yield answer[i : i + self.config.quick_answer_stream_chunk_size]
+            await asyncio.sleep(0)
+
+    async def graph_view(
+        self, max_nodes: int | None = None, min_degree: int = 0
+    ) -> Dict | None:
+        """
+        Laid out view of the knowledge graph (see build_graph_view), None if there is
+        no graph yet. Built in a worker thread and cached until the graph changes;
+        concurrent requests for the same view share one build.
+        """
+        async with self.knowledge_base_status_lock:
+            if self.knowledge_base_status != RagServiceStatus.READY:
+                raise Exception("Knowledge base is not ready")
+        max_nodes = max_nodes or self.config.graph_view_max_nodes
+        etag = self.graph_etag()
+        if etag != self.graph_views_etag:
+            self.graph_views = OrderedDict()
+            self.graph_views_etag = etag
+
+        key = (max_nodes, min_degree)
+        build = self.graph_views.get(key)
+        if build is not None and not (
+            build.done() and (build.cancelled() or build.exception() is not None)
+        ):
+            self.graph_views.move_to_end(key)
+        else:
+            self.graph_views.pop(key, None)
+            if len(self.graph_views) >= 8:
+                self.graph_views.popitem(last=False)
+            self.logger.info(
+                f"Building graph view of {max_nodes} nodes with degree >= {min_degree}"
+            )
+            build = asyncio.ensure_future(
+                asyncio.to_thread(self._build_graph_view, max_nodes, min_degree)
+            )
+            self.graph_views[key] = build
+        # A caller going away must not cancel the build the others wait for
+        return await asyncio.shield(build)
+
+    def _build_graph_view(self, max_nodes: int, min_degree: int) -> Dict | None:
+        # imported here so the service does not pull in graph storage deps eagerly
+        from src.rag_service.lightrag.kg.networkx_impl import NetworkXStorage
+
+        # readers serve the published snapshot, not the writer's working files
+        graph_dir = self.snapshot_dir or self.config.root_dir
+        # An empty graph is falsy, only fall back to GraphML when there is no SQLite file
+        graph = NetworkXStorage.load_nx_graph(
+            os.path.join(graph_dir, "graph_chunk_entity_relation.sqlite")
+        )
+        if graph is None:
+            graph = NetworkXStorage.load_nx_graph(
+                os.path.join(graph_dir, "graph_chunk_entity_relation.graphml")
+            )
+        if graph is None:
+            return None
+        return build_graph_view(graph, max_nodes, min_degree)
+
+    async def visualize(self, max_nodes: int | None = None, min_degree: int = 0) -> str:
         async with self.knowledge_base_status_lock:
             if self.knowledge_base_status != RagServiceStatus.READY:
                 self.logger.warning(
@@ -425,21 +982,10 @@ class RAGService:
                 return "Knowledge base is not ready"
         try:
             self.logger.info("Visualizing knowledge base")
-            graph = nx.read_graphml(
-                os.path.join(
-                    self.config.root_dir, "graph_chunk_entity_relation.graphml"
-                )
-            )
-            net = Network(notebook=True)
-            net.from_nx(graph)
-            temp_dir = tempfile.gettempdir()
-            temp_path = Path(temp_dir) / f"temp_graph_{os.urandom(8).hex()}.html"
-            net.show(str(temp_path))
-            async with aiofiles.open(temp_path, mode="r", encoding="utf-8") as f:
-                html_content = await f.read()
-            os.unlink(temp_path)
-            return html_content
-
+            view = await self.graph_view(max_nodes, min_degree)
+            if view is None:
+                return "Knowledge graph is empty"
+            return await asyncio.to_thread(render_graph_html, view)
         except Exception as e:
             self.logger.error(f"Failed to visualize knowledge base: {str(e)}")
             raise Exception(f"Failed to visualize knowledge base: {str(e)}")
@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import json
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
+
+from src.log import get_logger
+
+QueryResponse = Union[str, dict, AsyncIterator[str]]
+
+
+def query_flight_key(user_query: str, params: dict) -> str:
+    """
+    Normalized key of a query: case and whitespace are ignored in the question text,
+    and every parameter that can change the answer is part of the key.
+    """
+    normalized = " ".join(user_query.split()).casefold()
+    payload = json.dumps(
+        {"query": normalized, "params": params}, sort_keys=True, default=str
+    )
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+class _Flight:
+    def __init__(self, key: str):
+        self.key = key
+        self.changed = asyncio.Condition()
+        self.chunks: List[str] = []
+        self.result: Optional[Union[str, dict]] = None
+        self.is_stream = False
+        self.done = False
+        self.error: Optional[BaseException] = None
+        # callers counts everyone served, subscribers only those still listening
+        self.callers = 0
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self.shared: dict = {}
+
+
+class _Subscription:
+    """
+    One caller's view of a streamed flight, replaying it from the first chunk.
+    Releasing is idempotent, and happens on collection at the latest, so a stream
+    that is never iterated does not keep the flight running.
+    """
+
+    def __init__(self, single_flight: "SingleFlight", flight: _Flight):
+        self._single_flight = single_flight
+        self._flight = flight
+        self._position = 0
+        self._released = False
+
+    def __aiter__(self) -> "_Subscription":
+        return self
+
+    async def __anext__(self) -> str:
+        flight = self._flight
+        if self._released:
+            raise StopAsyncIteration
+        try:
+            async with flight.changed:
+                await flight.changed.wait_for(
+                    lambda: self._position < len(flight.chunks) or flight.done
+                )
+        except BaseException:
+            self.release()
+            raise
+        if self._position < len(flight.chunks):
+            chunk = flight.chunks[self._position]
+            self._position += 1
+            return chunk
+        self.release()
+        if flight.error is not None:
+            raise flight.error
+        raise StopAsyncIteration
+
+    async def aclose(self) -> None:
+        self.release()
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._single_flight._unsubscribe(self._flight)
+
+    def __del__(self):
+        self.release()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical queries into one in-flight computation.
+
+    The first caller for a key starts the computation; callers arriving while it
+    runs wait for the same result. Streamed answers are buffered and fanned out, so
+    every subscriber receives the whole stream from its first chunk, whenever it joined.
+    When every caller has gone away (cancelled, or closed its stream) the computation
+    is cancelled too.
+    """
+
+    def __init__(self, name: str = "single_flight"):
+        self.logger = get_logger(name)
+        self._flights: Dict[str, _Flight] = {}
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def do(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[QueryResponse]],
+        shared: Optional[dict] = None,
+    ) -> QueryResponse:
+        """
+        Run `factory` for `key`, or join the computation already running for it.
+
+        `shared` is a dict the factory fills while it runs (e.g. query stats); the
+        caller that starts the flight owns it, joining callers get a copy of it.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(key)
+            if shared is not None:
+                flight.shared = shared
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._run(flight, factory))
+        else:
+            self.logger.info("Joining in-flight query %s", key)
+        flight.callers += 1
+        flight.subscribers += 1
+
+        try:
+            async with flight.changed:
+                await flight.changed.wait_for(lambda: flight.done or flight.is_stream)
+        except asyncio.CancelledError:
+            self._unsubscribe(flight)
+            raise
+        if shared is not None and shared is not flight.shared:
+            shared.update(flight.shared)
+        if not flight.is_stream:
+            flight.subscribers -= 1
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        # The subscription is released when the returned stream ends or is closed
+        return _Subscription(self, flight)
+
+    def _unsubscribe(self, flight: _Flight) -> None:
+        flight.subscribers -= 1
+        if flight.subscribers > 0 or flight.done:
+            return
+        self.logger.info("All callers left query %s, cancelling it", flight.key)
+        # New callers must not join a flight that is being cancelled
+        if self._flights.get(flight.key) is flight:
+            del self._flights[flight.key]
+        flight.task.cancel()
+
+    async def _run(
+        self,
+        flight: _Flight,
+        factory: Callable[[], Awaitable[QueryResponse]],
+    ) -> None:
+        response = None
+        try:
+            response = await factory()
+            # Anything but a stream (an answer, or e.g. a mix-mode context dict) is
+            # shared as is
+            if not hasattr(response, "__aiter__"):
+                flight.result = response
+            else:
+                async with flight.changed:
+                    flight.is_stream = True
+                    flight.changed.notify_all()
+                async for chunk in response:
+                    async with flight.changed:
+                        flight.chunks.append(chunk)
+                        flight.changed.notify_all()
+        except asyncio.CancelledError:
+            flight.error = Exception("Query was cancelled")
+            raise
+        except Exception as e:
+            flight.error = e
+        finally:
+            # Stops the upstream LLM stream, a no-op once it is exhausted
+            if hasattr(response, "aclose"):
+                await response.aclose()
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            async with flight.changed:
+                flight.done = True
+                flight.changed.notify_all()
+            if flight.callers > 1:
+                self.logger.info(
+                    "Query %s answered %d coalesced callers", flight.key, flight.callers
+                )
@@ -0,0 +1,114 @@
+import fcntl
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from src.log import get_logger
+
+# Storage files and directories LightRAG keeps in its working dir
+_STORAGE_PREFIXES = ("kv_store_", "vdb_", "graph_")
+_STORAGE_DIRS = ("chromadb",)
+
+
+class WriterBusyError(Exception):
+    """Raised when another process holds the knowledge base writer lock"""
+
+
+class SnapshotStore:
+    """
+    Read-only snapshots of the LightRAG working dir for multi-worker serving.
+
+    A single writer (whoever holds ``writer.lock``) mutates the working dir and then
+    publishes a copy of its storage files under ``snapshots/<id>``. The ``CURRENT``
+    pointer file is swapped atomically, so readers polling it always see a complete
+    snapshot. Memory-mapped vector files are hard-linked rather than copied, so every
+    worker maps the same pages.
+    """
+
+    def __init__(self, root_dir: str, keep: int = 3):
+        self.root_dir = root_dir
+        self.snapshots_dir = os.path.join(root_dir, "snapshots")
+        self.keep = keep
+        self.logger = get_logger("snapshots")
+        self._pointer_file = os.path.join(self.snapshots_dir, "CURRENT")
+        self.lock_file = os.path.join(root_dir, "writer.lock")
+
+    def current(self) -> Optional[str]:
+        """Path of the current snapshot, None if nothing was published yet"""
+        try:
+            with open(self._pointer_file, "r", encoding="utf-8") as f:
+                snapshot_id = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return os.path.join(self.snapshots_dir, snapshot_id) if snapshot_id else None
+
+    def claim(self, snapshot_dir: str, task: str) -> bool:
+        """
+        True for the one worker of this server run that claims `task` on the snapshot.
+        Workers share the uvicorn supervisor as parent, so a restarted server (a new
+        parent pid) claims the task again.
+        """
+        marker = os.path.join(snapshot_dir, f".{task}.{os.getppid()}")
+        try:
+            os.close(os.open(marker, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False
+        return True
+
+    @contextmanager
+    def writer_lock(self) -> Iterator[None]:
+        """Hold the single-writer lock, raises WriterBusyError if another process has it"""
+        os.makedirs(self.root_dir, exist_ok=True)
+        with open(self.lock_file, "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise WriterBusyError("Another worker is writing the knowledge base")
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def publish(self) -> str:
+        """Copy the working dir storage into a new snapshot and make it current"""
+        snapshot_id = str(time.time_ns())
+        snapshot_dir = os.path.join(self.snapshots_dir, snapshot_id)
+        building_dir = snapshot_dir + ".building"
+        os.makedirs(building_dir)
+        for name in os.listdir(self.root_dir):
+            source = os.path.join(self.root_dir, name)
+            target = os.path.join(building_dir, name)
+            if os.path.isdir(source) and name in _STORAGE_DIRS:
+                shutil.copytree(source, target)
+            elif os.path.isfile(source) and name.startswith(_STORAGE_PREFIXES):
+                if name.endswith(".npy"):
+                    # MmapVectorDBStorage replaces these files on save, never
+                    # rewriting them in place, so a hard link stays immutable
+                    os.link(source, target)
+                else:
+                    shutil.copy2(source, target)
+        os.rename(building_dir, snapshot_dir)
+
+        pointer_tmp = f"{self._pointer_file}.{os.getpid()}.tmp"
+        with open(pointer_tmp, "w", encoding="utf-8") as f:
+            f.write(snapshot_id)
+        os.replace(pointer_tmp, self._pointer_file)
+        self.logger.info(f"Published knowledge base snapshot {snapshot_id}")
+
+        self._prune(snapshot_id)
+        return snapshot_dir
+
+    def _prune(self, current_id: str) -> None:
+        snapshot_ids = sorted(
+            name
+            for name in os.listdir(self.snapshots_dir)
+            if name.isdigit() and name != current_id
+        )
+        # Readers may still be on one of the previous snapshots, keep a few around
+        for snapshot_id in snapshot_ids[: max(0, len(snapshot_ids) - self.keep + 1)]:
+            shutil.rmtree(
+                os.path.join(self.snapshots_dir, snapshot_id), ignore_errors=True
+            )
+            self.logger.info(f"Removed knowledge base snapshot {snapshot_id}")
@@ -4,7 +4,7 @@ import os
 import time
 from enum import Enum
 import aiofiles
-from pydantic import BaseModel, Field, RootModel
+from pydantic import BaseModel, Field, PrivateAttr, RootModel
 from typing import Optional, Dict
 
 from src.rag_service.lightrag import QueryParam
@@ -66,9 +66,41 @@ class RAGDocModel(BaseModel):
 
 
 class RAGDocs(BaseModel):
+    """
+    In-memory index of the source documents merged with their processing status.
+
+    It is kept up to date incrementally: single files are (re)read or forgotten as
+    they change, and the status file is re-merged when it is rewritten, touching only
+    the docs whose status changed.
+    """
+
     docs: Dict[str, RAGDocModel] = Field(
         default_factory=dict, title="Docs", description="Merged documents"
     )
+    # Source file docs by path, the (mtime, size) they were read at, the paths holding
+    # each doc id, and the status file entries by doc id
+    _file_docs: Dict[str, RAGDocModel] = PrivateAttr(default_factory=dict)
+    _file_stats: Dict[str, tuple[int, int]] = PrivateAttr(default_factory=dict)
+    _paths_by_id: Dict[str, Dict[str, None]] = PrivateAttr(default_factory=dict)
+    _status: Dict[str, dict] = PrivateAttr(default_factory=dict)
+    _version: int = PrivateAttr(default=0)
+    # (version, digest) of the merged docs, recomputed once per version
+    _fingerprint: Optional[tuple[int, str]] = PrivateAttr(default=None)
+
+    @property
+    def version(self) -> int:
+        """Bumped on every change of the merged docs"""
+        return self._version
+
+    @property
+    def fingerprint(self) -> str:
+        """Digest of the merged docs, the same in every process holding the same docs"""
+        if self._fingerprint is None or self._fingerprint[0] != self._version:
+            digest = hashlib.md5()
+            for doc_id in sorted(self.docs):
+                digest.update(self.docs[doc_id].model_dump_json().encode())
+            self._fingerprint = (self._version, digest.hexdigest())
+        return self._fingerprint[1]
 
     async def add_doc(self, full_file_path: str, content: str) -> None:
         cleaned_content = content.strip().replace("\x00", "")
@@ -78,24 +110,28 @@ class RAGDocs(BaseModel):
         try:
             async with aiofiles.open(full_file_path, "w", encoding="utf8") as file:
                 await file.write(content)
-            rag_doc = RAGDocModel(
-                file_name=os.path.basename(full_file_path),
-                file_path=full_file_path,
-                rag_doc_id=rag_doc_id,
-                status=DocStatus.PENDING,
-                content_length=len(content),
-                created_at=time.strftime("%Y-%m-%d %H:%M:%S"),
-                updated_at=time.strftime("%Y-%m-%d %H:%M:%S"),
-            )
-            self.docs[rag_doc_id] = rag_doc
+            self.register_file(full_file_path, rag_doc_id, len(content))
         except Exception as e:
             raise Exception(f"Error adding document {full_file_path}: {e}")
 
+    def register_file(
+        self, full_file_path: str, rag_doc_id: str, content_length: int
+    ) -> None:
+        """Add a source file already written to disk, whose doc id is known"""
+        rag_doc = RAGDocModel(
+            file_name=os.path.basename(full_file_path),
+            file_path=full_file_path,
+            rag_doc_id=rag_doc_id,
+            status=DocStatus.PENDING,
+            content_length=content_length,
+            created_at=time.strftime("%Y-%m-%d %H:%M:%S"),
+            updated_at=time.strftime("%Y-%m-%d %H:%M:%S"),
+        )
+        self._put_file(full_file_path, self._stat_key(full_file_path), rag_doc)
+
     def get_doc_id_by_file_path(self, file_path: str) -> str | None:
-        for doc_id, doc in self.docs.items():
-            if doc.file_path == file_path:
-                return doc_id
-        return None
+        rag_doc = self._file_docs.get(file_path)
+        return rag_doc.rag_doc_id if rag_doc else None
 
     def doc_id_exists(self, doc_id: str) -> bool:
         return doc_id in self.docs
@@ -105,7 +141,7 @@ class RAGDocs(BaseModel):
         try:
             if doc_id:
                 os.remove(full_file_path)
-                del self.docs[doc_id]
+                self.forget_path(full_file_path)
                 return doc_id
         except Exception as e:
             raise Exception(f"Error removing document {full_file_path}: {e}")
@@ -115,11 +151,82 @@ class RAGDocs(BaseModel):
             doc = self.docs.get(doc_id)
             if doc:
                 os.remove(doc.file_path)
-                del self.docs[doc.rag_doc_id]
+                self.forget_path(doc.file_path)
                 return doc_id
         except Exception as e:
             raise Exception(f"Error removing document id {doc_id}: {e}")
 
+    async def load_file(self, full_file_path: str) -> bool:
+        """
+        Read one source file into the index, unless it is unchanged since it was last
+        read. A file that no longer exists is forgotten. Returns whether docs changed.
+        """
+        try:
+            stat_key = self._stat_key(full_file_path)
+        except FileNotFoundError:
+            return self.forget_path(full_file_path)
+        if self._file_stats.get(full_file_path) == stat_key:
+            return False
+
+        async with aiofiles.open(full_file_path, "r", encoding="utf8") as file:
+            content = await file.read()
+        cleaned_content = content.strip().replace("\x00", "")
+        rag_doc_id = "doc-" + hashlib.md5(cleaned_content.encode()).hexdigest()
+        rag_doc = RAGDocModel(
+            file_name=os.path.basename(full_file_path),
+            file_path=full_file_path,
+            rag_doc_id=rag_doc_id,
+            status=DocStatus.UNKNOWN,
+        )
+        self._put_file(full_file_path, stat_key, rag_doc)
+        return True
+
+    def forget_path(self, path: str) -> bool:
+        """Drop the source file at `path`, or every file under it if it was a directory"""
+        prefix = os.path.join(path, "")
+        paths = [
+            file_path
+            for file_path in self._file_docs
+            if file_path == path or file_path.startswith(prefix)
+        ]
+        for file_path in paths:
+            rag_doc = self._file_docs.pop(file_path)
+            del self._file_stats[file_path]
+            paths_of_id = self._paths_by_id[rag_doc.rag_doc_id]
+            del paths_of_id[file_path]
+            if not paths_of_id:
+                del self._paths_by_id[rag_doc.rag_doc_id]
+            self._merge(rag_doc.rag_doc_id)
+        return bool(paths)
+
+    async def load_status(self, status_file_path: str) -> None:
+        """Merge the processing status file, only docs whose entry changed are updated"""
+        status_dict: dict[str, dict] = {}
+        if os.path.exists(status_file_path):
+            try:
+                async with aiofiles.open(
+                    status_file_path, "r", encoding="utf8"
+                ) as file:
+                    content = await file.read()
+
+                # Parse status JSON content
+                status_dict = (
+                    RootModel[dict[str, dict]].model_validate_json(content).root
+                )
+            except Exception as e:
+                # Keep the last known status, the file is re-read on its next change
+                print(f"Error loading status file: {e}")
+                return
+
+        changed = [
+            doc_id
+            for doc_id in self._status.keys() | status_dict.keys()
+            if self._status.get(doc_id) != status_dict.get(doc_id)
+        ]
+        self._status = status_dict
+        for doc_id in changed:
+            self._merge(doc_id)
+
     @staticmethod
     async def load(source_dir: str, status_file_path: str) -> "RAGDocs":
         """
@@ -127,6 +234,7 @@ class RAGDocs(BaseModel):
 
         Args:
             source_dir: Directory containing source documents
+            status_file_path: LightRAG doc status file
 
 
         Returns:
@@ -139,76 +247,56 @@ class RAGDocs(BaseModel):
         if os.path.exists(source_dir):
             # Semaphore to limit concurrency to 10
             semaphore = asyncio.Semaphore(10)
-            tasks = []
 
-            async def process_file(file_full_path: str) -> tuple[str, RAGDocModel]:
-                """Process a single file and return a tuple of (rag_doc_id, RAGDocModel)"""
+            async def process_file(file_full_path: str) -> None:
                 async with semaphore:
-                    # Extract the file name from the full path
-                    file_name = os.path.basename(file_full_path)
-
-                    # Read the file content asynchronously with UTF-8 encoding
-                    async with aiofiles.open(
-                        file_full_path, "r", encoding="utf8"
-                    ) as file:
-                        content = await file.read()
-
-                    cleaned_content = content.strip().replace("\x00", "")
-                    rag_doc_id = (
-                        "doc-" + hashlib.md5(cleaned_content.encode()).hexdigest()
-                    )
-
-                    # Create and return the RAGDocModel with source document information
-                    rag_doc = RAGDocModel(
-                        file_name=file_name,
-                        file_path=file_full_path,
-                        rag_doc_id=rag_doc_id,
-                        status=DocStatus.UNKNOWN,
-                    )
-                    return rag_doc_id, rag_doc
-
-            # Walk through the directory and create tasks for each file
-            for root, _, files in os.walk(source_dir):
-                for file in files:
-                    file_full_path = os.path.join(root, file)
-                    tasks.append(asyncio.create_task(process_file(file_full_path)))
-
-            # Wait for all tasks to complete concurrently
-            if tasks:
-                results = await asyncio.gather(*tasks)
-                for rag_doc_id, rag_doc in results:
-                    rag_docs.docs[rag_doc_id] = rag_doc
+                    await rag_docs.load_file(file_full_path)
 
-        if os.path.exists(status_file_path):
-            try:
-                async with aiofiles.open(
-                    status_file_path, "r", encoding="utf8"
-                ) as file:
-                    content = await file.read()
-
-                # Parse status JSON content
-                docs_status = RootModel[dict[str, dict]].model_validate_json(content)
-                status_dict = docs_status.root
-
-                # Update RAG documents with status information
-                for status_id, status_info in status_dict.items():
-                    status_info["rag_doc_id"] = status_id
-
-                    # Check if we already loaded this document from the file system
-                    if status_id in rag_docs.docs:
-                        # Update the existing document with status info while preserving file info
-                        existing_doc = rag_docs.docs[status_id]
-                        updated_doc = existing_doc.model_copy(update=status_info)
-                        rag_docs.docs[status_id] = updated_doc
-                    else:
-                        # This document only exists in the status file
-                        rag_docs.docs[status_id] = RAGDocModel(**status_info)
-            except Exception as e:
-                # Handle any errors in loading or parsing the status file
-                print(f"Error loading status file: {e}")
+            tasks = [
+                asyncio.create_task(process_file(os.path.join(root, file)))
+                for root, _, files in os.walk(source_dir)
+                for file in files
+            ]
+            if tasks:
+                await asyncio.gather(*tasks)
 
+        await rag_docs.load_status(status_file_path)
         return rag_docs
 
+    @staticmethod
+    def _stat_key(path: str) -> tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _put_file(
+        self, full_file_path: str, stat_key: tuple[int, int], rag_doc: RAGDocModel
+    ) -> None:
+        previous = self._file_docs.get(full_file_path)
+        if previous is not None and previous.rag_doc_id != rag_doc.rag_doc_id:
+            self.forget_path(full_file_path)
+        self._file_docs[full_file_path] = rag_doc
+        self._file_stats[full_file_path] = stat_key
+        self._paths_by_id.setdefault(rag_doc.rag_doc_id, {})[full_file_path] = None
+        self._merge(rag_doc.rag_doc_id)
+
+    def _merge(self, doc_id: str) -> None:
+        # The file info is completed by the status entry, as either may be missing
+        paths = self._paths_by_id.get(doc_id)
+        file_doc = self._file_docs[next(reversed(paths))] if paths else None
+        status_info = self._status.get(doc_id)
+        if status_info is not None:
+            status_info = {**status_info, "rag_doc_id": doc_id}
+
+        if file_doc is not None and status_info is not None:
+            self.docs[doc_id] = file_doc.model_copy(update=status_info)
+        elif file_doc is not None:
+            self.docs[doc_id] = file_doc
+        elif status_info is not None:
+            self.docs[doc_id] = RAGDocModel(**status_info)
+        else:
+            self.docs.pop(doc_id, None)
+        self._version += 1
+
     def get_metrics(self) -> dict:
         """
         Calculate metrics for the RAG documents.
@@ -352,6 +440,33 @@ class QueryParameters(BaseModel):
         description="Number of complete conversation turns (user-assistant pairs) to consider in the response context.",
     )
 
+    keyword_extractor: Literal["llm", "local"] = Field(
+        default="llm",
+        description="Keyword extraction strategy: "
+        "- 'llm': Asks the LLM for high/low-level keywords. "
+        "- 'local': Matches the query against the knowledge graph entity names, without an LLM call.",
+    )
+
+    timeout: Optional[float] = Field(
+        default=None,
+        description="End-to-end deadline in seconds for retrieval and the start of generation. None uses the service default.",
+    )
+
+    kg_context_timeout: Optional[float] = Field(
+        default=None,
+        description="In 'mix' mode, seconds to wait for the knowledge graph context once the vector context is ready. None waits for both.",
+    )
+
+    speculative_retrieval: bool = Field(
+        default=False,
+        description="If True, searches entities/relationships with the raw query while keywords are being extracted, and skips the keyword step when those hits are strong enough.",
+    )
+
+    adaptive_retrieval: bool = Field(
+        default=False,
+        description="If True, top_k and the token limits become upper bounds: hits are cut at the similarity-score knee and the context budgets shrink with them.",
+    )
+
     def to_light_rag_params(self) -> QueryParam:
         """
         Convert QueryParam to LightRAG QueryParam.
@@ -373,4 +488,9 @@ class QueryParameters(BaseModel):
             ll_keywords=self.ll_keywords,
             conversation_history=self.conversation_history,
             history_turns=self.history_turns,
+            keyword_extractor=self.keyword_extractor,
+            timeout=self.timeout,
+            kg_context_timeout=self.kg_context_timeout,
+            speculative_retrieval=self.speculative_retrieval,
+            adaptive_retrieval=self.adaptive_retrieval,
         )
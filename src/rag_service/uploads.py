@@ -0,0 +1,144 @@
+import codecs
+import hashlib
+import io
+import os
+import tarfile
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+_CHUNK_SIZE = 1024 * 1024
+_TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+@dataclass
+class StagedDoc:
+    """A document written to the staging dir, or the reason it could not be"""
+
+    file_name: str
+    staging_path: Optional[str] = None
+    doc_id: Optional[str] = None
+    content_length: int = 0
+    error: Optional[str] = None
+
+
+class DocIdHasher:
+    """
+    Computes the RAGDocs doc id of a file fed in chunks: the md5 of its UTF-8 text,
+    read with universal newlines, stripped and without NUL characters.
+    """
+
+    def __init__(self):
+        self._md5 = hashlib.md5()
+        self._decoder = io.IncrementalNewlineDecoder(
+            codecs.getincrementaldecoder("utf-8")(), translate=True
+        )
+        self._started = False
+        # Whitespace that is only hashed if more text follows it
+        self._trailing = ""
+        self.content_length = 0
+
+    def update(self, data: bytes, final: bool = False) -> None:
+        text = self._decoder.decode(data, final)
+        self.content_length += len(text)
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                return
+            self._started = True
+        stripped = text.rstrip()
+        if stripped:
+            self._md5.update((self._trailing + stripped).replace("\x00", "").encode())
+            self._trailing = text[len(stripped) :]
+        else:
+            self._trailing += text
+
+    def doc_id(self) -> str:
+        return "doc-" + self._md5.hexdigest()
+
+
+def stage_upload(
+    file_name: str, fileobj: BinaryIO, staging_dir: str, max_bytes: int
+) -> List[StagedDoc]:
+    """
+    Stream an uploaded file, or every document of a zip/tar archive, into the
+    staging dir while hashing it. Blocking, meant to run in a worker thread.
+    """
+    staged = []
+    try:
+        for name, reader in _iter_documents(file_name, fileobj):
+            try:
+                staging_path, hasher = _stage_stream(reader, staging_dir, max_bytes)
+                staged.append(
+                    StagedDoc(
+                        file_name=name,
+                        staging_path=staging_path,
+                        doc_id=hasher.doc_id(),
+                        content_length=hasher.content_length,
+                    )
+                )
+            except Exception as e:
+                staged.append(StagedDoc(file_name=name, error=str(e)))
+    except Exception as e:
+        staged.append(StagedDoc(file_name=file_name, error=str(e)))
+    return staged
+
+
+def _stage_stream(
+    reader: BinaryIO, staging_dir: str, max_bytes: int
+) -> Tuple[str, DocIdHasher]:
+    os.makedirs(staging_dir, exist_ok=True)
+    hasher = DocIdHasher()
+    fd, staging_path = tempfile.mkstemp(dir=staging_dir)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as staged:
+            while chunk := reader.read(_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise Exception(f"Document is larger than {max_bytes} bytes")
+                hasher.update(chunk)
+                staged.write(chunk)
+            hasher.update(b"", final=True)
+    except BaseException:
+        os.unlink(staging_path)
+        raise
+    return staging_path, hasher
+
+
+def _iter_documents(
+    file_name: str, fileobj: BinaryIO
+) -> Iterator[Tuple[str, BinaryIO]]:
+    lower_name = file_name.lower()
+    if lower_name.endswith(".zip"):
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                name = _safe_relative_path(info.filename)
+                if name is not None and not info.is_dir():
+                    with archive.open(info) as member:
+                        yield name, member
+    elif lower_name.endswith(_TAR_SUFFIXES):
+        # Stream mode reads the archive front to back, without seeking
+        with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+            for member in archive:
+                name = _safe_relative_path(member.name)
+                if name is not None and member.isfile():
+                    yield name, archive.extractfile(member)
+    else:
+        name = _safe_relative_path(file_name)
+        if name is None:
+            raise Exception(f"Invalid document file name: {file_name}")
+        yield name, fileobj
+
+
+def _safe_relative_path(name: str) -> Optional[str]:
+    # Archive entries must stay inside the source dir, hidden files are skipped
+    parts = [
+        part for part in name.replace("\\", "/").split("/") if part not in ("", ".")
+    ]
+    if not parts or any(
+        part == ".." or part.startswith(".") or part == "__MACOSX" for part in parts
+    ):
+        return None
+    return os.path.join(*parts)